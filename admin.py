@@ -1,20 +1,29 @@
 import streamlit as st
 import streamlit.components.v1 as components
 import psycopg2
+import psycopg2.pool
 import pandas as pd
 from PIL import Image
 import io
 import subprocess
 import os
 import time
+import threading
 import html
 import base64
+from contextlib import contextmanager
 from google.oauth2 import service_account
 from googleapiclient.discovery import build
 import sys
 import json
 import config
 import slicer
+import search
+from archive import ArchiveReader, sniff_archive, multipart_rar_index, is_junk
+from catalog import ensure_catalog_version, bump_catalog_version, get_catalog_version
+from thumb_store import load_thumbnail, ensure_thumb_columns
+from events import EventFeed
+from embedding_store import get_embedding_store
 
 # ==========================================
 # 1. AYARLAR VE PATH TANIMLARI
@@ -42,16 +51,97 @@ DB_CONFIG = {
 }
 CREDENTIALS = os.path.join(ROOT_DIR, 'app/service_account.json')
 
+# Bağlantı havuzu: tüm sayfalar/oturumlar aynı havuzu paylaşır
+DB_POOL_MIN = 1
+DB_POOL_MAX = 10
+DB_STATEMENT_TIMEOUT_MS = 15000  # Takılan bir sorgu arayüzü kilitlemesin
+DB_POOL_WAIT_TIMEOUT = 30        # Havuz doluyken boş bağlantı için en fazla bu kadar sn beklenir
+LIVE_WAIT_TIMEOUT = 30           # Canlı log: olay/log değişikliği yoksa en geç bu kadar sn'de bir yenile
+SIMILAR_RESULTS = 15             # Galeri "Benzer" panelinde gösterilen model sayısı
+
 # ==========================================
 # 2. YARDIMCI FONKSİYONLAR
 # ==========================================
 
-def get_db_connection():
-    return psycopg2.connect(**DB_CONFIG)
+@st.cache_resource
+def get_db_pool():
+    """Süreç genelinde tek bağlantı havuzu (Streamlit rerun'larında yeniden kurulmaz)."""
+    return psycopg2.pool.ThreadedConnectionPool(
+        DB_POOL_MIN, DB_POOL_MAX,
+        options=f"-c statement_timeout={DB_STATEMENT_TIMEOUT_MS}",
+        keepalives=1, keepalives_idle=30, keepalives_interval=10, keepalives_count=3,
+        **DB_CONFIG
+    )
 
-def run_query_df(query, params=None):
-    conn = get_db_connection()
+@st.cache_resource
+def get_pool_slots():
+    """
+    Havuz boyutunda semafor: ThreadedConnectionPool.getconn() havuz doluyken beklemek
+    yerine PoolError fırlatır; eşzamanlı oturumlar önce burada sıraya girer.
+    """
+    return threading.BoundedSemaphore(DB_POOL_MAX)
+
+@st.cache_resource
+def get_event_feed():
+    """asset_events kanalının süreç genelindeki tek abonesi (canlı log sayfası)."""
+    feed = EventFeed(DB_CONFIG)
+    feed.start()
+    return feed
+
+def wait_for_activity(feed, seq, path, timeout):
+    """Yeni olay gelene, log dosyası değişene ya da süre dolana kadar bekler (sayfa boşuna yenilenmez)."""
+    def log_mtime():
+        try: return os.stat(path).st_mtime_ns
+        except OSError: return None
+    start_mtime = log_mtime()
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if feed.wait_for_new(seq, 0.5) or log_mtime() != start_mtime:
+            return
+
+def _checkout_healthy(pool):
+    """Havuzdan canlı bir bağlantı alır; kopmuş bağlantılar (DB restart vb.) atılıp yenisi açılır."""
+    for _ in range(DB_POOL_MAX + 1):
+        conn = pool.getconn()
+        try:
+            if not conn.closed:
+                with conn.cursor() as cur:
+                    cur.execute("SELECT 1")
+                conn.rollback()
+                return conn
+        except (psycopg2.OperationalError, psycopg2.InterfaceError):
+            pass
+        pool.putconn(conn, close=True)
+    raise psycopg2.OperationalError("Veritabanına sağlıklı bağlantı kurulamadı")
+
+@contextmanager
+def db_connection():
+    """
+    Havuzdan bağlantı ödünç verir; havuz doluysa DB_POOL_WAIT_TIMEOUT sn'ye kadar sıra
+    beklenir. Blok bitince açık transaction geri alınır (commit edilmemiş iş havuzda
+    kalmaz) ve bağlantı havuza döner.
+    """
+    pool = get_db_pool()
+    slots = get_pool_slots()
+    if not slots.acquire(timeout=DB_POOL_WAIT_TIMEOUT):
+        raise psycopg2.OperationalError(f"Bağlantı havuzu dolu ({DB_POOL_MAX}), {DB_POOL_WAIT_TIMEOUT} sn içinde boşalmadı")
     try:
+        conn = _checkout_healthy(pool)
+    except Exception:
+        slots.release()
+        raise
+    try:
+        yield conn
+    finally:
+        broken = bool(conn.closed)
+        if not broken:
+            try: conn.rollback()
+            except psycopg2.Error: broken = True
+        pool.putconn(conn, close=broken)
+        slots.release()
+
+def _query_df(query, params=None):
+    with db_connection() as conn:
         with conn.cursor() as cur:
             cur.execute(query, params)
             if cur.description:
@@ -59,10 +149,87 @@ def run_query_df(query, params=None):
                 data = cur.fetchall()
                 return pd.DataFrame(data, columns=columns)
             return pd.DataFrame()
+
+def run_query_df(query, params=None):
+    try:
+        return _query_df(query, params)
     except Exception as e:
         return pd.DataFrame() 
-    finally:
-        conn.close()
+
+# --- Okuma önbelleği: TTL + katalog sürümü ---
+# Yazan her süreç commit'ten sonra catalog_version_seq'i artırır (süreç başına en fazla
+# catalog.BUMP_INTERVAL sn'de bir); sürüm önbellek anahtarının parçası olduğu için artırımdan
+# sonraki ilk okuma (en geç 2 sn içinde) veritabanına gider, öncesinde önbellekten döner.
+
+@st.cache_data(ttl=2, show_spinner=False)
+def current_catalog_version():
+    with db_connection() as conn:
+        with conn.cursor() as cur:
+            return get_catalog_version(cur)
+
+def bump_and_commit(conn, cur):
+    """Admin'den yapılan yazımlar: commit et, sürümü hemen artır, kendi önbelleğimizi tazele."""
+    conn.commit()
+    bump_catalog_version(cur)
+    conn.commit()
+    current_catalog_version.clear()
+
+@st.cache_data(ttl=600, show_spinner=False)
+def _cached_query_df(query, params, version):
+    return _query_df(query, params)
+
+def cached_query_df(query, params=None):
+    """run_query_df'in önbellekli hali (hatalar önbelleğe alınmaz)."""
+    try:
+        return _cached_query_df(query, params, current_catalog_version())
+    except Exception as e:
+        return pd.DataFrame()
+
+# Galeri kartlarının gösterdiği sütunlar. Depoya taşınmış kayıtlarda eski blob hiç çekilmez.
+GALLERY_COLUMNS = """id, filename, filepath, tags, created_at, thumbnail_hash, preview_hash,
+    CASE WHEN thumbnail_hash IS NULL THEN thumbnail_blob END AS thumbnail_blob"""
+
+@st.cache_resource
+def ensure_admin_schema():
+    """
+    Süreç başına bir kez: catalog_version_seq sürüm sayacını, thumbnail/önizleme sütunlarını ve keyset
+    sayfalama için (created_at, id) indeksini oluşturur, hazır arama indekslerini
+    (search.detect_features) döndürür.
+    Arama indeksleri migrate_search_index.py ile kurulur.
+    """
+    features = {}
+    try:
+        with db_connection() as conn:
+            with conn.cursor() as cur:
+                # İlk kurulumda büyük tabloda indeks oluşturmak statement_timeout'u aşabilir
+                cur.execute("SET LOCAL statement_timeout = 0")
+                cur.execute("CREATE INDEX IF NOT EXISTS idx_assets_created_id ON assets (created_at DESC, id DESC)")
+                ensure_catalog_version(cur)
+                ensure_thumb_columns(cur)
+                features = search.detect_features(cur)
+            conn.commit()
+    except Exception as e:
+        print(f"⚠️ Galeri indeksi oluşturulamadı: {e}")
+    return features
+
+@st.cache_data(ttl=600, show_spinner=False)
+def count_assets(where_sql, params, version):
+    """
+    Galeri toplamı. Filtresizken COUNT(*) yerine planner tahmini (pg_class.reltuples)
+    kullanılır; filtreliyken search.count_matches (geniş sonuçta tahmin, dar sonuçta
+    gerçek sayım). Sonuç katalog sürümü değişene kadar önbellekte tutulur.
+    Dönüş: (sayı, tahmini_mi)
+    """
+    with db_connection() as conn:
+        with conn.cursor() as cur:
+            if where_sql == "1=1":
+                cur.execute("SELECT reltuples::bigint FROM pg_class WHERE oid = 'assets'::regclass")
+                estimate = cur.fetchone()[0]
+                if estimate and estimate > 0:  # -1/0: tablo henüz ANALYZE edilmemiş
+                    return estimate, True
+                cur.execute("SELECT COUNT(*) FROM assets")
+                return cur.fetchone()[0], False
+            return search.count_matches(cur, where_sql, params)
 
 def get_drive_service():
     if not os.path.exists(CREDENTIALS): return None
@@ -90,11 +257,12 @@ def extract_drive_file_id(url_or_id):
 def download_gdrive_file_to_temp(file_url_or_id, filename):
     """
     Google Drive dosyasını geçici dizine indirir.
-    ZIP ise içindeki TÜM STL/OBJ/3MF dosyalarını çıkarır.
+    Arşivse (zip/rar/7z, imzadan tespit edilir) içindeki TÜM STL/OBJ/3MF dosyalarını çıkarır.
     Her zaman (list_of_paths, error) döndürür.
     """
     try:
-        import zipfile, io, uuid
+        import uuid
+        import rarfile
         from googleapiclient.http import MediaIoBaseDownload
         service = get_drive_service()
         if not service:
@@ -105,104 +273,50 @@ def download_gdrive_file_to_temp(file_url_or_id, filename):
         os.makedirs(temp_dir, exist_ok=True)
 
         # Çok parçalı RAR tespiti (indirmeden önce dosya adına bak)
-        import re as _re
-        _mp = _re.search(r'\.part(\d+)\.rar$', (filename or '').lower())
-        if _mp:
-            part_n = int(_mp.group(1))
-            if part_n > 1:
-                return None, (
-                    f"⚠️ Bu dosya çok parçalı RAR arşivinin {part_n}. parçasıdır.\n"
-                    "Dilimlemek için tüm parçaları (.part1.rar, .part2.rar, ...) aynı klasöre indirip manuel açın."
-                )
-            else:
-                # part1.rar — deneyerek devam et ama anlamlı hata mesajı hazırla
-                pass
+        part_n = multipart_rar_index(filename or '')
+        if part_n > 1:
+            return None, (
+                f"⚠️ Bu dosya çok parçalı RAR arşivinin {part_n}. parçasıdır.\n"
+                "Dilimlemek için tüm parçaları (.part1.rar, .part2.rar, ...) aynı klasöre indirip manuel açın."
+            )
 
-        # Önce belleğe indir (magic bytes tespiti için)
-        raw_buf = io.BytesIO()
+        # Diske indir (arşiv türü imzadan tespit edilir, dosya belleğe alınmaz)
+        download_path = os.path.join(temp_dir, f"dl_{uuid.uuid4().hex[:8]}")
         request = service.files().get_media(fileId=file_id)
-        downloader = MediaIoBaseDownload(raw_buf, request)
-        done = False
-        while not done:
-            _, done = downloader.next_chunk()
-        raw_bytes = raw_buf.getvalue()
+        with open(download_path, "wb") as fh:
+            downloader = MediaIoBaseDownload(fh, request)
+            done = False
+            while not done:
+                _, done = downloader.next_chunk()
+
+        kind = sniff_archive(download_path)
+        if not kind:
+            # Normal model dosyası
+            local_path = os.path.join(temp_dir, filename)
+            os.replace(download_path, local_path)
+            return [local_path], None
 
-        magic = raw_bytes[:8]  # 7z=6, RAR=7-8 byte signature için yeterli
         MODEL_EXTS = ('.stl', '.obj', '.3mf', '.step', '.stp')
-
-        if magic[:2] == b'PK':
-            # ZIP arşivi — içindeki TÜM model dosyalarını çıkar
-            try:
-                # Her ZIP için izole klasör (dosya ismi çakışmasın)
-                extract_dir = os.path.join(temp_dir, f"zip_{uuid.uuid4().hex[:8]}")
-                os.makedirs(extract_dir, exist_ok=True)
-                extracted = []
-                with zipfile.ZipFile(io.BytesIO(raw_bytes)) as zf:
-                    for entry in zf.namelist():
-                        if any(entry.lower().endswith(e) for e in MODEL_EXTS):
-                            safe_name = os.path.basename(entry)
-                            local_path = os.path.join(extract_dir, safe_name)
-                            with zf.open(entry) as src, open(local_path, 'wb') as dst:
-                                dst.write(src.read())
-                            extracted.append(local_path)
-                if not extracted:
-                    return None, "ZIP içinde desteklenen model dosyası bulunamadı (.stl/.obj/.3mf)"
-                return extracted, None
-            except zipfile.BadZipFile:
-                pass
-
-        # 7Z arşivi — py7zr ile aç
-        if magic[:6] == b'7z\xbc\xaf\x27\x1c':
-            try:
-                import py7zr
-                extract_dir = os.path.join(temp_dir, f"sz_{uuid.uuid4().hex[:8]}")
-                os.makedirs(extract_dir, exist_ok=True)
-                with py7zr.SevenZipFile(io.BytesIO(raw_bytes), mode='r') as zf:
-                    zf.extractall(path=extract_dir)
-                extracted = []
-                for root, _, files in os.walk(extract_dir):
-                    for f in files:
-                        if any(f.lower().endswith(e) for e in MODEL_EXTS):
-                            extracted.append(os.path.join(root, f))
-                if not extracted:
-                    return None, "7Z içinde desteklenen model dosyası bulunamadı (.stl/.obj/.3mf)"
-                return extracted, None
-            except Exception as e7:
-                return None, f"7Z açma hatası: {e7}"
-
-        # RAR arşivi — rarfile ile aç
-        if magic[:7] == b'Rar!\x1a\x07\x00' or magic[:8] == b'Rar!\x1a\x07\x01\x00':
-            try:
-                import rarfile, tempfile
-                tmp_rar = os.path.join(temp_dir, f"tmp_{uuid.uuid4().hex[:8]}.rar")
-                with open(tmp_rar, 'wb') as tf:
-                    tf.write(raw_bytes)
-                extract_dir = os.path.join(temp_dir, f"rar_{uuid.uuid4().hex[:8]}")
-                os.makedirs(extract_dir, exist_ok=True)
-                with rarfile.RarFile(tmp_rar) as rf:
-                    rf.extractall(path=extract_dir)
-                os.remove(tmp_rar)
-                extracted = []
-                for root, _, files in os.walk(extract_dir):
-                    for f in files:
-                        if any(f.lower().endswith(e) for e in MODEL_EXTS):
-                            extracted.append(os.path.join(root, f))
-                if not extracted:
-                    return None, "RAR içinde desteklenen model dosyası bulunamadı (.stl/.obj/.3mf)"
-                return extracted, None
-            except rarfile.NeedFirstVolume:
-                return None, (
-                    "⚠️ Bu dosya çok parçalı RAR arşivinin ortasındaki bir parçadır.\n"
-                    "Tüm parçaları (.part1.rar, .part2.rar, ...) aynı klasöre indirip manuel açın."
-                )
-            except Exception as er:
-                return None, f"RAR açma hatası: {er}"
-
-        # Normal model dosyası
-        local_path = os.path.join(temp_dir, filename)
-        with open(local_path, 'wb') as fh:
-            fh.write(raw_bytes)
-        return [local_path], None
+        label = kind.upper()
+        try:
+            # Her arşiv için izole klasör (dosya ismi çakışmasın)
+            extract_dir = os.path.join(temp_dir, f"{kind}_{uuid.uuid4().hex[:8]}")
+            os.makedirs(extract_dir, exist_ok=True)
+            with ArchiveReader(download_path, kind) as archive:
+                names = [m.name for m in archive.members()
+                         if not is_junk(m.name) and m.name.lower().endswith(MODEL_EXTS)]
+                if not names:
+                    return None, f"{label} içinde desteklenen model dosyası bulunamadı (.stl/.obj/.3mf)"
+                return archive.extract_many(names, extract_dir), None
+        except rarfile.NeedFirstVolume:
+            return None, (
+                "⚠️ Bu dosya çok parçalı RAR arşivinin ortasındaki bir parçadır.\n"
+                "Tüm parçaları (.part1.rar, .part2.rar, ...) aynı klasöre indirip manuel açın."
+            )
+        except Exception as ea:
+            return None, f"{label} açma hatası: {ea}"
+        finally:
+            os.remove(download_path)
 
     except Exception as e:
         return None, str(e)
@@ -303,13 +417,16 @@ st.markdown("""
 # 4. ARAYÜZ MANTIĞI & STATE TEMİZLİĞİ
 # ==========================================
 
+# Şema hazırlığı (süreç başına bir kez): yazım formları catalog_version_seq sayacına ihtiyaç duyar
+ensure_admin_schema()
+
 # Varsayılan sayfa ayarı
 if 'active_page' not in st.session_state:
     st.session_state['active_page'] = "🖼️ Galeri & Arama"
 
-# Galeri pagination state
-if 'gallery_page' not in st.session_state:
-    st.session_state['gallery_page'] = 1
+# Galeri pagination state: önceki sayfaların son (created_at, id) anahtarları (keyset)
+if 'gallery_cursors' not in st.session_state:
+    st.session_state['gallery_cursors'] = []
 if 'gallery_filters' not in st.session_state:
     st.session_state['gallery_filters'] = {}
 
@@ -329,7 +446,7 @@ with st.sidebar:
         st.session_state['active_page'] = page_selection # Yeni sayfayı kaydet
         
         # Temizlenecek değişkenler (Listeyi genişletebilirsin)
-        keys_to_clear = ['preview_file', 'search_query', 'sel_src', 'sel_fold']
+        keys_to_clear = ['preview_file', 'search_query', 'sel_src', 'sel_fold', 'similar_to']
         for key in keys_to_clear:
             if key in st.session_state:
                 del st.session_state[key]
@@ -351,6 +468,31 @@ if page_selection == "🖼️ Galeri & Arama":
     if 'preview_file' in st.session_state:
         with st.expander("🔍 3D Görüntüleyici", expanded=True):
             render_3d_viewer(st.session_state['preview_file'])
+
+    # Görsel benzerlik: seçilen asset'in CLIP vektörüne en yakın modeller (embedding_store)
+    embeddings = get_embedding_store()
+    embeddings.refresh()
+    if 'similar_to' in st.session_state:
+        sim_id, sim_name = st.session_state['similar_to']
+        with st.expander(f"🧭 Benzer modeller: {sim_name}", expanded=True):
+            hits = embeddings.similar(sim_id, SIMILAR_RESULTS)
+            sim_df = cached_query_df(f"SELECT {GALLERY_COLUMNS} FROM assets WHERE id = ANY(%s)",
+                                     ([aid for aid, _ in hits],)) if hits else pd.DataFrame()
+            if sim_df.empty:
+                st.info("Bu asset için görsel vektör yok (ai_tagger.py --embed-missing).")
+            else:
+                by_id = {int(r['id']): r for _, r in sim_df.iterrows()}
+                sim_cols = st.columns(5)
+                for j, (aid, score) in enumerate([h for h in hits if h[0] in by_id]):
+                    r = by_id[aid]
+                    with sim_cols[j % 5]:
+                        thumb = load_thumbnail(r.get('thumbnail_hash'), r['thumbnail_blob'])
+                        if thumb:
+                            st.image(io.BytesIO(thumb))
+                        st.caption(f"**{r['filename'][:20]}** · {score:.2f}")
+            if st.button("❌ Benzerleri Kapat"):
+                del st.session_state['similar_to']
+                st.rerun()
     
     # Filtre satırı 1: Arama
     search_query = st.text_input("🔍 Ara", placeholder="Örn: robot, scifi...")
@@ -360,7 +502,7 @@ if page_selection == "🖼️ Galeri & Arama":
     
     sel_src = 0
     with c1:
-        srcs = run_query_df("SELECT id, name FROM source")
+        srcs = cached_query_df("SELECT id, name FROM source")
         if not srcs.empty:
             opts = {row['id']: row['name'] for _, row in srcs.iterrows()}
             opts[0] = "Tüm Kaynaklar"
@@ -369,7 +511,7 @@ if page_selection == "🖼️ Galeri & Arama":
     sel_fold = None
     with c2:
         if sel_src != 0:
-            folds = run_query_df(f"SELECT DISTINCT split_part(folder_path, '/', 1) as f FROM assets WHERE source_id={sel_src} AND folder_path != '' ORDER BY f ASC")
+            folds = cached_query_df("SELECT DISTINCT split_part(folder_path, '/', 1) as f FROM assets WHERE source_id=%s AND folder_path != '' ORDER BY f ASC", (sel_src,))
             if not folds.empty:
                 l1 = st.selectbox("📁 Klasör", ["Tüm Klasörler"] + folds['f'].tolist())
                 if l1 != "Tüm Klasörler": sel_fold = l1
@@ -380,47 +522,56 @@ if page_selection == "🖼️ Galeri & Arama":
     current_filters = {'search': search_query, 'source': sel_src, 'folder': sel_fold}
     if st.session_state['gallery_filters'] != current_filters:
         st.session_state['gallery_filters'] = current_filters
-        st.session_state['gallery_page'] = 1
+        st.session_state['gallery_cursors'] = []
 
+    search_features = ensure_admin_schema()
     where = ["1=1"]; params = []
-    if search_query: 
-        where.append("(filename ILIKE %s OR tags ILIKE %s)")
-        params.extend([f"%{search_query}%", f"%{search_query}%"])
+    # Çok kelimeli arama: her kelime zorunlu, önek eşleşmesi, sonuçlar alaka sırasıyla
+    search_sql = search.build_search(search_query, search_features) if search_query else None
+    if search_sql:
+        where.append(search_sql[0]); params.extend(search_sql[1])
     if sel_src != 0: 
         where.append("source_id = %s"); params.append(sel_src)
     if sel_fold: 
         where.append("folder_path ILIKE %s"); params.append(f"{sel_fold}%")
 
-    with get_db_connection() as conn:
-        with conn.cursor() as cur:
-            cur.execute(f"SELECT COUNT(*) FROM assets WHERE {' AND '.join(where)}", tuple(params))
-            total = cur.fetchone()[0]
+    total, is_estimate = count_assets(' AND '.join(where), tuple(params), current_catalog_version())
 
     PAGE_SIZE = 100
-    total_pages = max(1, (total // PAGE_SIZE) + 1)
-    
-    # Sayfa numarasını sınırla (filtre değişince toplam sayfa azalabilir)
-    if st.session_state['gallery_page'] > total_pages:
-        st.session_state['gallery_page'] = total_pages
-    
-    c_nav1, c_nav2 = st.columns([1, 5])
-    curr_page = c_nav1.number_input(
-        "Sayfa", 
-        min_value=1, 
-        max_value=total_pages, 
-        value=st.session_state['gallery_page'],
-        key="gallery_page_input"
-    )
-    
-    # Sayfa değiştiğinde session state'i güncelle
-    if curr_page != st.session_state['gallery_page']:
-        st.session_state['gallery_page'] = curr_page
-    
-    c_nav2.markdown(f"**Toplam: {total} dosya | Sayfa: {curr_page}/{total_pages}**")
-    
-    offset = (curr_page - 1) * PAGE_SIZE
-    query = f"SELECT * FROM assets WHERE {' AND '.join(where)} ORDER BY created_at DESC LIMIT %s OFFSET %s"
-    df = run_query_df(query, tuple(params + [PAGE_SIZE, offset]))
+    total_pages = max(1, -(-total // PAGE_SIZE))
+    cursors = st.session_state['gallery_cursors']
+    curr_page = len(cursors) + 1
+
+    # Keyset (seek) sayfalama: OFFSET yok, her sayfa önceki sayfanın son anahtarından başlar.
+    # Anahtar (alaka, id) veya (created_at, id); sayfalama sürerken sıralama türü değişmez.
+    # Bir fazla satır çekilir: varsa sonraki sayfa vardır.
+    if not cursors:
+        st.session_state['gallery_sort'] = search.sort_for(search_sql, total)
+    sort_sql, sort_params, rank_sort = st.session_state['gallery_sort']
+    page_where = list(where); page_params = list(params)
+    if cursors:
+        page_where.append(f"({sort_sql}, id) < (%s, %s)"); page_params.extend(sort_params + list(cursors[-1]))
+    query = f"""SELECT {GALLERY_COLUMNS}, {sort_sql} AS sort_key FROM assets WHERE {' AND '.join(page_where)}
+                ORDER BY sort_key DESC, id DESC LIMIT %s"""
+    df = cached_query_df(query, tuple(sort_params + page_params + [PAGE_SIZE + 1]))
+    has_next = len(df) > PAGE_SIZE
+    df = df.iloc[:PAGE_SIZE]
+
+    c_nav1, c_nav2, c_nav3, c_nav4 = st.columns([1, 1, 1, 5])
+    if c_nav1.button("⏮️ İlk", disabled=not cursors, use_container_width=True):
+        st.session_state['gallery_cursors'] = []
+        st.rerun()
+    if c_nav2.button("◀️ Önceki", disabled=not cursors, use_container_width=True):
+        cursors.pop()
+        st.rerun()
+    if c_nav3.button("Sonraki ▶️", disabled=not has_next, use_container_width=True):
+        last = df.iloc[-1]
+        key = float(last['sort_key']) if rank_sort else pd.Timestamp(last['sort_key']).to_pydatetime()
+        cursors.append((key, int(last['id'])))
+        st.rerun()
+
+    total_str = f"~{total:,}" if is_estimate else f"{total:,}"
+    c_nav4.markdown(f"**Toplam: {total_str} dosya | Sayfa: {curr_page}/{'~' if is_estimate else ''}{max(total_pages, curr_page)}**")
 
     if df.empty:
         st.warning("Dosya bulunamadı.")
@@ -429,16 +580,28 @@ if page_selection == "🖼️ Galeri & Arama":
         for i, row in df.iterrows():
             with cols[i % 5]:
                 with st.container(border=True):
-                    if row['thumbnail_blob']:
-                        st.image(io.BytesIO(row['thumbnail_blob']))
+                    thumb = load_thumbnail(row.get('thumbnail_hash'), row['thumbnail_blob'])
+                    if thumb:
+                        st.image(io.BytesIO(thumb))
                     else:
                         st.image("https://via.placeholder.com/300?text=No+Img")
+
+                    # Çok açılı önizleme (sprite sheet / animasyonlu WebP) varsa
+                    preview = load_thumbnail(row.get('preview_hash'))
+                    if preview:
+                        with st.expander("🎞️ Açılar"):
+                            st.image(io.BytesIO(preview))
                     
                     st.caption(f"**{row['filename'][:20]}**")
                     
                     if row['tags']:
                         tags_html = "".join([f'<span class="tag-badge">{t.strip()}</span>' for t in row['tags'].split(",")[:3]])
                         st.markdown(tags_html, unsafe_allow_html=True)
+
+                    if embeddings.row_of(int(row['id'])) is not None:
+                        if st.button("🧭 Benzer", key=f"sim_{row['id']}", use_container_width=True):
+                            st.session_state['similar_to'] = (int(row['id']), row['filename'])
+                            st.rerun()
                     
                     # Dosya tipi kontrolü
                     is_gdrive = row['filepath'] and ('drive.google.com' in row['filepath'] or row['filepath'].startswith('http'))
@@ -497,10 +660,10 @@ elif page_selection == "⚙️ Kaynak Yönetimi":
             n = st.text_input("İsim"); t = st.selectbox("Tip", ["local", "gdrive"]); p = st.text_input("Link/ID")
             if st.form_submit_button("Kaydet") and p:
                 final_p = extract_drive_id(p) if t == 'gdrive' else p
-                with get_db_connection() as conn:
+                with db_connection() as conn:
                     with conn.cursor() as cur:
                         cur.execute(f"INSERT INTO source (name, source_type, {'path' if t=='local' else 'drive_id'}) VALUES (%s,%s,%s)", (n or "Yeni",t,final_p))
-                        conn.commit()
+                        bump_and_commit(conn, cur)
                 st.success("Eklendi!"); st.rerun()
     
     with t2:
@@ -515,9 +678,11 @@ elif page_selection == "⚙️ Kaynak Yönetimi":
                 st.warning("Hiçbir satır girilmedi.")
             else:
                 added = 0
-                with get_db_connection() as conn:
+                with db_connection() as conn:
                     with conn.cursor() as cur:
                         for line in lines:
+                            # Hatalı satır transaction'ı bozmasın, diğerleri eklensin
+                            cur.execute("SAVEPOINT bulk_row")
                             try:
                                 final_p = extract_drive_id(line) if bulk_type == 'gdrive' else line
                                 auto_name = f"Import-{final_p[:15]}"
@@ -525,8 +690,9 @@ elif page_selection == "⚙️ Kaynak Yönetimi":
                                            (auto_name, bulk_type, final_p))
                                 added += 1
                             except Exception as e:
+                                cur.execute("ROLLBACK TO SAVEPOINT bulk_row")
                                 st.error(f"❌ Hata ({line[:30]}...): {e}")
-                        conn.commit()
+                        bump_and_commit(conn, cur)
                 st.success(f"✅ {added}/{len(lines)} kaynak eklendi!")
                 
                 # İsimleri otomatik düzelt
@@ -542,7 +708,7 @@ elif page_selection == "⚙️ Kaynak Yönetimi":
                 st.rerun()
                 
     with t3:
-        df_src = run_query_df("SELECT * FROM source ORDER BY id")
+        df_src = cached_query_df("SELECT * FROM source ORDER BY id")
         
         if df_src.empty:
             st.info("Henüz kaynak eklenmemiş.")
@@ -579,11 +745,11 @@ elif page_selection == "⚙️ Kaynak Yönetimi":
             
             c1, c2 = st.columns([1, 5])
             if c1.button("🗑️ Seçilenleri Sil", type="primary", disabled=len(selected_ids) == 0):
-                with get_db_connection() as conn:
+                with db_connection() as conn:
                     with conn.cursor() as cur:
                         for src_id in selected_ids:
                             cur.execute("DELETE FROM source WHERE id=%s", (src_id,))
-                        conn.commit()
+                        bump_and_commit(conn, cur)
                 st.success(f"✅ {len(selected_ids)} kaynak silindi!")
                 st.rerun()
             
@@ -631,10 +797,24 @@ elif page_selection == "🛠️ Operasyon Merkezi":
     except: pass
 
     st.code(log_content, language="bash", line_numbers=False)
+
+    # --- CANLI OLAYLAR (asset_events) ---
+    feed = get_event_feed()
+    seen_seq = feed.seq
+    st.subheader("📡 Canlı Olaylar")
+    if not feed.connected:
+        st.caption("⚠️ Olay kanalına bağlanılamadı, sadece log izleniyor.")
+    events = feed.recent(20)
+    if events:
+        st.code('\n'.join(
+            f"{time.strftime('%H:%M:%S', time.localtime(e.get('ts', 0)))}  {e.get('event', '?'):<16} "
+            f"{len(e.get('ids', []))} asset" for e in events), language="bash", line_numbers=False)
+    else:
+        st.caption("Henüz olay yok (indexer, worker ve tagger olayları burada görünür).")
     
-    # Otomatik yenileme
+    # Otomatik yenileme: sabit aralıkla değil, olay ya da yeni log satırı gelince
     if auto_refresh:
-        time.sleep(3)
+        wait_for_activity(feed, seen_seq, LOG_FILE, LIVE_WAIT_TIMEOUT)
         st.rerun()
 
 # --- SAYFA 4: PRINTER YÖNETİMİ ---
@@ -1,9 +1,17 @@
 import psycopg2
 import io
+import argparse
 import torch
 from PIL import Image
 from transformers import CLIPProcessor, CLIPModel
 import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from psycopg2.extras import execute_batch
+from thumb_store import load_thumbnail, ensure_thumb_columns
+from catalog import ensure_catalog_version, catalog_changed, flush_catalog_version
+from embedding_store import get_embedding_store
+from events import EventListener, emit, TAGS_READY, THUMBNAIL_READY, ASSET_CHANGED
 
 # --- AYARLAR ---
 DB_CONFIG = {
@@ -14,6 +22,12 @@ DB_CONFIG = {
     "port": "5435"
 }
 MODEL_NAME = "openai/clip-vit-base-patch32"
+BATCH_SIZE = 32         # Tek forward pass'teki görsel sayısı (CPU'da 16-64 arası iyi sonuç verir)
+PAGE_SIZE = 256         # Birikim bu boyutta sayfalarla (id sırasıyla) okunur
+DECODE_WORKERS = 4      # Thumbnail okuma + decode + ön işleme thread'leri
+TAG_THRESHOLD = 0.15
+IDLE_RESCAN_INTERVAL = 10 * 60  # --listen: olay gelmese de birikim bu aralıkla taranır
+WAKE_EVENTS = (THUMBNAIL_READY, ASSET_CHANGED)
 
 # Etiket Listesi (Daha spesifik hale getirildi)
 CANDIDATE_LABELS = [
@@ -23,65 +37,218 @@ CANDIDATE_LABELS = [
     "monster", "vehicle", "terrain", "low poly", "sculpture"
 ]
 
-def tag_assets():
-    # GPU kontrolü (Varsa GPU kullanmak işlemi 10x hızlandırır)
-    device = "cuda" if torch.cuda.is_available() else "cpu"
-    print(f"🧠 AI Modeli yükleniyor ({device})...")
-    
-    model = CLIPModel.from_pretrained(MODEL_NAME).to(device)
-    processor = CLIPProcessor.from_pretrained(MODEL_NAME)
+class ClipTagger:
+    """
+    CLIP modeli + önceden hesaplanmış etiket metin vektörleri.
+    Etiketler sabit olduğu için metin kodlayıcı yalnızca bir kez çalışır; her görsel
+    grubunda sadece görsel kodlayıcı çalışır. Sonuç tam model çağrısıyla aynıdır:
+    logits = logit_scale * normalize(görsel) @ normalize(metin).T
+    Görsel vektörleri embedding_store'a yazılır (benzerlik ve metin araması için).
+    """
 
-    try:
-        conn = psycopg2.connect(**DB_CONFIG)
-        cur = conn.cursor()
-
-        # DÜZELTME: thumbnail_blob'u OLAN ama henüz etiketi OLMAYANLARI getir
-        cur.execute("""
-            SELECT id, thumbnail_blob 
-            FROM assets 
-            WHERE thumbnail_blob IS NOT NULL 
-            AND (tags IS NULL OR tags = '')
-            LIMIT 50
-        """)
-        rows = cur.fetchall()
+    def __init__(self, labels=CANDIDATE_LABELS, threshold=TAG_THRESHOLD):
+        # GPU kontrolü (Varsa GPU kullanmak işlemi 10x hızlandırır)
+        self.device = "cuda" if torch.cuda.is_available() else "cpu"
+        print(f"🧠 AI Modeli yükleniyor ({self.device})...")
+
+        self.model = CLIPModel.from_pretrained(MODEL_NAME).to(self.device).eval()
+        self.processor = CLIPProcessor.from_pretrained(MODEL_NAME)
+        self.labels = list(labels)
+        self.threshold = threshold
+
+        with torch.no_grad():
+            text_inputs = self.processor(text=self.labels, return_tensors="pt", padding=True).to(self.device)
+            text = self.model.get_text_features(**text_inputs)
+            self.text_features = text / text.norm(dim=-1, keepdim=True)
+            self.logit_scale = self.model.logit_scale.exp()
+
+    def preprocess(self, blob):
+        """JPEG baytları → pixel_values (1, 3, H, W). Thread havuzunda çalışır."""
+        image = Image.open(io.BytesIO(blob)).convert("RGB")
+        return self.processor(images=image, return_tensors="pt")["pixel_values"]
+
+    def encode_images(self, pixel_values):
+        """pixel_values listesi → normalize edilmiş görsel vektörleri (tensor)."""
+        pixels = torch.cat(pixel_values).to(self.device)
+        with torch.no_grad(): # Bellek tasarrufu için gradient hesaplama yok
+            image = self.model.get_image_features(pixel_values=pixels)
+        return image / image.norm(dim=-1, keepdim=True)
+
+    def encode_text(self, texts):
+        """Metin sorguları → normalize edilmiş vektörler (numpy, embedding_store.search için)."""
+        with torch.no_grad():
+            inputs = self.processor(text=list(texts), return_tensors="pt", padding=True).to(self.device)
+            text = self.model.get_text_features(**inputs)
+        return (text / text.norm(dim=-1, keepdim=True)).float().cpu().numpy()
 
+    def tag_batch(self, pixel_values):
+        """pixel_values listesi → (her görsel için etiket listesi, görsel vektörleri numpy)."""
+        image = self.encode_images(pixel_values)
+        with torch.no_grad():
+            probs = (self.logit_scale * image @ self.text_features.T).softmax(dim=1)
+
+        # %15 üzerindeki etiketleri al (hiçbiri geçmezse boş: düşük güvenli etiket uydurulmaz)
+        tags = [[self.labels[i] for i, prob in enumerate(row.tolist()) if prob > self.threshold]
+                for row in probs]
+        return tags, image.float().cpu().numpy()
+
+def ensure_tag_columns(cur):
+    """
+    assets.tagged_at sütununu (yoksa) ekler. Hiçbir etiketi eşiği geçemeyen asset boş
+    etiketle kalır; işlendiği tagged_at'ten anlaşılır, her taramada yeniden etiketlenmez.
+    """
+    cur.execute("ALTER TABLE assets ADD COLUMN IF NOT EXISTS tagged_at TIMESTAMP")
+
+def open_db():
+    conn = psycopg2.connect(**DB_CONFIG)
+    cur = conn.cursor()
+    ensure_thumb_columns(cur)
+    ensure_tag_columns(cur)
+    ensure_catalog_version(cur)
+    conn.commit()
+    return conn, cur
+
+def iter_thumbnails(cur, untagged_only=True, limit=None, page_size=PAGE_SIZE):
+    """
+    Thumbnail'ı OLAN (depoda veya eski blob sütununda) assetleri — untagged_only ise
+    yalnızca henüz etiketlenmemiş (etiketi ve tagged_at'i boş) OLANLARI — id sırasıyla (keyset) sayfa sayfa verir.
+    Okunamayan thumbnail'lar bir sonraki sayfada tekrar gelmez; tüm birikim tek
+    geçişte dolaşılır.
+    """
+    tag_filter = "AND tagged_at IS NULL AND (tags IS NULL OR tags = '')" if untagged_only else ""
+    last_id = 0
+    remaining = limit
+    while remaining is None or remaining > 0:
+        size = page_size if remaining is None else min(page_size, remaining)
+        cur.execute(f"""
+            SELECT id, thumbnail_hash, thumbnail_blob
+            FROM assets
+            WHERE id > %s
+            AND (thumbnail_hash IS NOT NULL OR thumbnail_blob IS NOT NULL)
+            {tag_filter}
+            ORDER BY id
+            LIMIT %s
+        """, (last_id, size))
+        rows = cur.fetchall()
         if not rows:
-            print("✅ Etiketlenecek yeni dosya bulunamadı.")
+            return
+        yield from rows
+        last_id = rows[-1][0]
+        if remaining is not None:
+            remaining -= len(rows)
+        if len(rows) < size:
             return
 
-        print(f"🏷️ {len(rows)} dosya işleniyor...")
+def prefetch(pool, fn, items, depth):
+    """items'ı havuzda fn ile işler; sırayı koruyarak en fazla depth iş önden gider."""
+    pending = deque()
+    for item in items:
+        pending.append((item, pool.submit(fn, item)))
+        if len(pending) >= depth:
+            yield pending.popleft()
+    while pending:
+        yield pending.popleft()
 
-        for asset_id, blob in rows:
-            try:
-                # Resmi hazırla
-                image = Image.open(io.BytesIO(blob)).convert("RGB")
-                
-                # AI İşleme
-                inputs = processor(text=CANDIDATE_LABELS, images=image, return_tensors="pt", padding=True).to(device)
-                
-                with torch.no_grad(): # Bellek tasarrufu için gradient hesaplama yok
-                    outputs = model(**inputs)
-                
-                # Olasılıkları hesapla
-                probs = outputs.logits_per_image.softmax(dim=1)
-                
-                # %15 üzerindeki etiketleri al (Eşik değeri biraz düşürüldü)
-                detected_tags = []
-                for i, prob in enumerate(probs[0]):
-                    if prob > 0.15:
-                        detected_tags.append(CANDIDATE_LABELS[i])
-                
-                tag_str = ", ".join(detected_tags)
-                
-                # Veritabanına Yaz
-                cur.execute("UPDATE assets SET tags = %s WHERE id = %s", (tag_str, asset_id))
-                conn.commit()
-                print(f"✅ ID {asset_id} -> {tag_str}")
+def iter_batches(rows, tagger, batch_size):
+    """
+    (id, thumbnail_hash, thumbnail_blob) satırları → [(asset_id, pixel_values), ...] grupları.
+    Thumbnail okuma/decode/ön işleme thread havuzunda, model çağıranın thread'inde çalışır.
+    """
+    def decode(row):
+        asset_id, thumb_hash, old_blob = row
+        blob = load_thumbnail(thumb_hash, old_blob)
+        return tagger.preprocess(blob) if blob else None
 
+    batch = []
+    with ThreadPoolExecutor(max_workers=DECODE_WORKERS, thread_name_prefix="decode") as pool:
+        for row, future in prefetch(pool, decode, rows, batch_size * 2):
+            asset_id = row[0]
+            try:
+                pixels = future.result()
             except Exception as e:
                 print(f"⚠️ Hata (ID {asset_id}): {e}")
-                conn.rollback()
+                continue
+            if pixels is None:
+                print(f"⚠️ ID {asset_id}: thumbnail depoda bulunamadı")
+                continue
+            batch.append((asset_id, pixels))
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+def write_tags(conn, cur, results):
+    """Bir grubun etiketlerini tek transaction'da yazar. results: [(asset_id, tag_str), ...]"""
+    execute_batch(cur, "UPDATE assets SET tags = %s, tagged_at = CURRENT_TIMESTAMP WHERE id = %s",
+                  [(tag_str, asset_id) for asset_id, tag_str in results])
+    emit(cur, TAGS_READY, [asset_id for asset_id, _ in results])
+    conn.commit()
+    catalog_changed(conn)
+
+def tag_pending(conn, cur, tagger, store, limit=None, batch_size=BATCH_SIZE):
+    """
+    Etiketsiz assetleri (limit verilmezse tüm birikimi) batch_size'lık gruplarla etiketler,
+    görsel vektörlerini store'a ekler. Dönüş: etiketlenen asset sayısı.
+    """
+    tagged = 0
+    start = time.time()
+    for batch in iter_batches(iter_thumbnails(cur, limit=limit), tagger, batch_size):
+        ids = [asset_id for asset_id, _ in batch]
+        try:
+            tags, vectors = tagger.tag_batch([pixels for _, pixels in batch])
+            # Önce vektörler: DB yazımı düşerse asset etiketsiz kalır, sonraki turda
+            # yeniden eklenen vektör eskisinin yerine geçer
+            store.add(ids, vectors, MODEL_NAME)
+            results = [(asset_id, ", ".join(t)) for asset_id, t in zip(ids, tags)]
+            write_tags(conn, cur, results)
+        except Exception as e:
+            print(f"⚠️ Hata (ID {ids[0]}-{ids[-1]}): {e}")
+            conn.rollback()
+            continue
+        tagged += len(results)
+        rate = tagged / max(time.time() - start, 1e-6)
+        print(f"✅ {tagged} etiketlendi ({rate:.1f}/s) — son: ID {results[-1][0]} -> {results[-1][1]}")
+    # Sayfa sorguları açık bir transaction bırakmasın; bekleyen sürüm artırımı yayınlanır
+    conn.commit()
+    flush_catalog_version(conn)
+
+    if not tagged:
+        print("✅ Etiketlenecek yeni dosya bulunamadı.")
+    store.ensure_index()
+    return tagged
+
+def embed_missing(conn, cur, tagger, store, batch_size=BATCH_SIZE):
+    """
+    Daha önce etiketlenmiş ama vektörü depoda olmayan assetlerin vektörlerini üretir
+    (etiketlere dokunmaz). Dönüş: eklenen vektör sayısı.
+    """
+    rows = (row for row in iter_thumbnails(cur, untagged_only=False) if store.row_of(row[0]) is None)
+    added = 0
+    start = time.time()
+    for batch in iter_batches(rows, tagger, batch_size):
+        ids = [asset_id for asset_id, _ in batch]
+        try:
+            vectors = tagger.encode_images([pixels for _, pixels in batch]).float().cpu().numpy()
+            store.add(ids, vectors, MODEL_NAME)
+        except Exception as e:
+            print(f"⚠️ Hata (ID {ids[0]}-{ids[-1]}): {e}")
+            continue
+        added += len(ids)
+        print(f"🧬 {added} vektör eklendi ({added / max(time.time() - start, 1e-6):.1f}/s)")
+    conn.commit()
+    store.ensure_index()
+    return added
 
+def tag_assets(limit=None, batch_size=BATCH_SIZE, backfill=False):
+    tagger = ClipTagger()
+    store = get_embedding_store()
+
+    try:
+        conn, cur = open_db()
+        if backfill:
+            embed_missing(conn, cur, tagger, store, batch_size)
+        tag_pending(conn, cur, tagger, store, limit, batch_size)
         cur.close()
         conn.close()
         print("🏁 İşlem tamamlandı.")
@@ -89,5 +256,44 @@ def tag_assets():
     except Exception as e:
         print(f"❌ Bağlantı Hatası: {e}")
 
+def listen(batch_size=BATCH_SIZE):
+    """
+    Sürekli çalışır: model ve etiket vektörleri bir kez yüklenir, birikim bitince
+    asset_events kanalında thumbnail_ready beklenir ve yeni thumbnail'lar hemen etiketlenir.
+    """
+    tagger = ClipTagger()
+    store = get_embedding_store()
+    conn, cur = open_db()
+    listener = EventListener(DB_CONFIG)
+    print("👂 asset_events dinleniyor (thumbnail_ready → etiketleme)...")
+    try:
+        while True:
+            # Birikimi boşalt (keyset tek geçiş; okunamayan thumbnail'lar tekrar denenmez)
+            tag_pending(conn, cur, tagger, store, batch_size=batch_size)
+            deadline = time.monotonic() + IDLE_RESCAN_INTERVAL
+            while time.monotonic() < deadline:
+                events = listener.wait(deadline - time.monotonic())
+                if any(e.get("event") in WAKE_EVENTS for e in events):
+                    break
+    except KeyboardInterrupt:
+        print("👋 Dinleme durduruldu.")
+    finally:
+        listener.close()
+        cur.close()
+        conn.close()
+
 if __name__ == "__main__":
-    tag_assets()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="CLIP ile otomatik etiketleme")
+    parser.add_argument("--listen", action="store_true",
+                        help="Sürekli çalış: yeni thumbnail'ları thumbnail_ready olayıyla hemen etiketle")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE,
+                        help=f"Tek forward pass'teki görsel sayısı (varsayılan {BATCH_SIZE})")
+    parser.add_argument("--limit", type=int, default=None,
+                        help="En fazla bu kadar asset etiketle (varsayılan: tüm birikim)")
+    parser.add_argument("--embed-missing", action="store_true",
+                        help="Önce daha önce etiketlenmiş assetlerin eksik görsel vektörlerini üret")
+    args = parser.parse_args()
+    if args.listen:
+        listen(args.batch_size)
+    else:
+        tag_assets(args.limit, args.batch_size, args.embed_missing)
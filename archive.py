@@ -0,0 +1,240 @@
+"""
+Ortak arşiv katmanı: indexer, worker'lar (worker, deep_scan) ve admin indiricisi
+zip/rar/7z arşivlerini yalnızca buradan okur.
+
+- Tür tespiti dosya uzantısına değil imzaya (magic bytes) bakar; Drive'dan uzantısız
+  gelen dosyalar da tanınır.
+- Üye listesi tembeldir ve (yol, boyut, mtime) anahtarıyla süreç içinde önbelleklenir:
+  aynı arşive ikinci kez bakan (ör. önce görsel, sonra model arayan) kod merkezi dizini
+  yeniden ayrıştırmaz, hatta arşivi hiç açmaz.
+- Üyeler tek tek okunur/akıtılır: arşiv komple diske açılmaz. Render edilecek modeller
+  tmpfs'teki (/dev/shm) geçici bir dosyaya, görseller doğrudan belleğe çıkarılır.
+- Çok parçalı RAR adları (.partN.rar, .rNN) tek yerde yorumlanır.
+"""
+
+import os
+import re
+import shutil
+import tempfile
+import threading
+import zipfile
+from collections import namedtuple, OrderedDict
+from contextlib import contextmanager
+
+import rarfile
+import py7zr
+
+MODEL_EXTS = ('.stl', '.obj')
+IMAGE_EXTS = ('.jpg', '.jpeg', '.png', '.webp')
+
+TMPFS_DIR = "/dev/shm"
+TMPFS_HEADROOM = 256 * 1024 * 1024  # tmpfs RAM'dir: üyenin yanında bu kadar boş alan kalmalı
+COPY_BUFFER = 1024 * 1024
+LISTING_CACHE_SIZE = 256            # Önbellekte tutulan arşiv listesi sayısı
+
+ARCHIVE_KINDS = {
+    '.zip': 'zip', '.cbz': 'zip',
+    '.rar': 'rar', '.cbr': 'rar',
+    '.7z': '7z',
+}
+KIND_EXTS = {'zip': '.zip', 'rar': '.rar', '7z': '.7z'}
+
+ArchiveMember = namedtuple("ArchiveMember", ["name", "size"])
+
+def sniff_archive(path):
+    """Dosyanın ilk baytlarından arşiv türünü döndürür ('zip', 'rar', '7z') ya da None."""
+    try:
+        with open(path, "rb") as f:
+            return sniff_bytes(f.read(8))
+    except OSError:
+        return None
+
+def sniff_bytes(magic):
+    """İlk 8 bayttan arşiv türü ('zip', 'rar', '7z') ya da None."""
+    if magic[:4] in (b'PK\x03\x04', b'PK\x05\x06', b'PK\x07\x08'):
+        return 'zip'
+    if magic[:6] == b'7z\xbc\xaf\x27\x1c':
+        return '7z'
+    # RAR 4.x ve RAR 5
+    if magic[:7] == b'Rar!\x1a\x07\x00' or magic[:8] == b'Rar!\x1a\x07\x01\x00':
+        return 'rar'
+    return None
+
+def archive_kind(path):
+    """Önce imza, imza tanınmazsa uzantı."""
+    return sniff_archive(path) or ARCHIVE_KINDS.get(os.path.splitext(path)[1].lower())
+
+def is_multipart_rar(filename):
+    """Çok parçalı RAR mı: .part1.rar, .part2.rar, .r00, .r01 ..."""
+    fn = filename.lower()
+    return bool(re.search(r'\.part\d+\.rar$', fn)) or bool(re.search(r'\.r\d+$', fn))
+
+def multipart_rar_index(filename):
+    """
+    Çok parçalı RAR'da parça numarası (1'den başlar), değilse 0.
+    Eski adlandırmada ilk cilt .rar'dır (parça 1), .r00 ikinci ciltten başlar.
+    """
+    m = re.search(r'\.part(\d+)\.rar$', filename.lower())
+    if m: return int(m.group(1))
+    m = re.search(r'\.r(\d+)$', filename.lower())
+    if m: return int(m.group(1)) + 2
+    return 0
+
+def is_junk(name):
+    """Mac çöp klasörleri ve gizli dosya/klasörler."""
+    parts = [p for p in name.replace('\\', '/').split('/') if p and p != '.']
+    return "__MACOSX" in name or any(p.startswith('.') for p in parts)
+
+_listings = OrderedDict()
+_listings_lock = threading.Lock()
+
+def _listing_key(path):
+    if not isinstance(path, str):
+        return None  # Dosya nesnesi (ör. uzak ZIP): önbelleklenmez
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (os.path.realpath(path), st.st_size, st.st_mtime_ns)
+
+class ArchiveReader:
+    """
+    zip/rar/7z için ortak arayüz: members(), open(name), read(name), extract(name, directory).
+    Arşiv ilk üye okunana kadar açılmaz; members() önbellekten gelebilir.
+    path bir dosya yolu veya aranabilir bir dosya nesnesi olabilir (zip/7z; tür verilmelidir).
+    """
+
+    def __init__(self, path, kind=None):
+        self.path = path
+        self.kind = kind or archive_kind(path)
+        if self.kind not in KIND_EXTS:
+            raise ValueError(f"Desteklenmeyen arşiv türü: {path}")
+        self._archive = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        if self._archive is not None:
+            self._archive.close()
+            self._archive = None
+
+    @property
+    def archive(self):
+        if self._archive is None:
+            if self.kind == 'zip':
+                self._archive = zipfile.ZipFile(self.path, 'r')
+            elif self.kind == 'rar':
+                self._archive = rarfile.RarFile(self.path, 'r')
+            else:
+                self._archive = py7zr.SevenZipFile(self.path, mode='r')
+        return self._archive
+
+    def members(self):
+        """Dizinler hariç üyeler, arşivdeki sırayla. Hiçbir üye açılmaz."""
+        key = _listing_key(self.path)
+        with _listings_lock:
+            if key in _listings:
+                _listings.move_to_end(key)
+                return _listings[key]
+        if self.kind == '7z':
+            members = [ArchiveMember(f.filename, f.uncompressed or 0)
+                       for f in self.archive.list() if not f.is_directory]
+        else:
+            members = [ArchiveMember(i.filename, i.file_size)
+                       for i in self.archive.infolist() if not i.is_dir()]
+        if key:
+            with _listings_lock:
+                _listings[key] = members
+                while len(_listings) > LISTING_CACHE_SIZE:
+                    _listings.popitem(last=False)
+        return members
+
+    def open(self, name):
+        """Üyeyi okunabilir bir akış olarak açar (zip/rar'da parça parça çözülür)."""
+        if self.kind == '7z':
+            # py7zr her okumadan sonra başa sarılmalı; sadece hedef üye çözülür
+            self.archive.reset()
+            return self.archive.read(targets=[name])[name]
+        return self.archive.open(name)
+
+    def read(self, name):
+        """Üyeyi belleğe okur."""
+        with self.open(name) as src:
+            return src.read()
+
+    def extract(self, name, directory):
+        """Sadece bu üyeyi directory altına yazar, dosya yolunu döndürür."""
+        return self.extract_many([name], directory)[0]
+
+    def extract_many(self, names, directory):
+        """
+        Verilen üyeleri directory altına yazar, yollarını aynı sırayla döndürür.
+        7z'de tek geçişte çözülür; zip/rar'da üyeler tek tek akıtılır (alt klasörler düzleşir).
+        """
+        if self.kind == '7z':
+            self.archive.reset()
+            self.archive.extract(path=directory, targets=list(names))
+            return [os.path.join(directory, name) for name in names]
+        paths = []
+        for name in names:
+            target = os.path.join(directory, os.path.basename(name))
+            with self.archive.open(name) as src, open(target, "wb") as dst:
+                shutil.copyfileobj(src, dst, COPY_BUFFER)
+            paths.append(target)
+        return paths
+
+def score_filename(filename):
+    fn = filename.lower()
+    score = 0
+    if 'render' in fn: score += 100
+    if 'preview' in fn: score += 80
+    if 'main' in fn: score += 70
+    if 'thumb' in fn: score += 60
+    if 'display' in fn or 'screenshot' in fn: score += 50
+    if fn.endswith('.jpg') or fn.endswith('.jpeg'): score += 10
+    return score
+
+def rank_image_members(members):
+    """Sadece arşiv listesi metadatasıyla görselleri puanlar, en iyiden sıralar."""
+    candidates = []
+    for m in members:
+        if is_junk(m.name): continue
+        if m.name.lower().endswith(IMAGE_EXTS):
+            candidates.append((score_filename(m.name) + (m.size / 1024 / 1024), m))
+    candidates.sort(key=lambda c: c[0], reverse=True)
+    return [m for _, m in candidates]
+
+def pick_image(members):
+    """En yüksek puanlı görsel üye (yoksa None)."""
+    ranked = rank_image_members(members)
+    return ranked[0] if ranked else None
+
+def pick_model(members):
+    """İlk STL/OBJ üyesi."""
+    for m in members:
+        if not is_junk(m.name) and m.name.lower().endswith(MODEL_EXTS):
+            return m
+    return None
+
+def scratch_dir(size, fallback_dir):
+    """Üye tmpfs'e sığıyorsa /dev/shm, sığmıyorsa (veya tmpfs yoksa) HDD'deki yedek klasör."""
+    if os.path.isdir(TMPFS_DIR):
+        try:
+            if shutil.disk_usage(TMPFS_DIR).free >= size + TMPFS_HEADROOM:
+                return TMPFS_DIR
+        except OSError:
+            pass
+    return fallback_dir
+
+@contextmanager
+def extracted_member(reader, member, fallback_dir):
+    """Üyeyi geçici bir klasöre çıkarır, yolunu verir; blok bitince klasörü siler."""
+    work_dir = tempfile.mkdtemp(prefix="member_", dir=scratch_dir(member.size, fallback_dir))
+    try:
+        yield reader.extract(member.name, work_dir)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
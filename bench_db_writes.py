@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Indexer yazım benchmark'ı: satır başına INSERT + commit (thumbnail bytea sütununda) ile
+AssetWriter (execute_values + periyodik commit, thumbnail ThumbStore'da) karşılaştırması.
+Yerel Postgres'te geçici bir bench_assets tablosu ve geçici bir thumbnail deposu oluşturur,
+sonunda ikisini de siler.
+
+Kullanım: python bench_db_writes.py --rows 20000 --batch-size 500
+"""
+
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.indexer import connect_db, AssetWriter
+from app.thumb_store import ThumbStore
+
+BENCH_TABLE = "bench_assets"
+
+def reset_table(cur, conn):
+    cur.execute(f"DROP TABLE IF EXISTS {BENCH_TABLE}")
+    cur.execute(f"""
+        CREATE TABLE {BENCH_TABLE} (
+            id SERIAL PRIMARY KEY,
+            filename VARCHAR(500) NOT NULL,
+            filepath TEXT UNIQUE NOT NULL,
+            source_id INTEGER,
+            file_size BIGINT,
+            thumbnail_blob BYTEA,
+            thumbnail_hash VARCHAR(64),
+            folder_path TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    conn.commit()
+
+def make_rows(n, thumb_size):
+    thumb = os.urandom(thumb_size)
+    return [(f"model_{i}.zip", f"/bench/folder_{i // 50}/model_{i}.zip", 1, i * 1024, thumb, f"folder_{i // 50}")
+            for i in range(n)]
+
+def with_unique_thumb(row):
+    # Her satıra farklı thumbnail: depo dedup'ı sonucu şişirmesin
+    return row[:4] + (row[4] + row[1].encode(),) + row[5:]
+
+def with_new_size(row):
+    # Yeniden taramada değişmiş dosya: upsert gerçekten satırı günceller
+    return row[:3] + (row[3] + 1,) + row[4:]
+
+def bench_row_by_row(cur, conn, rows):
+    sql = f"""
+        INSERT INTO {BENCH_TABLE} (filename, filepath, source_id, file_size, thumbnail_blob, folder_path)
+        VALUES (%s, %s, %s, %s, %s, %s)
+        ON CONFLICT (filepath) DO UPDATE SET file_size=EXCLUDED.file_size, thumbnail_blob=EXCLUDED.thumbnail_blob
+    """
+    start = time.perf_counter()
+    for row in rows:
+        cur.execute(sql, with_unique_thumb(row))
+        conn.commit()
+    return time.perf_counter() - start
+
+def bench_writer(cur, conn, rows, batch_size, store):
+    start = time.perf_counter()
+    with AssetWriter(cur, conn, batch_size=batch_size, table=BENCH_TABLE, store=store) as writer:
+        for row in rows:
+            writer.add(with_unique_thumb(row))
+    return time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description="Indexer DB yazım benchmark'ı")
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--thumb-kb", type=int, default=20, help="Satır başına sahte thumbnail boyutu (KB)")
+    args = parser.parse_args()
+
+    conn = connect_db()
+    cur = conn.cursor()
+    rows = make_rows(args.rows, args.thumb_kb * 1024)
+    store_dir = tempfile.mkdtemp(prefix="bench_thumbs_")
+    store = ThumbStore(store_dir)
+    try:
+        print(f"📊 {args.rows} satır, {args.thumb_kb} KB thumbnail, batch={args.batch_size}")
+        for label, run in (("Satır başına commit", lambda: bench_row_by_row(cur, conn, rows)),
+                           ("AssetWriter (insert)", lambda: bench_writer(cur, conn, rows, args.batch_size, store))):
+            reset_table(cur, conn)
+            elapsed = run()
+            print(f"  {label:<24} {elapsed:8.2f} sn  ({args.rows / elapsed:9.0f} satır/sn)")
+        # Aynı satırlar tekrar: değişmeyen yeniden tarama (IS DISTINCT FROM ile yazımsız yol)
+        elapsed = bench_writer(cur, conn, rows, args.batch_size, store)
+        print(f"  {'AssetWriter (değişmemiş)':<24} {elapsed:8.2f} sn  ({args.rows / elapsed:9.0f} satır/sn)")
+        # Boyutu değişmiş satırlar: ON CONFLICT güncelleme yolu
+        elapsed = bench_writer(cur, conn, [with_new_size(row) for row in rows], args.batch_size, store)
+        print(f"  {'AssetWriter (update)':<24} {elapsed:8.2f} sn  ({args.rows / elapsed:9.0f} satır/sn)")
+    finally:
+        cur.execute(f"DROP TABLE IF EXISTS {BENCH_TABLE}")
+        conn.commit()
+        conn.close()
+        shutil.rmtree(store_dir, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
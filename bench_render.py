@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Renderer benchmark'ı: her çağrıda yeni OffscreenRenderer kurup silen eski yol ile
+OSMesa bağlamını açık tutan RenderWorker'ın saniyedeki render sayısı karşılaştırması.
+Geçici bir klasöre farklı boyutlarda STL modelleri üretir ve sonunda siler.
+
+Kullanım: python bench_render.py --models 50 --threads 5
+"""
+
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+import trimesh
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.renderer import RenderWorker, RENDER_SIZE, load_mesh, build_scene, encode_jpeg, render_3d_model
+
+def make_models(directory, count):
+    paths = []
+    for i in range(count):
+        # Küçük parça ile orta boy figür arası: 1280 - 20480 üçgen
+        mesh = trimesh.creation.icosphere(subdivisions=3 + i % 3)
+        mesh.apply_scale((1 + i % 4, 1, 1 + i % 2))
+        path = os.path.join(directory, f"model_{i}.stl")
+        mesh.export(path)
+        paths.append(path)
+    return paths
+
+def render_cold(file_path):
+    """Eski render_3d_model davranışı: her render için bağlam kur ve sil."""
+    import pyrender
+    r = pyrender.OffscreenRenderer(RENDER_SIZE, RENDER_SIZE)
+    try:
+        color, _ = r.render(build_scene(load_mesh(file_path)))
+        return encode_jpeg(color)
+    finally:
+        r.delete()
+
+def timed(fn, paths, threads):
+    start = time.perf_counter()
+    if threads > 1:
+        with ThreadPoolExecutor(max_workers=threads) as executor:
+            results = list(executor.map(fn, paths))
+    else:
+        results = [fn(p) for p in paths]
+    elapsed = time.perf_counter() - start
+    failed = sum(1 for r in results if not r)
+    return elapsed, failed
+
+def main():
+    parser = argparse.ArgumentParser(description="Renderer benchmark'ı")
+    parser.add_argument("--models", type=int, default=50)
+    parser.add_argument("--threads", type=int, default=5, help="deep_scan gibi eşzamanlı çağıran thread sayısı")
+    parser.add_argument("--recycle-after", type=int, default=100)
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix="bench_render_")
+    worker = RenderWorker(recycle_after=args.recycle_after)
+    try:
+        paths = make_models(work_dir, args.models)
+        print(f"📊 {args.models} model, {RENDER_SIZE}x{RENDER_SIZE}, recycle_after={args.recycle_after}")
+        # Isınma: pyrender importu ve shader derlemesi ölçüme girmesin
+        render_cold(paths[0])
+        render_3d_model(paths[0], worker=worker, use_cache=False)
+
+        warm = lambda p: render_3d_model(p, worker=worker, use_cache=False)
+        for label, fn, threads in (("Her çağrıda yeni bağlam", render_cold, 1),
+                                   ("RenderWorker", warm, 1),
+                                   (f"RenderWorker ({args.threads} thread)", warm, args.threads)):
+            elapsed, failed = timed(fn, paths, threads)
+            print(f"  {label:<28} {elapsed:8.2f} sn  ({args.models / elapsed:7.1f} render/sn)"
+                  + (f"  ⚠️ {failed} başarısız" if failed else ""))
+        print(f"  Bağlam yeniden kurulumu: {worker.recycled}")
+    finally:
+        worker.stop()
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
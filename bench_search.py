@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Galeri arama benchmark'ı: search.build_search (tsvector/pg_trgm indeksli) ile eski
+'filename ILIKE %q% OR tags ILIKE %q%' taramasının gecikme dağılımı (p50/p95/p99).
+Her arama admin galerisinin yaptığı gibi ölçülür: eşleşme sayımı + ilk sayfa
+(az eşleşmede alaka sırası, çok eşleşmede yenilik sırası, LIMIT 101).
+Yerel Postgres'te geçici bir bench_search_assets tablosu oluşturur ve sonunda siler.
+
+Kullanım: python bench_search.py --rows 1000000 --queries 200
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.indexer import connect_db
+from app.search import ensure_search_index, build_search, sort_for, count_matches
+
+BENCH_TABLE = "bench_search_assets"
+WORDS = ["robot", "dragon", "castle", "sword", "helmet", "tank", "spaceship", "chair", "table",
+         "miniature", "warrior", "orc", "elf", "knight", "wizard", "terrain", "tree", "house",
+         "bracket", "gear", "enclosure", "vase", "lamp", "skull", "mech", "figure", "bust",
+         "base", "scifi", "fantasy", "ejderha", "kale", "kilic", "zirh", "arac", "parca"]
+TAGS = ["3d character", "architectural building", "car", "weapon", "scifi", "furniture",
+        "nature tree plant", "miniature figure", "jewelry", "animal", "mechanical part", "robot"]
+
+def create_table(cur, conn, rows):
+    cur.execute(f"DROP TABLE IF EXISTS {BENCH_TABLE}")
+    cur.execute(f"""
+        CREATE TABLE {BENCH_TABLE} (
+            id SERIAL PRIMARY KEY,
+            filename VARCHAR(500) NOT NULL,
+            tags TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    cur.execute(f"CREATE INDEX ON {BENCH_TABLE} (created_at DESC, id DESC)")
+    words = "(ARRAY[" + ",".join(f"'{w}'" for w in WORDS) + "])"
+    tags = "(ARRAY[" + ",".join(f"'{t}'" for t in TAGS) + "])"
+    cur.execute(f"""
+        INSERT INTO {BENCH_TABLE} (filename, tags, created_at)
+        SELECT {words}[1 + (random() * {len(WORDS) - 1})::int] || '_' ||
+               {words}[1 + (random() * {len(WORDS) - 1})::int] || '_v' || mod(g, 97) || '.stl',
+               CASE WHEN random() < 0.6 THEN {tags}[1 + (random() * {len(TAGS) - 1})::int] END,
+               now() - (g || ' seconds')::interval
+        FROM generate_series(1, %s) g
+    """, (rows,))
+    conn.commit()
+
+def make_queries(n):
+    queries = []
+    for _ in range(n):
+        terms = random.sample(WORDS, random.choice([1, 1, 2, 2, 3]))
+        # Yazarken arama: son kelime çoğu zaman yarım (önek)
+        if random.random() < 0.5:
+            terms[-1] = terms[-1][:max(3, len(terms[-1]) // 2)]
+        queries.append(" ".join(terms))
+    return queries
+
+def percentile(samples, p):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))]
+
+def run(cur, queries, build):
+    timings = []
+    for q in queries:
+        search_sql = build(q)
+        where, params = search_sql[0], search_sql[1]
+        start = time.perf_counter()
+        total, _ = count_matches(cur, where, tuple(params), table=BENCH_TABLE)
+        sort_sql, sort_params, _ = sort_for(search_sql, total)
+        cur.execute(f"""SELECT id, filename, tags, created_at, {sort_sql} AS sort_key FROM {BENCH_TABLE}
+                        WHERE {where} ORDER BY sort_key DESC, id DESC LIMIT 101""",
+                    tuple(sort_params + params))
+        cur.fetchall()
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+def legacy_build(q):
+    # Eski galeri: tek ILIKE, sayım + created_at sırası
+    return "(filename ILIKE %s OR tags ILIKE %s)", [f"%{q}%", f"%{q}%"], None, []
+
+def report(label, timings):
+    print(f"  {label:<22} p50 {percentile(timings, 50):8.1f} ms   p95 {percentile(timings, 95):8.1f} ms"
+          f"   p99 {percentile(timings, 99):8.1f} ms")
+
+def main():
+    parser = argparse.ArgumentParser(description="Galeri arama benchmark'ı")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--legacy-queries", type=int, default=20, help="Eski ILIKE için sorgu sayısı (yavaş)")
+    args = parser.parse_args()
+
+    conn = connect_db()
+    cur = conn.cursor()
+    try:
+        print(f"📦 {args.rows} satırlık tablo oluşturuluyor...")
+        create_table(cur, conn, args.rows)
+        start = time.perf_counter()
+        features = ensure_search_index(cur, table=BENCH_TABLE)
+        cur.execute(f"ANALYZE {BENCH_TABLE}")
+        conn.commit()
+        print(f"🔧 İndeksler {time.perf_counter() - start:.1f} sn'de kuruldu: {features}")
+
+        queries = make_queries(args.queries)
+        print(f"📊 {args.queries} sorgu (ör. {queries[:3]})")
+        run(cur, queries[:10], lambda q: build_search(q, features))  # Isınma
+        report("build_search", run(cur, queries, lambda q: build_search(q, features)))
+        report("ILIKE (eski)", run(cur, queries[:args.legacy_queries], legacy_build))
+    finally:
+        conn.rollback()
+        cur.execute(f"DROP TABLE IF EXISTS {BENCH_TABLE}")
+        conn.commit()
+        conn.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""
+Katalog sürüm sayacı.
+assets/source tablolarına yazan her süreç (indexer, worker'lar, ai_tagger, admin formları)
+verisini commit ettikten SONRA catalog_changed() çağırır. Admin önbellekleri sürümü
+anahtara katar: sürüm değişince eski sonuçlar kendiliğinden geçersiz olur.
+
+Sürüm bir sequence'tir: nextval satır kilidi almaz ve transaction'dan bağımsızdır, bu
+yüzden paralel yazıcılar birbirini beklemez. Commit'ten önce artırılsaydı admin henüz
+görünmeyen veriyi yeni sürümle önbelleğe alabilirdi; bu yüzden artırım commit'ten sonra
+yapılır. Birikim boşalırken admin önbelleklerinin sürekli silinmemesi için süreç başına
+en fazla BUMP_INTERVAL saniyede bir artırılır; arada kalan değişiklikler çalıştırma
+sonunda (veya boşta beklemeye geçerken) flush_catalog_version() ile yayınlanır.
+"""
+
+import time
+import threading
+
+BUMP_INTERVAL = 30
+
+_lock = threading.Lock()
+_pending = False
+_last_bump = 0.0
+
+def ensure_catalog_version(cur):
+    """catalog_version_seq sequence'ını (yoksa) oluşturur."""
+    cur.execute("CREATE SEQUENCE IF NOT EXISTS catalog_version_seq")
+
+def bump_catalog_version(cur):
+    """Sürümü hemen artırır (kilitsiz, commit beklemeden görünür). Veri commit'inden sonra çağrılmalı."""
+    cur.execute("SELECT nextval('catalog_version_seq')")
+
+def catalog_changed(conn):
+    """
+    Veri commit edildikten sonra çağrılır. Son artırımın üzerinden BUMP_INTERVAL geçtiyse
+    sürümü hemen artırır, geçmediyse değişikliği bekleyen olarak işaretler.
+    """
+    global _pending
+    with _lock:
+        _pending = True
+        due = time.monotonic() - _last_bump >= BUMP_INTERVAL
+    if due:
+        flush_catalog_version(conn)
+
+def flush_catalog_version(conn):
+    """Bekleyen değişiklik varsa sürümü artırır (çalıştırma sonunda / boşta beklerken)."""
+    global _pending, _last_bump
+    with _lock:
+        if not _pending:
+            return
+        _pending = False
+        _last_bump = time.monotonic()
+    try:
+        with conn.cursor() as cur:
+            bump_catalog_version(cur)
+        conn.commit()
+    except Exception as e:
+        print(f"⚠️ Katalog sürümü güncellenemedi: {e}")
+        conn.rollback()
+        with _lock:
+            _pending = True
+
+def get_catalog_version(cur):
+    cur.execute("SELECT last_value FROM catalog_version_seq")
+    row = cur.fetchone()
+    return row[0] if row else 0
@@ -41,7 +41,25 @@ def get_default_config():
         "thumbnails": {
             "size": 400,
             "quality": 70,
-            "google_drive_size": "s250"
+            "google_drive_size": "s250",
+            "store_dir": "/home/hsa/3d_asset_manager/thumbs",
+            "use_pack": False,
+            "previews": {
+                "enabled": False,
+                "format": "sheet",
+                "views": 6,
+                "size": 200
+            }
+        },
+        "render_cache": {
+            "enabled": True,
+            "dir": "/home/hsa/3d_asset_manager/render_cache",
+            "max_mb": 2048
+        },
+        "embeddings": {
+            "dir": "/home/hsa/3d_asset_manager/embeddings",
+            "ivf_min_rows": 50000,
+            "nprobe": 16
         },
         "temp_dir": "/home/hsa/3d_asset_manager/temp_work"
     }
@@ -110,6 +128,42 @@ def get_temp_dir():
     os.makedirs(temp_dir, exist_ok=True)
     return temp_dir
 
+def get_thumb_store_dir():
+    """İçerik adresli thumbnail deposunun kök klasörünü döndürür."""
+    config = load_config()
+    path = config.get("thumbnails", {}).get("store_dir", "/home/hsa/3d_asset_manager/thumbs")
+    os.makedirs(path, exist_ok=True)
+    return path
+
+def get_thumb_store_use_pack():
+    """Thumbnail okuyucuları mmap paket dosyasını kullansın mı?"""
+    config = load_config()
+    return bool(config.get("thumbnails", {}).get("use_pack", False))
+
+def get_preview_settings():
+    """
+    Çok açılı önizleme ayarları: enabled, format ("sheet" = JPEG sprite sheet,
+    "webp" = animasyonlu WebP), views (4-8 görünüm), size (görünüm başına piksel).
+    """
+    config = load_config()
+    defaults = get_default_config()["thumbnails"]["previews"]
+    return {**defaults, **config.get("thumbnails", {}).get("previews", {})}
+
+def get_render_cache_settings():
+    """Render sonuç önbelleği ayarları: enabled, dir, max_mb (LRU ile korunan disk sınırı)."""
+    config = load_config()
+    defaults = get_default_config()["render_cache"]
+    return {**defaults, **config.get("render_cache", {})}
+
+def get_embedding_settings():
+    """
+    CLIP vektör deposu ayarları: dir, ivf_min_rows (bu kadar satırdan sonra IVF indeksi
+    kullanılır, altında tam tarama), nprobe (IVF aramasında taranan küme sayısı).
+    """
+    config = load_config()
+    defaults = get_default_config()["embeddings"]
+    return {**defaults, **config.get("embeddings", {})}
+
 # Modül import edildiğinde config'i yükle
 CONFIG = load_config()
 
@@ -120,4 +174,5 @@ if __name__ == "__main__":
     print(f"Printerlar Klasörü: {get_printers_dir()}")
     print(f"Filamentler Klasörü: {get_filaments_dir()}")
     print(f"Temp Klasör: {get_temp_dir()}")
+    print(f"Thumbnail Deposu: {get_thumb_store_dir()}")
     print(f"Veritabanı: {get_db_config()}")
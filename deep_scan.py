@@ -1,27 +1,47 @@
 import os
-import io
 import sys
+import queue
+import shutil
+import argparse
+import tempfile
+import threading
 import psycopg2
-import zipfile
-import rarfile
-import py7zr
 import time
-import shutil
 import re
-from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
 from googleapiclient.errors import HttpError
 
 # Path ayarı
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from googleapiclient.http import MediaIoBaseDownload
-from app.indexer import get_drive_service, extract_best_image_recursive
-from app.renderer import render_3d_model
+from app.indexer import get_drive_service, get_drive_session
+from app.renderer import render_3d_views
+from app.archive import ArchiveReader, pick_image, pick_model, extracted_member, scratch_dir, MODEL_EXTS
+from app.thumb_store import get_thumb_store, ensure_thumb_columns
+from app.catalog import ensure_catalog_version, catalog_changed, flush_catalog_version
+from app.remote_zip import open_remote_zip, drive_media_url
+from app.events import emit, THUMBNAIL_READY
+from app.job_queue import ensure_job_queue, enqueue_missing, lease_jobs, complete_job, fail_job, queue_stats, worker_id
 
 # --- AYARLAR ---
 BASE_WORK_DIR = "/home/hsa/3d_asset_manager/temp_work"
 os.makedirs(BASE_WORK_DIR, exist_ok=True)
-MAX_WORKERS = 5  # Aynı anda işlenecek dosya sayısı
+MAX_JOBS_PER_RUN = 100
+
+# Aşamalı boru hattı: indirme (ağ) → çıkarma + render (CPU) → DB yazımı.
+# Her aşamanın kendi havuzu ve kuyruk sınırı var; dolan aşama bir öncekini bekletir,
+# böylece ne diskte indirilmiş dosya yığılır ne de render ağı bekler.
+DOWNLOAD_WORKERS = 8                                   # Eşzamanlı indirme
+RENDER_PROCESSES = max(1, (os.cpu_count() or 2) - 1)   # Render süreçleri (GIL'e takılmaz)
+DOWNLOAD_QUEUE = DOWNLOAD_WORKERS * 2                  # İndirme aşamasında bekleyebilecek iş
+RENDER_QUEUE = RENDER_PROCESSES * 2                    # İndirilmiş, render bekleyen dosya
+WRITE_BATCH = 20                                       # Tek commit'te yazılan sonuç
+WRITE_INTERVAL = 2.0
+PROGRESS_INTERVAL = 30.0
+
+ARCHIVE_EXTS = ('.zip', '.rar', '.cbz', '.cbr', '.7z')
 
 DB_CONFIG = {
     "dbname": "asset_db",
@@ -34,164 +54,416 @@ DB_CONFIG = {
 def get_db_connection():
     return psycopg2.connect(**DB_CONFIG)
 
-def find_files_recursively(directory):
-    """Arşiv içinde önce resim, sonra model arar."""
-    image_extensions = ('.jpg', '.jpeg', '.png', '.webp')
-    model_extensions = ('.stl', '.obj')
-    
-    found_image = None
-    found_model = None
+def archive_thumbnail(archive, tag, fname):
+    """Hibrit Arama: Resim > Model — sadece arşiv listesine bakılır, tek üye okunur/çıkarılır."""
+    blob = None
+    preview = None
+    members = archive.members()
+    image = pick_image(members)
+    model = None if image else pick_model(members)
 
-    for root, dirs, files in os.walk(directory):
-        # Gereksiz sistem dosyalarını ve Mac çöp dosyalarını atla
-        if "__MACOSX" in root or any(d.startswith('.') for d in root.split(os.sep)):
-            continue
-        
-        for file in files:
-            if file.startswith('.'): continue
-            file_lower = file.lower()
-            full_path = os.path.join(root, file)
-            
-            # 1. Resim (Öncelikli)
-            if not found_image and file_lower.endswith(image_extensions):
-                # 'render', 'preview' gibi kelimeler içerenlere öncelik ver
-                if any(x in file_lower for x in ['render', 'preview', 'display', 'screenshot']):
-                     return full_path, "image"
-                found_image = full_path
-            
-            # 2. Model
-            if not found_model and file_lower.endswith(model_extensions):
-                found_model = full_path
-                
-    # Eğer özel isimli resim bulamadıysak ama normal resim varsa onu döndür
-    if found_image: return found_image, "image"
-    if found_model: return found_model, "model"
-    
-    return None, None
+    if image:
+        print(f"    🖼️  [{tag}] Resim bulundu: {fname}")
+        blob = archive.read(image.name)
+    elif model:
+        print(f"    🎯 [{tag}] Model render ediliyor: {fname}")
+        with extracted_member(archive, model, BASE_WORK_DIR) as model_path:
+            blob, preview = render_3d_views(model_path)
+    else:
+        print(f"    ℹ️  [{tag}] İçerik bulunamadı: {fname}")
+    return blob, preview
 
-def process_single_asset(asset_data):
-    """Tek bir dosyayı indirip işleyen Worker Fonksiyonu"""
-    aid, fname, fpath = asset_data
-    # Her thread kendi temp klasörünü kullanmalı
-    thread_id = str(int(time.time() * 1000000) % 1000000)
-    local_filename = f"{thread_id}_{fname}"
-    local_path = os.path.join(BASE_WORK_DIR, local_filename)
-    
-    conn = None
+# --- 1. AŞAMA: İNDİRME (thread havuzu) ---
+
+_drive = threading.local()
+
+def drive_clients():
+    """Thread başına Drive servisi ve yetkili HTTP oturumu (googleapiclient thread-safe değil)."""
+    if not hasattr(_drive, "svc"):
+        _drive.svc = get_drive_service()
+        _drive.session = get_drive_session()
+    return _drive.svc, _drive.session
+
+def peek_remote_zip(session, file_id, tag, fname):
+    """
+    Drive'daki ZIP'i indirmeden HTTP Range ile okur (merkezi dizin + seçilen üye).
+    Görsel varsa doğrudan ('done', blob, None); model varsa sadece o üye yerel bir
+    klasöre çıkarılıp render aşamasına ('render', yol, uzantı, klasör) verilir.
+    ZIP değilse veya uzaktan okunamıyorsa None: çağıran tam indirmeye düşer.
+    """
+    try:
+        archive, remote = open_remote_zip(drive_media_url(file_id), session)
+        if archive is None:
+            return None
+        with archive:
+            members = archive.members()
+            image = pick_image(members)
+            model = None if image else pick_model(members)
+            if image:
+                print(f"    🖼️  [{tag}] Resim bulundu: {fname}")
+                result = ('done', archive.read(image.name), None)
+            elif model:
+                work_dir = tempfile.mkdtemp(prefix="deep_", dir=scratch_dir(model.size, BASE_WORK_DIR))
+                try:
+                    path = archive.extract(model.name, work_dir)
+                except Exception:
+                    shutil.rmtree(work_dir, ignore_errors=True)
+                    raise
+                result = ('render', path, os.path.splitext(path)[1].lower(), work_dir)
+            else:
+                print(f"    ℹ️  [{tag}] İçerik bulunamadı: {fname}")
+                result = ('done', None, None)
+        print(f"    ☁️  [{tag}] Uzak ZIP: {remote.requests} istek, {remote.bytes_fetched / 1024:.0f} KB "
+              f"(dosya {remote.size / 1024 / 1024:.1f} MB)")
+        return result
+    except Exception as e:
+        print(f"    ⚠️ [{tag}] Uzak ZIP okunamadı, indiriliyor ({fname}): {e}")
+        return None
+
+def fetch_asset(job):
+    """
+    Ağ aşaması: dosyayı (ZIP'lerde sadece gereken üyeyi) yerel diske getirir.
+    Dönüş: ('render', yol, uzantı, klasör) | ('done', blob, önizleme) | ('skip', sebep)
+    """
+    aid, fname, fpath, attempt = job
+    tag = f"#{aid}"
+    svc, session = drive_clients()
+
+    # Güvenli ID Çekme
+    match = re.search(r'[-\w]{25,}', fpath)
+    file_id = match.group() if match else None
+    if not file_id:
+        print(f"    🚨 [{tag}] Geçersiz Link: {fname}")
+        return ('skip', "geçersiz link")
+
+    ext = os.path.splitext(fname)[1].lower()
+    if session and ext in ('.zip', '.cbz'):
+        peeked = peek_remote_zip(session, file_id, tag, fname)
+        if peeked is not None:
+            return peeked
+
+    # Her iş kendi klasörüne iner: aynı adlı dosyalar ve paralel süreçler çakışmaz
+    work_dir = tempfile.mkdtemp(prefix="deep_", dir=BASE_WORK_DIR)
+    local_path = os.path.join(work_dir, fname)
     try:
+        print(f"⬇️  [{tag}] İndiriliyor: {fname}")
+        request = svc.files().get_media(fileId=file_id)
+        with open(local_path, "wb") as f:
+            downloader = MediaIoBaseDownload(f, request)
+            done = False
+            while not done: _, done = downloader.next_chunk()
+    except HttpError as e:
+        shutil.rmtree(work_dir, ignore_errors=True)
+        # Eğer hata "fileNotDownloadable" ise bu bir klasördür
+        if "fileNotDownloadable" in str(e):
+            print(f"    🚫 [{tag}] Bu bir KLASÖR (Atlandı): {fname}")
+            return ('skip', "klasör")
+        raise
+    except Exception:
+        shutil.rmtree(work_dir, ignore_errors=True)
+        raise
+    return ('render', local_path, ext, work_dir)
+
+# --- 2. AŞAMA: ÇIKARMA + RENDER (süreç havuzu) ---
+
+def render_file(path, ext, tag, fname):
+    """CPU aşaması (ayrı süreçte): model dosyasını ya da arşivdeki en iyi görsel/modeli işler."""
+    if ext in MODEL_EXTS:
+        print(f"    🎯 [{tag}] 3D Model Render Ediliyor: {fname}")
+        blob, preview = render_3d_views(path)
+        if not blob:
+            print(f"    ⚠️ [{tag}] Render başarısız (boş döndü)")
+        return blob, preview
+    if ext in ARCHIVE_EXTS:
+        with ArchiveReader(path) as archive:
+            return archive_thumbnail(archive, tag, fname)
+    print(f"    ⏭️  [{tag}] Desteklenmeyen format: {ext}")
+    return None, None
+
+def timed_call(fn, *args):
+    """Aşama metrikleri için çalışma süresini de döndürür (süreç havuzunda da çalışır)."""
+    start = time.perf_counter()
+    result = fn(*args)
+    return time.perf_counter() - start, result
+
+class Stage:
+    """
+    Boru hattının bir aşaması: havuz + sınırlı kuyruk + metrikler.
+    Kuyruk doluyken submit() bekler; bu bekleme bir önceki aşamaya geri basınçtır.
+    """
+    def __init__(self, name, executor, workers, depth):
+        self.name = name
+        self.executor = executor
+        self.workers = workers
+        self.depth = depth
+        self._slots = threading.BoundedSemaphore(depth)
+        self._lock = threading.Lock()
+        self.inflight = 0
+        self.peak = 0
+        self.done = 0
+        self.failed = 0
+        self.busy = 0.0     # İşlerin toplam çalışma süresi
+        self.stalled = 0.0  # Kuyruk dolu olduğu için submit'te beklenen süre
+
+    def submit(self, fn, *args, on_done):
+        start = time.monotonic()
+        self._slots.acquire()
+        with self._lock:
+            self.stalled += time.monotonic() - start
+            self.inflight += 1
+            self.peak = max(self.peak, self.inflight)
+        future = self.executor.submit(timed_call, fn, *args)
+        future.add_done_callback(partial(self._finish, on_done))
+
+    def _finish(self, on_done, future):
+        self._slots.release()
+        try:
+            elapsed, result = future.result()
+            error = None
+        except Exception as e:
+            elapsed, result, error = 0.0, None, e
+        with self._lock:
+            self.inflight -= 1
+            self.busy += elapsed
+            if error: self.failed += 1
+            else: self.done += 1
+        on_done(result, error)
+
+    def report(self, wall):
+        avg = self.busy / self.done if self.done else 0.0
+        usage = 100 * self.busy / (wall * self.workers) if wall else 0.0
+        return (f"{self.name:<8} {self.done + self.failed:5d} iş ({self.failed} hata), ort {avg:6.2f} sn, "
+                f"doluluk %{usage:3.0f}, tepe kuyruk {self.peak}/{self.depth}, geri basınç {self.stalled:.1f} sn")
+
+# --- 3. AŞAMA: DB YAZIMI (tek thread, toplu commit) ---
+
+class ResultWriter(threading.Thread):
+    """
+    Sonuçları kendi bağlantısıyla WRITE_BATCH'lik paketler halinde yazar: thumbnail'lar
+    ThumbStore'a, özetler assets'e; iş kuyruğu aynı transaction'da kapatılır.
+    Paket hata verirse sonuçlar tek tek yeniden denenir. Bağlantı koparsa bir kez yeniden
+    bağlanılır; o da olmazsa hata self.error'a yazılıp thread durur (yazılamayan işlerin
+    kiralamaları LEASE_SECONDS sonunda kendiliğinden düşer).
+    """
+    def __init__(self, owner):
+        super().__init__(name="deep-scan-writer", daemon=True)
+        self.owner = owner
+        self.store = get_thumb_store()
+        self.results = queue.Queue()
+        self.received = 0
+        self.written = 0
+        self.failed = 0
+        self.batches = 0
+        self.busy = 0.0
+        self.peak = 0
+        self.error = None
+        self.stopped = False
+        self._received = threading.Condition()
+
+    def put(self, job, status, blob=None, preview=None, error=None):
+        """status: 'ok' (thumbnail var), 'empty' (üretilemedi), 'skip' (kalıcı atla), 'error'."""
+        self.results.put((job, status, blob, preview, error))
+        with self._received:
+            self.received += 1
+            self.peak = max(self.peak, self.results.qsize())
+            self._received.notify_all()
+
+    def wait_for(self, count, timeout):
+        """count sonuç gelene ya da yazıcı durana kadar bekler."""
+        with self._received:
+            return self._received.wait_for(lambda: self.received >= count or self.stopped, timeout)
+
+    def close(self):
+        self.results.put(None)
+        self.join()
+
+    def run(self):
+        try:
+            self._run()
+        except Exception as e:
+            self.error = e
+            print(f"🔥 Yazıcı durdu, bekleyen {self.results.qsize()} sonuç yazılamadı "
+                  f"(kiralamalar süre dolunca geri düşer): {e}")
+        finally:
+            # wait_for'da bekleyen ana thread durumu hemen görsün
+            with self._received:
+                self.stopped = True
+                self._received.notify_all()
+
+    def _run(self):
         conn = get_db_connection()
         cur = conn.cursor()
-        svc = get_drive_service()
-        
-        # 1. Güvenli ID Çekme
-        match = re.search(r'[-\w]{25,}', fpath)
-        file_id = match.group() if match else None
+        batch = []
+        closing = False
+        while not closing:
+            deadline = time.monotonic() + WRITE_INTERVAL
+            while len(batch) < WRITE_BATCH:
+                try:
+                    item = self.results.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if item is None:
+                    closing = True
+                    break
+                batch.append(item)
+            if batch:
+                start = time.perf_counter()
+                try:
+                    self._flush(conn, cur, batch)
+                except psycopg2.Error as e:
+                    if not conn.closed:
+                        raise
+                    print(f"⚠️ Yazıcı bağlantısı koptu, yeniden bağlanılıyor: {e}")
+                    conn = get_db_connection()
+                    cur = conn.cursor()
+                    self._flush(conn, cur, batch)
+                self.busy += time.perf_counter() - start
+                batch = []
+        flush_catalog_version(conn)
+        cur.close(); conn.close()
 
-        if not file_id:
-            print(f"    🚨 [ID:{aid}] Geçersiz Link: {fname}")
+    def _write(self, cur, job, status, blob, preview, error):
+        aid, fname = job[0], job[1]
+        if status == 'ok':
+            cur.execute("UPDATE assets SET thumbnail_hash=%s, preview_hash=COALESCE(%s, preview_hash), thumbnail_attempts = 10 WHERE id=%s",
+                        (self.store.put(blob), self.store.put(preview) if preview else None, aid))
+            complete_job(cur, aid)
+            print(f"    ✅ [#{aid}] BAŞARILI: {fname}")
+        elif status == 'skip':
             cur.execute("UPDATE assets SET thumbnail_attempts = 99 WHERE id=%s", (aid,))
-            conn.commit()
-            return
+            complete_job(cur, aid)
+        elif status == 'empty':
+            cur.execute("UPDATE assets SET thumbnail_attempts = thumbnail_attempts + 1 WHERE id=%s", (aid,))
+            fail_job(cur, aid, self.owner, "resim/render üretilemedi")
+            print(f"    ❌ [#{aid}] Başarısız: {fname}")
+        else:
+            # Kiralama bırakılır: iş geri çekilme süresi sonunda yeniden denenir
+            fail_job(cur, aid, self.owner, error)
+            print(f"    🚨 [#{aid}] Kritik Hata ({fname}): {error}")
 
-        # 2. İndirme (KLASÖR KORUMASI EKLENDİ)
+    def _flush(self, conn, cur, batch):
         try:
-            print(f"⬇️  [T-{thread_id}] İndiriliyor: {fname}")
-            request = svc.files().get_media(fileId=file_id)
-            with open(local_path, "wb") as f:
-                downloader = MediaIoBaseDownload(f, request)
-                done = False
-                while not done: _, done = downloader.next_chunk()
-        
-        except HttpError as e:
-            # Eğer hata "fileNotDownloadable" ise bu bir klasördür
-            if "fileNotDownloadable" in str(e):
-                print(f"    🚫 [T-{thread_id}] Bu bir KLASÖR (Atlandı): {fname}")
-                cur.execute("UPDATE assets SET thumbnail_attempts = 99 WHERE id=%s", (aid,))
-                conn.commit()
-                return
-            else:
-                raise e
-
-        # 3. Dosya Türüne Göre İşleme
-        ext = os.path.splitext(local_path)[1].lower()
-        blob = None
-        
-        # DOĞRUDAN 3D MODEL DOSYALARI
-        if ext in ['.stl', '.obj']:
-            print(f"    🎯 [T-{thread_id}] 3D Model Render Ediliyor: {fname}")
-            try:
-                blob = render_3d_model(local_path)
-                if blob:
-                    print(f"    ✅ [T-{thread_id}] Render başarılı!")
-                else:
-                    print(f"    ⚠️ [T-{thread_id}] Render başarısız (boş döndü)")
-            except Exception as e:
-                print(f"    ❌ [T-{thread_id}] Render hatası: {e}")
-        
-        # ARŞİV DOSYALARI
-        elif ext in ['.zip', '.rar', '.cbz', '.cbr', '.7z']:
-            temp_extract_dir = os.path.join(BASE_WORK_DIR, f"ext_{thread_id}")
-            os.makedirs(temp_extract_dir, exist_ok=True)
-            
+            for item in batch:
+                self._write(cur, *item)
+            ready = [item[0][0] for item in batch if item[1] == 'ok']
+            if ready:
+                emit(cur, THUMBNAIL_READY, ready)
+            conn.commit()
+            if ready:
+                catalog_changed(conn)
+            self.written += len(batch)
+            self.batches += 1
+            return
+        except Exception as e:
+            if conn.closed:
+                raise
+            print(f"⚠️ Toplu yazım hatası, tek tek deneniyor: {e}")
+            conn.rollback()
+        for item in batch:
             try:
-                # Arşiv türüne göre aç
-                if ext == '.7z':
-                    with py7zr.SevenZipFile(local_path, mode='r') as a: a.extractall(path=temp_extract_dir)
-                elif ext in ['.zip', '.cbz']:
-                    with zipfile.ZipFile(local_path, 'r') as a: a.extractall(path=temp_extract_dir)
-                elif ext in ['.rar', '.cbr']:
-                    with rarfile.RarFile(local_path, 'r') as a: a.extractall(path=temp_extract_dir)
-                
-                # Hibrit Arama: Resim > Model
-                target_path, target_type = find_files_recursively(temp_extract_dir)
-                
-                if target_type == "image":
-                    print(f"    🖼️  [T-{thread_id}] Resim bulundu: {fname}")
-                    with open(target_path, "rb") as f: blob = f.read()
-                elif target_type == "model":
-                    print(f"    🎯 [T-{thread_id}] Model render ediliyor: {fname}")
-                    blob = render_3d_model(target_path)
-                else:
-                    print(f"    ℹ️  [T-{thread_id}] İçerik bulunamadı: {fname}")
-            
+                self._write(cur, *item)
+                if item[1] == 'ok':
+                    emit(cur, THUMBNAIL_READY, [item[0][0]])
+                conn.commit()
+                if item[1] == 'ok':
+                    catalog_changed(conn)
+                self.written += 1
             except Exception as e:
-                print(f"    ⚠️ [T-{thread_id}] Arşiv hatası ({fname}): {e}")
-            finally:
-                if os.path.exists(temp_extract_dir): shutil.rmtree(temp_extract_dir)
-        
-        else:
-            print(f"    ⏭️  [T-{thread_id}] Desteklenmeyen format: {ext}")
+                if conn.closed:
+                    raise
+                print(f"    ⚠️ Kayıt hatası (#{item[0][0]}): {e}")
+                conn.rollback()
+                self.failed += 1
+            self.batches += 1
+
+    def report(self, wall):
+        usage = 100 * self.busy / wall if wall else 0.0
+        return (f"{'yazım':<8} {self.written:5d} sonuç ({self.failed} hata), {self.batches} commit, "
+                f"doluluk %{usage:3.0f}, tepe kuyruk {self.peak}")
+
+def run_pipeline(cur, conn, limit, download_workers, render_processes):
+    """İşleri kiralayıp indirme → render → yazım aşamalarından geçirir. Dönüş: kiralanan iş sayısı."""
+    owner = worker_id()
+    start = time.monotonic()
+    processed = 0
 
-        # 4. Sonucu Kaydet
-        if blob:
-            cur.execute("UPDATE assets SET thumbnail_blob=%s, thumbnail_attempts = 10 WHERE id=%s", (blob, aid))
-            print(f"    ✅ [T-{thread_id}] BAŞARILI: {fname}")
+    # Süreç havuzu thread'ler başlamadan kurulur: fork, kilit tutan thread'leri kopyalamasın
+    render_pool = ProcessPoolExecutor(max_workers=render_processes)
+    render_pool.submit(os.getpid).result()
+    download_pool = ThreadPoolExecutor(max_workers=download_workers, thread_name_prefix="download")
+    downloads = Stage("indirme", download_pool, download_workers, max(download_workers, DOWNLOAD_QUEUE))
+    renders = Stage("render", render_pool, render_processes, max(render_processes, RENDER_QUEUE))
+    writer = ResultWriter(owner)
+    writer.start()
+
+    def on_rendered(job, work_dir, result, error):
+        shutil.rmtree(work_dir, ignore_errors=True)
+        if error:
+            writer.put(job, 'error', error=error)
         else:
-            cur.execute("UPDATE assets SET thumbnail_attempts = thumbnail_attempts + 1 WHERE id=%s", (aid,))
-            print(f"    ❌ [T-{thread_id}] Başarısız: {fname}")
-        
-        conn.commit()
+            blob, preview = result
+            writer.put(job, 'ok' if blob else 'empty', blob, preview)
 
-    except Exception as e:
-        print(f"    🚨 [T-{thread_id}] Kritik Hata ({fname}): {e}")
-        if conn: conn.rollback()
+    def on_fetched(job, result, error):
+        # İndirme thread'inde çalışır: render kuyruğu doluysa burada bekler (geri basınç)
+        try:
+            if error:
+                writer.put(job, 'error', error=error)
+            elif result[0] == 'render':
+                _, path, ext, work_dir = result
+                renders.submit(render_file, path, ext, f"#{job[0]}", job[1],
+                               on_done=partial(on_rendered, job, work_dir))
+            elif result[0] == 'skip':
+                writer.put(job, 'skip')
+            else:
+                writer.put(job, 'ok' if result[1] else 'empty', result[1], result[2])
+        except Exception as e:
+            writer.put(job, 'error', error=e)
+
+    try:
+        while processed < limit and not writer.stopped:
+            jobs = lease_jobs(cur, owner, min(download_workers, limit - processed))
+            conn.commit()
+            if not jobs:
+                break
+            for job in jobs:
+                downloads.submit(fetch_asset, job, on_done=partial(on_fetched, job))
+            processed += len(jobs)
+
+        # Tüm sonuçlar yazıcıya ulaşana kadar bekle, arada aşama doluluklarını göster.
+        # Yazıcı durduysa beklemek anlamsız: kalan işler kiralama süresi dolunca geri düşer.
+        while not writer.wait_for(processed, PROGRESS_INTERVAL):
+            print(f"📈 {writer.received}/{processed} | indirme {downloads.inflight}/{downloads.depth} | "
+                  f"render {renders.inflight}/{renders.depth} | yazım kuyruğu {writer.results.qsize()}")
     finally:
-        if conn: conn.close()
-        if os.path.exists(local_path): os.remove(local_path)
+        download_pool.shutdown(wait=True, cancel_futures=writer.stopped)
+        render_pool.shutdown(wait=True, cancel_futures=writer.stopped)
+        writer.close()
+
+    wall = time.monotonic() - start
+    if processed:
+        print(f"📊 Aşama metrikleri ({wall:.1f} sn, {processed / wall:.2f} iş/sn):")
+        for stage in (downloads, renders, writer):
+            print(f"    {stage.report(wall)}")
+    return processed
 
-def deep_scan():
-    print(f"🚀 Deep Scan (MULTI-THREAD x{MAX_WORKERS}) Başladı: {time.strftime('%H:%M:%S')}")
+def deep_scan(limit=MAX_JOBS_PER_RUN, download_workers=DOWNLOAD_WORKERS, render_processes=RENDER_PROCESSES):
+    print(f"🚀 Deep Scan (indirme x{download_workers}, render x{render_processes}) Başladı: {time.strftime('%H:%M:%S')}")
     
     try:
         conn = get_db_connection()
         cur = conn.cursor()
+        ensure_thumb_columns(cur)
+        ensure_catalog_version(cur)
+        ensure_job_queue(cur)
+        conn.commit()
         
         # ÖNCELİK KONTROL: Aynı klasörde aynı isimli resim varsa arşivi atla
         print("🔍 Öncelik analizi yapılıyor...")
         cur.execute("""
             SELECT a1.id, a1.filename, a1.folder_path 
             FROM assets a1
-            WHERE a1.thumbnail_blob IS NULL 
+            WHERE a1.thumbnail_hash IS NULL AND a1.thumbnail_blob IS NULL 
             AND a1.thumbnail_attempts < 3
             AND (a1.filename ILIKE '%.zip' OR a1.filename ILIKE '%.rar' OR a1.filename ILIKE '%.7z'
                  OR a1.filename ILIKE '%.stl' OR a1.filename ILIKE '%.obj')
@@ -224,30 +496,32 @@ def deep_scan():
         if skipped_count > 0:
             print(f"✅ {skipped_count} dosya atlandı (görsel zaten var)")
         
-        # 100 dosyalık paket çek
-        cur.execute("""
-            SELECT id, filename, filepath FROM assets 
-            WHERE thumbnail_blob IS NULL 
-            AND thumbnail_attempts < 3
-            ORDER BY id ASC LIMIT 100
-        """)
-        rows = cur.fetchall()
+        # Kuyruğu güncelle; işler indirme havuzu kadar paketler halinde kiralanır
+        added = enqueue_missing(cur)
+        conn.commit()
+        stats = queue_stats(cur)
+        print(f"📊 Kuyruk: {stats.get('pending', 0)} bekleyen ({stats['ready']} hazır, {added} yeni)")
+
+        processed = run_pipeline(cur, conn, limit, download_workers, render_processes)
         cur.close(); conn.close()
 
-        if not rows:
+        if not processed:
             print("💤 İşlenecek dosya kalmadı.")
             return
-
-        print(f"📊 Havuza {len(rows)} dosya gönderiliyor...")
         
-        with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
-            executor.map(process_single_asset, rows)
-        
-        print(f"\n🏁 DEEP SCAN TAMAMLANDI! {len(rows)} dosya işlendi.")
+        print(f"\n🏁 DEEP SCAN TAMAMLANDI! {processed} dosya işlendi.")
         print(f"⏰ Bitiş Zamanı: {time.strftime('%H:%M:%S')}")
             
     except Exception as e:
         print(f"❌ Ana Süreç Hatası: {e}")
 
+def main():
+    parser = argparse.ArgumentParser(description="Drive thumbnail derin taraması (indirme → render → yazım boru hattı)")
+    parser.add_argument("--limit", type=int, default=MAX_JOBS_PER_RUN, help="Bu çalıştırmada en fazla kaç iş")
+    parser.add_argument("--download-workers", type=int, default=DOWNLOAD_WORKERS, help="Eşzamanlı indirme sayısı")
+    parser.add_argument("--render-processes", type=int, default=RENDER_PROCESSES, help="Render süreç sayısı")
+    args = parser.parse_args()
+    deep_scan(args.limit, args.download_workers, args.render_processes)
+
 if __name__ == "__main__": 
-    deep_scan()
\ No newline at end of file
+    main()
\ No newline at end of file
@@ -0,0 +1,479 @@
+"""
+CLIP görsel vektör deposu ve benzerlik araması.
+ai_tagger her thumbnail için hesapladığı görsel vektörü (normalize edilmiş, float16)
+buraya ekler; "benzer modeller" ve metinden modele arama, modeli yeniden çalıştırmadan
+bu matris üzerinden yapılır.
+
+Dosyalar (config.json → embeddings.dir):
+    vectors.f16   N x DIM float16 matris; yalnızca sona eklenir, okuyucular np.memmap ile açar
+    ids.i64       satır başına asset id
+    meta.json     dim, model, count, index_count ve geçerli dosyaların adları. Okuyucular
+                  yalnızca count satıra bakar: yarım kalmış bir ekleme (çökme) görünmez,
+                  sonraki ekleme onu keser.
+    ivf.*.npz     IVF indeksi (build_index): küre üzerinde k-means merkezleri ve
+                  kümelere göre sıralanmış satırlar
+
+compact() ve build_index() mevcut dosyaların üzerine yazmaz: yeni dosyaları yeni adlarla
+(vectors.<nesil>.f16, ids.<nesil>.i64) yazar ve meta.json'u en son, atomik olarak
+değiştirerek yayınlar. Okuyucu ya eski ya yeni dosya takımını görür, asla karışığını.
+
+Aynı asset yeniden eklenirse en son satır geçerlidir; eski satırlar compact()'e kadar
+aramada maskelenir. Arama ivf_min_rows satırın altında tam matris çarpımıdır; üstünde
+(indeks kuruluysa) sorguya en yakın nprobe küme + indeksten sonra eklenen satırlar taranır.
+
+Kullanım:
+    python embedding_store.py --similar 1234          # Bu asset'e benzeyenler
+    python embedding_store.py --text "robot arm"      # Metinden arama (CLIP modelini yükler)
+    python embedding_store.py --build-index           # IVF indeksini (yeniden) kur
+    python embedding_store.py --compact               # Eski/silinmiş assetlerin satırlarını at
+"""
+
+import os
+import json
+import fcntl
+import argparse
+import tempfile
+import threading
+from contextlib import contextmanager
+
+import numpy as np
+
+import config
+
+VECTORS_NAME = "vectors.f16"
+IDS_NAME = "ids.i64"
+META_NAME = "meta.json"
+INDEX_NAME = "ivf.npz"      # Adı meta.json'a yazılmadan önceki depolardaki indeks
+LOCK_NAME = "store.lock"
+
+SEARCH_CHUNK = 65536          # Taramada bir seferde float32'ye çevrilen satır sayısı
+KMEANS_ITERS = 10
+KMEANS_SAMPLE_PER_LIST = 64   # k-means eğitim örneği: küme başına satır
+REINDEX_RATIO = 0.2           # İndeksten sonra eklenen satırlar bu oranı geçince yeniden kurulur
+
+def data_names(meta):
+    """meta.json'un işaret ettiği (vektör, id, indeks) dosya adları; indeks yoksa None."""
+    default_index = INDEX_NAME if meta.get("index_count") else None
+    return meta.get("vectors", VECTORS_NAME), meta.get("ids", IDS_NAME), meta.get("index", default_index)
+
+def normalize(vectors):
+    """Satırları birim uzunluğa getirir (kosinüs benzerliği = iç çarpım)."""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+class EmbeddingStore:
+    def __init__(self, root, ivf_min_rows=50000, nprobe=16):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+        self.ivf_min_rows = ivf_min_rows
+        self.nprobe = nprobe
+        self.dim = None
+        self.model = None
+        self.count = 0
+        self.index_count = 0
+        self.generation = 0
+        self.vectors = None
+        self.ids = np.zeros(0, dtype=np.int64)
+        self._asset_ids = np.zeros(0, dtype=np.int64)   # sıralı, tekil asset id'leri
+        self._asset_rows = np.zeros(0, dtype=np.int64)  # her asset'in geçerli (son) satırı
+        self._live = np.zeros(0, dtype=bool)
+        self._index = None
+        self._meta_mtime = None
+        self.refresh()
+
+    def _path(self, name):
+        return os.path.join(self.root, name)
+
+    def _read_meta(self):
+        try:
+            with open(self._path(META_NAME)) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def _write_meta(self, meta):
+        # Atomik yazım: okuyucular her zaman tutarlı bir count görür
+        fd, tmp = tempfile.mkstemp(dir=self.root, suffix=".tmp")
+        with os.fdopen(fd, "w") as f:
+            json.dump(meta, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self._path(META_NAME))
+
+    @contextmanager
+    def _lock(self):
+        """Yazıcılar arası kilit (ai_tagger tek seferlik + --listen aynı anda çalışabilir)."""
+        with open(self._path(LOCK_NAME), "w") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def refresh(self):
+        """Başka süreçlerin eklediği satırları görmek için meta.json değiştiyse yeniden açar."""
+        for _ in range(3):
+            try:
+                self._load()
+                return
+            except FileNotFoundError:
+                # Okuduğumuz meta'nın dosyalarını compact() o arada silmiş: yeni meta'yı oku
+                continue
+        self._load()
+
+    def _load(self):
+        try:
+            mtime = os.stat(self._path(META_NAME)).st_mtime_ns
+        except FileNotFoundError:
+            return
+        if mtime == self._meta_mtime:
+            return
+        meta = self._read_meta()
+        vectors_name, ids_name, index_name = data_names(meta)
+        count = meta["count"]
+        if count:
+            vectors = np.memmap(self._path(vectors_name), dtype=np.float16, mode="r",
+                                shape=(count, meta["dim"]))
+            ids = np.fromfile(self._path(ids_name), dtype=np.int64, count=count)
+        else:
+            vectors = np.zeros((0, meta["dim"]), dtype=np.float16)
+            ids = np.zeros(0, dtype=np.int64)
+        index = None
+        if meta.get("index_count") and index_name:
+            with np.load(self._path(index_name)) as z:
+                index = {name: z[name] for name in z.files}
+
+        self.dim = meta["dim"]
+        self.model = meta.get("model")
+        self.generation = meta.get("generation", 0)
+        self.vectors = vectors
+        self.ids = ids
+        # Her asset'in son satırı geçerlidir (ters çevrip ilk geçişi al)
+        asset_ids, first_in_reversed = np.unique(self.ids[::-1], return_index=True)
+        self._asset_ids = asset_ids
+        self._asset_rows = count - 1 - first_in_reversed
+        self._live = np.zeros(count, dtype=bool)
+        self._live[self._asset_rows] = True
+        self.count = count
+        self.index_count = meta.get("index_count", 0) if index else 0
+        self._index = index
+        self._meta_mtime = mtime
+
+    def __len__(self):
+        return len(self._asset_ids)
+
+    def row_of(self, asset_id):
+        i = np.searchsorted(self._asset_ids, asset_id)
+        if i < len(self._asset_ids) and self._asset_ids[i] == asset_id:
+            return int(self._asset_rows[i])
+        return None
+
+    def get(self, asset_id):
+        """Asset'in vektörü (float32), yoksa None."""
+        row = self.row_of(asset_id)
+        return None if row is None else self.vectors[row].astype(np.float32)
+
+    def missing(self, asset_ids):
+        """Verilen id'lerden vektörü olmayanlar."""
+        asset_ids = np.asarray(list(asset_ids), dtype=np.int64)
+        return asset_ids[~np.isin(asset_ids, self._asset_ids)].tolist()
+
+    def add(self, asset_ids, vectors, model=None):
+        """Vektörleri (normalize edilip float16 olarak) sona ekler."""
+        asset_ids = np.asarray(list(asset_ids), dtype=np.int64)
+        vectors = normalize(vectors).astype(np.float16)
+        if len(asset_ids) != len(vectors):
+            raise ValueError("id ve vektör sayısı farklı")
+        if not len(asset_ids):
+            return
+        with self._lock():
+            meta = self._read_meta() or {"dim": vectors.shape[1], "model": model, "count": 0, "index_count": 0}
+            if meta["dim"] != vectors.shape[1]:
+                raise ValueError(f"Vektör boyutu {vectors.shape[1]}, depo {meta['dim']}")
+            if model and meta.get("model") and model != meta["model"]:
+                raise ValueError(f"Depo {meta['model']} vektörleri içeriyor, {model} eklenemez")
+            count = meta["count"]
+            vectors_name, ids_name, _ = data_names(meta)
+            # Yarım kalmış önceki eklemeyi kes, sonra ekle; meta en son yazılır
+            for name, data, itemsize in ((vectors_name, vectors, 2 * meta["dim"]), (ids_name, asset_ids, 8)):
+                with open(self._path(name), "ab") as f:
+                    f.truncate(count * itemsize)
+                    f.write(data.tobytes())
+                    f.flush()
+                    os.fsync(f.fileno())
+            meta["count"] = count + len(asset_ids)
+            meta["model"] = meta.get("model") or model
+            self._write_meta(meta)
+        self.refresh()
+
+    # --- Arama ---
+
+    def _scan(self, query, rows, k):
+        """rows (None = tüm satırlar) içinde en yüksek k skor. Dönüş: (skorlar, satırlar)"""
+        total = self.count if rows is None else len(rows)
+        best_scores, best_rows = [], []
+        for start in range(0, total, SEARCH_CHUNK):
+            if rows is None:
+                r = np.arange(start, min(start + SEARCH_CHUNK, total))
+                block = self.vectors[start:start + len(r)]
+            else:
+                r = rows[start:start + SEARCH_CHUNK]
+                block = self.vectors[r]
+            scores = block.astype(np.float32) @ query
+            scores[~self._live[r]] = -np.inf
+            if len(scores) > k:
+                top = np.argpartition(-scores, k)[:k]
+                scores, r = scores[top], r[top]
+            best_scores.append(scores)
+            best_rows.append(r)
+        if not best_scores:
+            return np.zeros(0, dtype=np.float32), np.zeros(0, dtype=np.int64)
+        scores, rows = np.concatenate(best_scores), np.concatenate(best_rows)
+        order = np.argsort(-scores)[:k]
+        return scores[order], rows[order]
+
+    def _use_index(self):
+        return self._index is not None and self.count >= self.ivf_min_rows
+
+    def _probe_rows(self, query):
+        """Sorguya en yakın nprobe kümenin satırları + indeksten sonra eklenen satırlar."""
+        centroids, offsets, order = self._index["centroids"], self._index["offsets"], self._index["order"]
+        nprobe = min(self.nprobe, len(centroids))
+        probe = np.argpartition(-(centroids @ query), nprobe - 1)[:nprobe]
+        parts = [order[offsets[c]:offsets[c + 1]] for c in probe]
+        parts.append(np.arange(self.index_count, self.count))
+        return np.sort(np.concatenate(parts))
+
+    def search(self, vector, k=20, exclude=()):
+        """
+        Vektöre en benzer k asset. Dönüş: [(asset_id, skor), ...] (skor = kosinüs benzerliği).
+        Metin araması için vektör ClipTagger.encode_text ile üretilir.
+        """
+        self.refresh()
+        if not self.count:
+            return []
+        query = normalize(vector).reshape(-1)
+        exclude = set(exclude)
+        rows = self._probe_rows(query) if self._use_index() else None
+        scores, rows = self._scan(query, rows, k + len(exclude))
+        results = []
+        for score, row in zip(scores, rows):
+            if not np.isfinite(score):
+                break
+            asset_id = int(self.ids[row])
+            if asset_id in exclude:
+                continue
+            results.append((asset_id, float(score)))
+            if len(results) >= k:
+                break
+        return results
+
+    def similar(self, asset_id, k=20):
+        """Asset'e görsel olarak en benzer k asset (kendisi hariç). Vektörü yoksa []."""
+        self.refresh()
+        vector = self.get(asset_id)
+        if vector is None:
+            return []
+        return self.search(vector, k, exclude=(asset_id,))
+
+    # --- IVF indeksi ---
+
+    def _assign(self, rows_or_vectors, centroids):
+        """Her satırın en yakın merkezi (parça parça, bellek sınırlı)."""
+        n = len(rows_or_vectors)
+        out = np.empty(n, dtype=np.int32)
+        for start in range(0, n, SEARCH_CHUNK):
+            part = rows_or_vectors[start:start + SEARCH_CHUNK]
+            block = self.vectors[part] if part.dtype.kind == "i" else part
+            out[start:start + len(part)] = np.argmax(block.astype(np.float32) @ centroids.T, axis=1)
+        return out
+
+    def build_index(self, nlist=None, iters=KMEANS_ITERS, seed=0):
+        """
+        Geçerli satırlar üzerinde küresel k-means ile IVF indeksi kurar (varsayılan
+        nlist = √N). Eğitim bir örneklem üzerinde yapılır, sonra tüm satırlar atanır.
+        Dönüş: küme sayısı.
+        """
+        self.refresh()
+        live_rows = np.flatnonzero(self._live)
+        n = len(live_rows)
+        if not n:
+            return 0
+        built_count = self.count
+        built_generation = self.generation
+        nlist = min(n, nlist or max(1, int(np.sqrt(n))))
+        rng = np.random.default_rng(seed)
+
+        sample = np.sort(rng.choice(live_rows, min(n, nlist * KMEANS_SAMPLE_PER_LIST), replace=False))
+        train = self.vectors[sample].astype(np.float32)
+        centroids = train[rng.choice(len(train), nlist, replace=False)].copy()
+        for _ in range(iters):
+            assign = self._assign(train, centroids)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assign, train)
+            # Boş kalan küme rastgele bir örnekle yeniden başlar
+            empty = np.bincount(assign, minlength=nlist) == 0
+            sums[empty] = train[rng.choice(len(train), int(empty.sum()))]
+            centroids = normalize(sums)
+
+        assign = self._assign(live_rows, centroids)
+        order = live_rows[np.argsort(assign, kind="stable")]
+        offsets = np.concatenate([[0], np.cumsum(np.bincount(assign, minlength=nlist))])
+
+        # Yeni adla yazılıp meta.json ile yayınlanır; eski indeks ancak ondan sonra silinir
+        fd, tmp = tempfile.mkstemp(dir=self.root, prefix="ivf.", suffix=".npz")
+        with os.fdopen(fd, "wb") as f:
+            np.savez(f, centroids=centroids, offsets=offsets, order=order)
+            f.flush()
+            os.fsync(f.fileno())
+        with self._lock():
+            meta = self._read_meta()
+            if meta.get("generation", 0) != built_generation:
+                # Kurulum sürerken compact() satır numaralarını değiştirdi: indeks geçersiz
+                os.remove(tmp)
+                return 0
+            old_index = data_names(meta)[2]
+            meta.update(index=os.path.basename(tmp), index_count=built_count)
+            self._write_meta(meta)
+            self._remove(old_index)
+        self.refresh()
+        return nlist
+
+    def needs_index(self):
+        """Satır sayısı ivf_min_rows'u geçtiyse ve indeks yoksa ya da çok eskidiyse True."""
+        self.refresh()
+        if self.count < self.ivf_min_rows:
+            return False
+        return self._index is None or self.count - self.index_count > REINDEX_RATIO * self.index_count
+
+    def ensure_index(self):
+        """Gerekiyorsa IVF indeksini (yeniden) kurar. Dönüş: kuruldu mu."""
+        if not self.needs_index():
+            return False
+        print(f"🧭 IVF indeksi kuruluyor ({self.count:,} satır)...")
+        self.build_index()
+        return True
+
+    def _remove(self, name):
+        if not name:
+            return
+        try:
+            os.remove(self._path(name))
+        except FileNotFoundError:
+            pass
+
+    def compact(self, keep_ids=None):
+        """
+        Eski satırları (ve keep_ids verilirse orada olmayan assetleri) atarak dosyaları
+        yeni bir nesil olarak yeniden yazar; IVF indeksi düşer. Yeni dosyalar meta.json
+        değiştirilerek yayınlanır, eskileri ondan sonra silinir (çökme veya eşzamanlı
+        okuyucu hiçbir zaman yarım yazılmış dosya görmez). Dönüş: atılan satır sayısı.
+        """
+        with self._lock():
+            self._meta_mtime = None
+            self.refresh()
+            rows = np.flatnonzero(self._live)
+            if keep_ids is not None:
+                rows = rows[np.isin(self.ids[rows], np.asarray(list(keep_ids), dtype=np.int64))]
+            removed = self.count - len(rows)
+            if not removed:
+                return 0
+            meta = self._read_meta()
+            old_names = data_names(meta)
+            generation = meta.get("generation", 0) + 1
+            new_names = (f"vectors.{generation}.f16", f"ids.{generation}.i64")
+            for name, data in zip(new_names, (self.vectors[rows], self.ids[rows])):
+                with open(self._path(name), "wb") as f:
+                    f.write(np.ascontiguousarray(data).tobytes())
+                    f.flush()
+                    os.fsync(f.fileno())
+            meta.update(generation=generation, vectors=new_names[0], ids=new_names[1],
+                        index=None, count=len(rows), index_count=0)
+            self._write_meta(meta)
+            for name in old_names:
+                self._remove(name)
+        self.refresh()
+        return removed
+
+    def stats(self):
+        self.refresh()
+        return {
+            "rows": self.count,
+            "assets": len(self),
+            "dim": self.dim,
+            "model": self.model,
+            "index_lists": 0 if self._index is None else len(self._index["centroids"]),
+            "unindexed_rows": self.count - self.index_count if self._index is not None else self.count,
+            "size_mb": round(self.count * (self.dim or 0) * 2 / 1024 / 1024, 1),
+        }
+
+_store = None
+_store_lock = threading.Lock()
+
+def get_embedding_store():
+    """config.json'daki ayarlarla süreç başına tek bir EmbeddingStore döndürür."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            settings = config.get_embedding_settings()
+            _store = EmbeddingStore(settings["dir"], settings["ivf_min_rows"], settings["nprobe"])
+        return _store
+
+# --- Komut satırı ---
+
+DB_CONFIG = {
+    "dbname": "asset_db",
+    "user": "postgres",
+    "password": "gizli_sifre",
+    "host": "localhost",
+    "port": "5435"
+}
+
+def print_results(results):
+    import psycopg2
+    if not results:
+        print("⚠️ Sonuç yok.")
+        return
+    conn = psycopg2.connect(**DB_CONFIG)
+    cur = conn.cursor()
+    cur.execute("SELECT id, filename FROM assets WHERE id = ANY(%s)", ([aid for aid, _ in results],))
+    names = dict(cur.fetchall())
+    conn.close()
+    for asset_id, score in results:
+        print(f"  {score:.3f}  ID {asset_id}  {names.get(asset_id, '(silinmiş)')}")
+
+def main():
+    parser = argparse.ArgumentParser(description="CLIP vektör deposu: benzerlik araması ve bakım")
+    parser.add_argument("--similar", type=int, metavar="ASSET_ID", help="Bu asset'e görsel olarak benzeyenler")
+    parser.add_argument("--text", metavar="SORGU", help="Metinden modele arama (CLIP modelini yükler)")
+    parser.add_argument("-k", type=int, default=20, help="Sonuç sayısı (varsayılan 20)")
+    parser.add_argument("--build-index", action="store_true", help="IVF indeksini (yeniden) kur")
+    parser.add_argument("--compact", action="store_true", help="Eski ve silinmiş assetlerin satırlarını at")
+    args = parser.parse_args()
+
+    store = get_embedding_store()
+    if args.compact:
+        import psycopg2
+        conn = psycopg2.connect(**DB_CONFIG)
+        cur = conn.cursor()
+        cur.execute("SELECT id FROM assets")
+        keep = [row[0] for row in cur.fetchall()]
+        conn.close()
+        print(f"🧹 {store.compact(keep)} satır atıldı.")
+    if args.build_index:
+        print(f"🧭 IVF indeksi kuruldu: {store.build_index()} küme.")
+    if args.similar is not None:
+        print(f"🔎 ID {args.similar} için benzerler:")
+        print_results(store.similar(args.similar, args.k))
+    if args.text:
+        from ai_tagger import ClipTagger, MODEL_NAME
+        if store.model and store.model != MODEL_NAME:
+            print(f"⚠️ Depo {store.model} vektörleri içeriyor, sorgu {MODEL_NAME} ile kodlanıyor.")
+        query = ClipTagger().encode_text([args.text])[0]
+        print(f"🔎 \"{args.text}\" için sonuçlar:")
+        print_results(store.search(query, args.k))
+    print(f"📊 {store.stats()}")
+
+if __name__ == "__main__":
+    main()
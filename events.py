@@ -0,0 +1,120 @@
+"""
+Postgres LISTEN/NOTIFY üzerinde olay veriyolu (asset_events kanalı).
+Bileşenler birbirini tablo yoklayarak değil olaylarla tetikler:
+
+    asset_added / asset_changed   indexer      → worker kuyruğu, admin
+    thumbnail_ready               worker'lar   → ai_tagger --listen, admin
+    tags_ready                    ai_tagger    → admin
+
+emit() olayı çağıranın transaction'ına ekler: NOTIFY commit'te gider, rollback'te
+hiç gitmez; dinleyen taraf henüz görünmeyen bir satır için uyanmaz. Olaylar
+ipucudur, kalıcı değildir: dinleyen yokken gelen olay kaybolur. Bu yüzden her
+tüketici açılışta (ve arada bir) kendi birikimini tablodan da tarar.
+"""
+
+import json
+import time
+import select
+import threading
+from collections import deque
+
+import psycopg2
+
+EVENTS_CHANNEL = "asset_events"
+MAX_PAYLOAD = 7000          # NOTIFY sınırı 8000 bayt; id listeleri bu boyutta parçalanır
+
+ASSET_ADDED = "asset_added"
+ASSET_CHANGED = "asset_changed"
+THUMBNAIL_READY = "thumbnail_ready"
+TAGS_READY = "tags_ready"
+
+def emit(cur, event, ids=None, **fields):
+    """Olayı çağıranın transaction'ına ekler (commit'te yayınlanır). ids uzunsa birden çok NOTIFY."""
+    base = {"event": event, "ts": round(time.time(), 3), **fields}
+    if not ids:
+        cur.execute("SELECT pg_notify(%s, %s)", (EVENTS_CHANNEL, json.dumps(base)))
+        return
+    ids = list(ids)
+    # Yaklaşık parça boyu: id başına en fazla ~12 karakter
+    step = max(1, (MAX_PAYLOAD - len(json.dumps(base))) // 12)
+    for i in range(0, len(ids), step):
+        payload = json.dumps({**base, "ids": ids[i:i + step]})
+        cur.execute("SELECT pg_notify(%s, %s)", (EVENTS_CHANNEL, payload))
+
+class EventListener:
+    """
+    asset_events kanalını dinleyen ayrı (autocommit) bağlantı.
+    wait() olay gelene ya da süre dolana kadar bekler, gelen olayları dict listesi olarak verir.
+    """
+
+    def __init__(self, db_config, channel=EVENTS_CHANNEL):
+        self.conn = psycopg2.connect(**db_config)
+        self.conn.set_session(autocommit=True)
+        self.conn.cursor().execute(f"LISTEN {channel}")
+
+    def wait(self, timeout, stop=None):
+        """En fazla timeout saniye bekler; stop (threading.Event) verilirse her saniye kontrol edilir."""
+        deadline = time.monotonic() + timeout
+        while not (stop and stop.is_set()):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return []
+            if select.select([self.conn], [], [], min(1.0, remaining)) != ([], [], []):
+                self.conn.poll()
+                if self.conn.notifies:
+                    events = [self._decode(n.payload) for n in self.conn.notifies]
+                    self.conn.notifies.clear()
+                    return events
+        return []
+
+    @staticmethod
+    def _decode(payload):
+        try:
+            return json.loads(payload)
+        except ValueError:
+            return {"event": payload}
+
+    def close(self):
+        self.conn.close()
+
+class EventFeed(threading.Thread):
+    """
+    Arka planda dinleyip son olayları bellekte tutan abone (admin canlı görünümü için).
+    seq her olayda artar; wait_for_new(seq) yeni olay gelene kadar bekler.
+    Bağlantı koparsa kendiliğinden yeniden bağlanır.
+    """
+
+    def __init__(self, db_config, maxlen=200, reconnect_delay=10):
+        super().__init__(name="event-feed", daemon=True)
+        self.db_config = db_config
+        self.reconnect_delay = reconnect_delay
+        self.events = deque(maxlen=maxlen)
+        self.seq = 0
+        self.connected = False
+        self._cond = threading.Condition()
+
+    def run(self):
+        while True:
+            try:
+                listener = EventListener(self.db_config)
+                self.connected = True
+                while True:
+                    events = listener.wait(60)
+                    if events:
+                        with self._cond:
+                            self.events.extend(events)
+                            self.seq += len(events)
+                            self._cond.notify_all()
+            except psycopg2.Error:
+                self.connected = False
+                time.sleep(self.reconnect_delay)
+
+    def wait_for_new(self, seq, timeout):
+        """seq'den sonra olay gelirse True (süre dolarsa False)."""
+        with self._cond:
+            return self._cond.wait_for(lambda: self.seq > seq, timeout)
+
+    def recent(self, n=20):
+        """En yeni n olay, yeniden eskiye."""
+        with self._cond:
+            return list(self.events)[-n:][::-1]
@@ -6,6 +6,7 @@ import psycopg2
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from app.indexer import get_drive_service
+from app.catalog import ensure_catalog_version, catalog_changed, flush_catalog_version
 
 DB_CONFIG = {
     "dbname": "asset_db",
@@ -45,6 +46,8 @@ def fix_names():
     try:
         conn = psycopg2.connect(**DB_CONFIG)
         cur = conn.cursor()
+        ensure_catalog_version(cur)
+        conn.commit()
         
         # Google Drive kaynaklarının gerçek isimlerini çek
         if svc:
@@ -64,6 +67,7 @@ def fix_names():
                         cur.execute("UPDATE source SET name=%s WHERE id=%s", (clean_name, sid))
                         print(f"  ✏️ ID {sid}: {old_name} -> {clean_name}")
                         conn.commit()
+                        catalog_changed(conn)
                 except Exception as e:
                     print(f"  ⚠️ ID {sid} hatası: {e}")
         
@@ -78,7 +82,9 @@ def fix_names():
                 cur.execute("UPDATE source SET name=%s WHERE id=%s", (clean_name, sid))
                 print(f"  ✏️ DB: {name} -> {clean_name}")
                 conn.commit()
+                catalog_changed(conn)
         
+        flush_catalog_version(conn)
         cur.close()
         conn.close()
         print("\n✅ İsim düzeltme tamamlandı!")
@@ -1,14 +1,29 @@
 import os
 import sys
+import argparse
 import psycopg2
-import zipfile
-import rarfile
+from psycopg2.extras import execute_values
 import io
+import json
 import requests
 import shutil
+import time
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, wait, FIRST_COMPLETED
 from PIL import Image
 from google.oauth2 import service_account
+from google.auth.transport.requests import AuthorizedSession
 from googleapiclient.discovery import build
+from googleapiclient.errors import HttpError
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.thumb_store import get_thumb_store, ensure_thumb_columns
+from app.catalog import ensure_catalog_version, catalog_changed, flush_catalog_version
+from app.archive import ArchiveReader, rank_image_members, is_multipart_rar, multipart_rar_index
+from app.job_queue import ensure_job_queue, enqueue_missing
+from app.events import emit, ASSET_ADDED, ASSET_CHANGED
 
 # --- BU SATIR ÇALIŞTIĞINI KANITLAR ---
 print("🚀 Indexer Scripti Yüklendi...")
@@ -34,210 +49,849 @@ def get_drive_service():
     creds = service_account.Credentials.from_service_account_file(CREDENTIALS)
     return build('drive', 'v3', credentials=creds)
 
+def get_drive_session():
+    """Drive'a doğrudan HTTP (ör. Range) istekleri için yetkili requests oturumu; token kendiliğinden yenilenir."""
+    if not os.path.exists(CREDENTIALS):
+        return None
+    creds = service_account.Credentials.from_service_account_file(
+        CREDENTIALS, scopes=['https://www.googleapis.com/auth/drive.readonly'])
+    return AuthorizedSession(creds)
+
+THUMB_SIZE = (400, 400)
+MAX_DECODE_PIXELS = 80_000_000   # draft sonrası hâlâ bundan büyük görseller çözülmez
+MAX_DECODE_ATTEMPTS = 3          # kazanan bozuksa en fazla bu kadar adaya düşülür
+
 def process_image(image_data):
     try:
         img = Image.open(io.BytesIO(image_data))
+        # JPEG'ler DCT ölçeklemesiyle (1/2..1/8) doğrudan küçük çözülür; diğer formatlarda etkisiz
+        img.draft(None, THUMB_SIZE)
+        # MAX_IMAGE_PIXELS kapalı olduğu için dev görselleri burada reddet
+        if img.width * img.height > MAX_DECODE_PIXELS: return None
         if img.mode in ("RGBA", "P", "CMYK"): img = img.convert("RGB")
-        img.thumbnail((400, 400))
+        img.thumbnail(THUMB_SIZE)
         output = io.BytesIO()
         img.save(output, format="JPEG", quality=75)
         return output.getvalue()
     except: return None
 
-def score_filename(filename):
-    fn = filename.lower()
-    score = 0
-    if 'render' in fn: score += 100
-    if 'preview' in fn: score += 80
-    if 'main' in fn: score += 70
-    if 'thumb' in fn: score += 60
-    if fn.endswith('.jpg') or fn.endswith('.jpeg'): score += 10
-    return score
-
 def extract_best_image_recursive(file_path):
-    best_img = None
-    best_score = -1
-    
-    if file_path.lower().endswith('.rar') and not shutil.which("unrar"):
-        print("⚠️ Uyarı: 'unrar' komutu bulunamadı.")
-        return None
-
+    """Arşiv listesinden görselleri puanlar, sadece kazananı okuyup thumbnail'a çevirir."""
     try:
-        ext = os.path.splitext(file_path)[1].lower()
-        archive = None
-        file_list = []
-        
-        if ext in ['.zip', '.cbz']: 
-            if not zipfile.is_zipfile(file_path): return None
-            archive = zipfile.ZipFile(file_path, 'r')
-            file_list = archive.infolist()
-        elif ext in ['.rar', '.cbr']: 
-            if not rarfile.is_rarfile(file_path): return None
-            archive = rarfile.RarFile(file_path, 'r')
-            file_list = archive.infolist()
-        
-        if not archive: return None
-
-        for info in file_list:
-            if "__MACOSX" in info.filename or info.filename.startswith('.'): continue
-            if info.filename.lower().endswith(('.jpg', '.jpeg', '.png', '.webp')):
-                current_score = score_filename(info.filename) + (info.file_size / 1024 / 1024)
-                if current_score > best_score:
-                    try:
-                        data = archive.read(info)
-                        processed = process_image(data)
-                        if processed:
-                            best_img = processed
-                            best_score = current_score
-                    except: pass
-        archive.close()
+        with ArchiveReader(file_path) as archive:
+            if archive.kind == 'rar' and not shutil.which("unrar"):
+                print("⚠️ Uyarı: 'unrar' komutu bulunamadı.")
+                return None
+            return best_image_from_archive(archive)
     except: pass
+    return None
+
+def best_image_from_archive(archive):
+    """Açık bir ArchiveReader'da (yerel ya da uzak) en iyi görseli thumbnail'a çevirir."""
+    best_img = None
+    # Sadece kazananı çöz; okunamazsa sıradaki adaya düş
+    for member in rank_image_members(archive.members())[:MAX_DECODE_ATTEMPTS]:
+        try:
+            best_img = process_image(archive.read(member.name))
+        except: best_img = None
+        if best_img: break
     return best_img
 
-def is_multipart_rar(filename):
-    """Checks if file is a multi-part RAR: .part1.rar, .part2.rar, .r00, .r01 etc."""
-    fn = filename.lower()
-    import re
-    return bool(re.search(r'\.part\d+\.rar$', fn)) or bool(re.search(r'\.r\d+$', fn))
+# Tüm asset upsert'leri: yeniden taramada isim/klasör/boyut güncellenir, yeni thumbnail
+# yoksa (Drive vermedi, arşivden çıkarılamadı) worker'ın ürettiği mevcut thumbnail silinmez.
+# Thumbnail'ın kendisi ThumbStore'da, tabloda sadece SHA-256 özeti tutulur.
+# Hiçbir alanı değişmeyen satır güncellenmez ve dönmez; dönenlerde inserted=True yeni kayıttır
+# (asset_added / asset_changed olayları buradan çıkar).
+ASSET_UPSERT_SQL = """
+    INSERT INTO {table} (filename, filepath, source_id, file_size, thumbnail_hash, folder_path)
+    VALUES %s
+    ON CONFLICT (filepath) DO UPDATE SET filename=EXCLUDED.filename, folder_path=EXCLUDED.folder_path,
+        file_size=EXCLUDED.file_size, thumbnail_hash=COALESCE(EXCLUDED.thumbnail_hash, {table}.thumbnail_hash)
+    WHERE ({table}.filename, {table}.folder_path, {table}.file_size, {table}.thumbnail_hash)
+        IS DISTINCT FROM (EXCLUDED.filename, EXCLUDED.folder_path, EXCLUDED.file_size,
+                          COALESCE(EXCLUDED.thumbnail_hash, {table}.thumbnail_hash))
+    RETURNING id, (xmax = 0) AS inserted
+"""
+MANIFEST_UPSERT_SQL = """
+    INSERT INTO local_manifest (path, source_id, file_size, mtime_ns, inode) VALUES %s
+    ON CONFLICT (path) DO UPDATE SET source_id=EXCLUDED.source_id, file_size=EXCLUDED.file_size,
+        mtime_ns=EXCLUDED.mtime_ns, inode=EXCLUDED.inode, indexed_at=CURRENT_TIMESTAMP
+"""
+DRIVE_FOLDER_UPSERT_SQL = """
+    INSERT INTO drive_folders (source_id, folder_id, parent_id, path, retry_crawl) VALUES %s
+    ON CONFLICT (source_id, folder_id) DO UPDATE SET
+        parent_id=EXCLUDED.parent_id, path=EXCLUDED.path, retry_crawl=EXCLUDED.retry_crawl
+"""
+
+class AssetWriter:
+    """
+    Asset upsert'leri için write-behind tampon. Satırlar batch_size satırda veya
+    flush_interval saniyede bir tek execute_values + tek commit ile yazılır.
+    Toplu yazım hata verirse batch satır satır yeniden denenir: hatalı satır
+    sadece kendisini düşürür, diğerleri kaydedilir.
+    Thumbnail baytları eklenirken ThumbStore'a yazılır, satıra özeti konur.
+    Akış yavaşsa (uzun listeleme/render) satırlar add() beklenmeden yazılsın diye üretici
+    döngüleri flush_timeout() kadar bekleyip maybe_flush() çağırır.
+    """
+    def __init__(self, cur, conn, batch_size=500, flush_interval=5.0, table="assets", store=None):
+        self.cur = cur
+        self.conn = conn
+        self.store = store or get_thumb_store()
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.table = table
+        self.sql = ASSET_UPSERT_SQL.format(table=table)
+        self.rows = {}      # filepath -> (asset satırı, manifest satırı | None)
+        self.folders = {}   # (source_id, folder_id) -> drive_folders satırı
+        self.last_flush = time.monotonic()
+        self.written = 0
+        self.failed = 0
+
+    def add(self, row, manifest=None):
+        """row: (filename, filepath, source_id, file_size, thumbnail_blob, folder_path)
+        manifest: (path, source_id, (size, mtime_ns, inode)) — sadece asset yazılırsa kaydedilir."""
+        if row[4]:
+            row = row[:4] + (self.store.put(row[4]),) + row[5:]
+        if manifest:
+            path, source_id, (size, mtime, inode) = manifest
+            manifest = (path, source_id, size, mtime, inode)
+        # Aynı batch'te aynı filepath iki kez olursa ON CONFLICT hata verir: sonuncusu kazanır
+        self.rows.pop(row[1], None)
+        self.rows[row[1]] = (row, manifest)
+        self.maybe_flush()
+
+    def add_drive_folder(self, source_id, folder_id, parent_id, path, retry_crawl=None):
+        self.folders[(source_id, folder_id)] = (source_id, folder_id, parent_id, path, retry_crawl)
+        self.maybe_flush()
+
+    def flush_timeout(self):
+        """Zamanlı flush'a kalan saniye (wait() zaman aşımı olarak kullanılır)."""
+        return max(0.0, self.last_flush + self.flush_interval - time.monotonic())
+
+    def maybe_flush(self):
+        if len(self.rows) + len(self.folders) >= self.batch_size or \
+                time.monotonic() - self.last_flush >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        entries = list(self.rows.values())
+        folders = list(self.folders.values())
+        self.rows = {}
+        self.folders = {}
+        self.last_flush = time.monotonic()
+        if not entries and not folders:
+            return
+        changed = []
+        try:
+            if entries:
+                changed = execute_values(self.cur, self.sql, [row for row, _ in entries],
+                                         page_size=len(entries), fetch=True)
+                self._emit(changed)
+                manifests = [m for _, m in entries if m]
+                if manifests:
+                    execute_values(self.cur, MANIFEST_UPSERT_SQL, manifests, page_size=len(manifests))
+            if folders:
+                execute_values(self.cur, DRIVE_FOLDER_UPSERT_SQL, folders, page_size=len(folders))
+            self.conn.commit()
+            self.written += len(entries)
+            self._catalog_changed(changed)
+        except Exception as e:
+            print(f"⚠️ Toplu yazım hatası, satır satır deneniyor: {e}")
+            self.conn.rollback()
+            self._flush_one_by_one(entries, folders)
+
+    def _flush_one_by_one(self, entries, folders):
+        changed = []
+        for row, manifest in entries:
+            try:
+                row_changed = execute_values(self.cur, self.sql, [row], fetch=True)
+                self._emit(row_changed)
+                if manifest:
+                    execute_values(self.cur, MANIFEST_UPSERT_SQL, [manifest])
+                self.conn.commit()
+                self.written += 1
+                changed += row_changed
+            except Exception as e:
+                print(f"    ⚠️ Kayıt hatası ({row[0][:40]}): {e}")
+                self.conn.rollback()
+                self.failed += 1
+        self._catalog_changed(changed)
+        for folder in folders:
+            try:
+                execute_values(self.cur, DRIVE_FOLDER_UPSERT_SQL, [folder])
+                self.conn.commit()
+            except Exception as e:
+                print(f"⚠️ Klasör haritası hatası: {e}")
+                self.conn.rollback()
+
+    def _catalog_changed(self, changed):
+        """
+        Katalog sürümü sadece upsert gerçekten satır değiştirdiyse artırılır: değişmeyen
+        yeniden tarama admin önbelleklerini boşaltmaz. Benchmark tabloları sürüme dokunmaz.
+        """
+        if changed and self.table == "assets":
+            catalog_changed(self.conn)
+
+    def _emit(self, changed):
+        """Upsert'ün döndürdüğü (id, inserted) satırlarından olay üretir (commit'le birlikte gider)."""
+        if self.table != "assets" or not changed:
+            return
+        added = [aid for aid, inserted in changed if inserted]
+        updated = [aid for aid, inserted in changed if not inserted]
+        if added:
+            emit(self.cur, ASSET_ADDED, added)
+        if updated:
+            emit(self.cur, ASSET_CHANGED, updated)
+
+    def close(self):
+        self.flush()
+        if self.table == "assets":
+            flush_catalog_version(self.conn)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
 
-def multipart_rar_index(filename):
-    """Returns part number from multi-part RAR filename, or 0 if not detected."""
-    import re
-    m = re.search(r'\.part(\d+)\.rar$', filename.lower())
-    if m: return int(m.group(1))
-    m = re.search(r'\.r(\d+)$', filename.lower())
-    if m: return int(m.group(1)) + 1  # .r00 = part2
-    return 0
+DRIVE_FOLDER_MIME = 'application/vnd.google-apps.folder'
+DRIVE_FILE_FIELDS = "id, name, mimeType, size, thumbnailLink, webViewLink, parents, trashed"
+DRIVE_CRAWL_WORKERS = 12       # Aynı anda listelenen kardeş klasör sayısı
+LOCAL_SCAN_WORKERS = max(1, (os.cpu_count() or 2) - 1)  # Yerel thumbnail üreten süreç sayısı
+DRIVE_REQUESTS_PER_SEC = 10.0  # Drive API çağrıları için başlangıç hızı (token bucket)
 
+# Thumbnail indirmeleri için ortak, bağlantı havuzlu HTTP oturumu
+HTTP_SESSION = requests.Session()
+HTTP_SESSION.mount("https://", requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=32))
 
+class TokenBucket:
+    """
+    Thread-safe token bucket. Drive rate limit hatası gelince hızı yarıya indirir,
+    başarılı çağrılarda yavaşça başlangıç hızına geri döner (AIMD).
+    """
+    def __init__(self, rate, capacity=None):
+        self.max_rate = rate
+        self.rate = rate
+        self.capacity = capacity or rate
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait_s = (1 - self.tokens) / self.rate
+            time.sleep(wait_s)
+
+    def throttle(self):
+        with self.lock:
+            self.rate = max(0.5, self.rate / 2)
+            self.tokens = 0
+
+    def recover(self):
+        with self.lock:
+            self.rate = min(self.max_rate, self.rate + 0.1)
+
+DRIVE_BUCKET = TokenBucket(DRIVE_REQUESTS_PER_SEC)
+# Drive'ın 403 ile döndüğü kota hataları (diğer 403'ler yetki hatasıdır, tekrar denenmez)
+DRIVE_RATE_LIMIT_REASONS = {'rateLimitExceeded', 'userRateLimitExceeded'}
+
+def http_error_reasons(e):
+    """HttpError gövdesindeki hata nedenleri (error.errors[].reason)."""
+    details = getattr(e, 'error_details', None)
+    if isinstance(details, list):
+        reasons = {d.get('reason') for d in details if isinstance(d, dict)} - {None}
+        if reasons:
+            return reasons
+    try:
+        body = json.loads(e.content.decode('utf-8'))
+        return {err.get('reason') for err in body.get('error', {}).get('errors', [])} - {None}
+    except (ValueError, AttributeError):
+        return set()
+
+def drive_execute(request, retries=6):
+    """
+    Drive API isteğini token bucket üzerinden çalıştırır; rate limit ve sunucu hatalarında
+    geri çekilip tekrar dener. Deneme hakkı biterse son hata fırlatılır.
+    """
+    for attempt in range(retries):
+        DRIVE_BUCKET.acquire()
+        try:
+            result = request.execute()
+            DRIVE_BUCKET.recover()
+            return result
+        except HttpError as e:
+            status = getattr(e.resp, 'status', 0)
+            rate_limited = status == 429 or (status == 403 and http_error_reasons(e) & DRIVE_RATE_LIMIT_REASONS)
+            if (rate_limited or status >= 500) and attempt < retries - 1:
+                DRIVE_BUCKET.throttle()
+                time.sleep(min(32, 2 ** attempt) + random.random())
+                continue
+            raise
+
+def fetch_drive_thumbnail(item):
+    """Drive öğesinin thumbnailLink'inden s250 boyutunda küçük resmi indirir."""
+    if 'thumbnailLink' not in item:
+        return None
+    try:
+        return HTTP_SESSION.get(item['thumbnailLink'].split('=')[0] + "=s250", timeout=5).content
+    except: return None
+
+def list_drive_children(service, folder_id):
+    """Klasörün doğrudan çocuklarını (tüm sayfalarıyla) listeler."""
+    items = []
     token = None
     while True:
-        try:
-            results = service.files().list(
-                q=f"'{folder_id}' in parents and trashed=false",
-                fields="nextPageToken, files(id, name, mimeType, size, thumbnailLink, webViewLink, parents)",
-                pageToken=token, pageSize=100
-            ).execute()
-            
-            files = results.get('files', [])
-            if not files: break
+        results = drive_execute(service.files().list(
+            q=f"'{folder_id}' in parents and trashed=false",
+            fields=f"nextPageToken, files({DRIVE_FILE_FIELDS})",
+            pageToken=token, pageSize=1000
+        ))
+        items.extend(results.get('files', []))
+        token = results.get('nextPageToken')
+        if not token: break
+    return items
 
-            # Dosya türlerine göre ayır
-            folders = [f for f in files if f.get('mimeType') == 'application/vnd.google-apps.folder']
-            direct_files = [f for f in files if f.get('mimeType') != 'application/vnd.google-apps.folder']
+def plan_drive_files(direct_files, has_subfolders, source_id, path):
+    """
+    Bir Drive klasörünün doğrudan dosyalarından yazılacak asset satırlarını hazırlar
+    (thumbnail indirmeleri dahil). [(log_mesajı, upsert_parametreleri), ...] döndürür.
+    """
+    rows = []
+    # Eğer bu klasörde SADECE DOSYALAR varsa → Grupla ve kaydet
+    if direct_files and not has_subfolders:
+        # Dosya türlerine göre grupla
+        images = []
+        archives = []
+        models = []
+        
+        for item in direct_files:
+            fname_lower = item['name'].lower()
+            if fname_lower.endswith(('.jpg', '.jpeg', '.png', '.webp', '.bmp', '.gif')):
+                images.append(item)
+            elif fname_lower.endswith(('.zip', '.rar', '.7z', '.cbz', '.cbr')):
+                archives.append(item)
+            elif fname_lower.endswith(('.stl', '.obj', '.fbx', '.blend', '.step', '.3ds', '.dae')):
+                models.append(item)
+        
+        # GRUPLAMA: Eğer model/arşiv varsa tek kayıt yap
+        if archives or models:
+            # Klasör adını asset ismi olarak kullan (path'in son kısmı)
+            asset_name = path.split('/')[-1] if path else "Root"
             
-            # Eğer alt klasör VARSA → Sadece recursive tara, burada kayıt yapma
-            if folders:
-                for folder_item in folders:
-                    folder_name = folder_item['name']
-                    new_path = f"{path}/{folder_name}" if path else folder_name
-                    print(f"📂 Klasör: {new_path}")
-                    scan_drive(service, folder_item['id'], source_id, cur, conn, new_path)
+            # Thumbnail: Önce görsel ara, yoksa model/arşiv dosyasının kendi Drive thumbnail'ı
+            thumb_blob = None
+            if images:
+                thumb_blob = fetch_drive_thumbnail(images[0])
+            
+            # Çok parçalı RAR'ları grupla: sadece part1'i (veya en küçük parçayı) kaydet
+            multipart_rars = [a for a in archives if is_multipart_rar(a['name'])]
+            normal_archives = [a for a in archives if not is_multipart_rar(a['name'])]
             
-            # Eğer bu klasörde SADECE DOSYALAR varsa → Grupla ve kaydet
-            if direct_files and not folders:
-                # Dosya türlerine göre grupla
-                images = []
-                archives = []
-                models = []
-                
-                for item in direct_files:
-                    fname_lower = item['name'].lower()
-                    if fname_lower.endswith(('.jpg', '.jpeg', '.png', '.webp', '.bmp', '.gif')):
-                        images.append(item)
-                    elif fname_lower.endswith(('.zip', '.rar', '.7z', '.cbz', '.cbr')):
-                        archives.append(item)
-                    elif fname_lower.endswith(('.stl', '.obj', '.fbx', '.blend', '.step', '.3ds', '.dae')):
-                        models.append(item)
-                
-                # GRUPLAMA: Eğer model/arşiv varsa tek kayıt yap
-                if archives or models:
-                    # Klasör adını asset ismi olarak kullan (path'in son kısmı)
-                    asset_name = path.split('/')[-1] if path else "Root"
-                    
-                    # Thumbnail: Önce görsel ara, yoksa model/arşiv dosyasının kendi Drive thumbnail'ı
-                    thumb_blob = None
-                    if images:
-                        img_file = images[0]
-                        if 'thumbnailLink' in img_file:
-                            try:
-                                thumb_blob = requests.get(img_file['thumbnailLink'].split('=')[0] + "=s250", timeout=5).content
-                            except: pass
-                    
-                    # Çok parçalı RAR'ları grupla: sadece part1'i (veya en küçük parçayı) kaydet
-                    multipart_rars = [a for a in archives if is_multipart_rar(a['name'])]
-                    normal_archives = [a for a in archives if not is_multipart_rar(a['name'])]
-                    
-                    if multipart_rars and not normal_archives and not models:
-                        # Sadece çok parçalı RAR var — part1'i bul
-                        part1 = min(multipart_rars, key=lambda x: multipart_rar_index(x['name']))
-                        model_file = part1
-                        if not thumb_blob and 'thumbnailLink' in part1:
-                            try:
-                                thumb_blob = requests.get(part1['thumbnailLink'].split('=')[0] + "=s250", timeout=5).content
-                            except: pass
-                    else:
-                        # Normal arşiv veya model dosyası: Önce normal archive, yoksa model
-                        model_file = (normal_archives[0] if normal_archives else None) or (models[0] if models else None)
-                        if not thumb_blob and model_file and 'thumbnailLink' in model_file:
-                            try:
-                                thumb_blob = requests.get(model_file['thumbnailLink'].split('=')[0] + "=s250", timeout=5).content
-                            except: pass
-                    
-                    if not model_file:
-                        continue
-                    model_link = model_file.get('webViewLink')
-                    model_size = int(model_file.get('size', 0))
-                    
-                    print(f"    📦 Grup: {asset_name} (📷 {len(images)} görsel, 📦 {len(archives)} arşiv, 🔷 {len(models)} model)")
-                    
-                    try:
-                        cur.execute("""
-                            INSERT INTO assets (filename, filepath, source_id, file_size, thumbnail_blob, folder_path)
-                            VALUES (%s, %s, %s, %s, %s, %s)
-                            ON CONFLICT (filepath) DO UPDATE SET file_size=EXCLUDED.file_size, thumbnail_blob=EXCLUDED.thumbnail_blob
-                        """, (asset_name, model_link, source_id, model_size, thumb_blob, path))
-                        conn.commit()
-                    except Exception as e:
-                        print(f"    ⚠️ Kayıt hatası: {e}")
-                        conn.rollback()
+            if multipart_rars and not normal_archives and not models:
+                # Sadece çok parçalı RAR var — part1'i bul
+                model_file = min(multipart_rars, key=lambda x: multipart_rar_index(x['name']))
+            else:
+                # Normal arşiv veya model dosyası: Önce normal archive, yoksa model
+                model_file = (normal_archives[0] if normal_archives else None) or (models[0] if models else None)
             
-            # Eğer bu klasörde ALT KLASÖR VAR ama aynı zamanda DOĞRUDAN DOSYALAR da varsa
-            # Bu dosyaları ayrı ayrı kaydet (karışık yapı)
-            elif direct_files and folders:
-                for item in direct_files:
-                    name = item['name']
-                    size = int(item.get('size', 0))
-                    fname_lower = name.lower()
-                    
-                    if fname_lower.endswith(('.zip', '.rar', '.7z', '.cbz', '.cbr', '.stl', '.obj', '.fbx', '.blend', '.step', '.3ds', '.dae')):
-                        thumb = None
-                        if 'thumbnailLink' in item:
-                            try: 
-                                thumb = requests.get(item['thumbnailLink'].split('=')[0] + "=s250", timeout=5).content
-                            except: pass
-                        
-                        try:
-                            print(f"📄 Dosya: {name}")
-                            cur.execute("""
-                                INSERT INTO assets (filename, filepath, source_id, file_size, thumbnail_blob, folder_path)
-                                VALUES (%s, %s, %s, %s, %s, %s)
-                                ON CONFLICT (filepath) DO UPDATE SET file_size=EXCLUDED.file_size, thumbnail_blob=EXCLUDED.thumbnail_blob
-                            """, (name, item.get('webViewLink'), source_id, size, thumb, path))
-                            conn.commit()
-                        except Exception as e:
-                            print(f"⚠️ Dosya hatası: {e}")
-                            conn.rollback()
-
-            # Her sayfa işlemi bitince
-            token = results.get('nextPageToken')
-            if not token: break
+            if not model_file:
+                return rows
+            if not thumb_blob:
+                thumb_blob = fetch_drive_thumbnail(model_file)
+            model_link = model_file.get('webViewLink')
+            model_size = int(model_file.get('size', 0))
+            
+            rows.append((f"    📦 Grup: {asset_name} (📷 {len(images)} görsel, 📦 {len(archives)} arşiv, 🔷 {len(models)} model)",
+                         (asset_name, model_link, source_id, model_size, thumb_blob, path)))
+    
+    # Eğer bu klasörde ALT KLASÖR VAR ama aynı zamanda DOĞRUDAN DOSYALAR da varsa
+    # Bu dosyaları ayrı ayrı kaydet (karışık yapı)
+    elif direct_files and has_subfolders:
+        for item in direct_files:
+            name = item['name']
+            size = int(item.get('size', 0))
+            fname_lower = name.lower()
+            
+            if fname_lower.endswith(('.zip', '.rar', '.7z', '.cbz', '.cbr', '.stl', '.obj', '.fbx', '.blend', '.step', '.3ds', '.dae')):
+                thumb = fetch_drive_thumbnail(item)
+                rows.append((f"📄 Dosya: {name}", (name, item.get('webViewLink'), source_id, size, thumb, path)))
+    return rows
+
+def ensure_drive_sync_tables(cur):
+    """Delta senkronizasyon için klasör haritası tablosunu ve token kolonunu oluşturur."""
+    cur.execute("ALTER TABLE source ADD COLUMN IF NOT EXISTS drive_page_token TEXT")
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS drive_folders (
+            source_id INTEGER NOT NULL REFERENCES source(id) ON DELETE CASCADE,
+            folder_id TEXT NOT NULL,
+            parent_id TEXT,
+            path TEXT NOT NULL,
+            PRIMARY KEY (source_id, folder_id)
+        )
+    """)
+    # Listelenemeyen klasörler: 'shallow' / 'recursive' → sonraki senkronizasyonda yeniden taranır
+    cur.execute("ALTER TABLE drive_folders ADD COLUMN IF NOT EXISTS retry_crawl VARCHAR(10)")
+
+def save_drive_folder(cur, source_id, folder_id, parent_id, path):
+    """Taşınan/adlandırılan klasörün yolu (bekleyen retry_crawl işaretine dokunmaz)."""
+    cur.execute("""
+        INSERT INTO drive_folders (source_id, folder_id, parent_id, path) VALUES (%s, %s, %s, %s)
+        ON CONFLICT (source_id, folder_id) DO UPDATE SET parent_id=EXCLUDED.parent_id, path=EXCLUDED.path
+    """, (source_id, folder_id, parent_id, path))
+
+def crawl_drive(seeds, source_id, cur, conn, service_factory=None, workers=DRIVE_CRAWL_WORKERS):
+    """
+    Drive klasörlerini sınırlı sayıda thread ile paralel listeler.
+    seeds: [(folder_id, parent_id, path, recursive), ...]
+    Listeleme ve thumbnail indirme thread'lerde, veritabanı yazımı tek (bu) thread'de
+    AssetWriter ile toplu yapılır.
+    Listelenemeyen klasörler drive_folders'a retry_crawl işaretiyle yazılır (token
+    ilerlese de alt ağaç kaybolmaz, retry_failed_folders yeniden tarar).
+    Dönüş: listelenemeyen klasör id'leri.
+    """
+    service_factory = service_factory or get_drive_service
+    local = threading.local()
+
+    def crawl_folder(folder_id, path):
+        # googleapiclient servisi thread-safe değil: her thread kendi servisini kurar
+        svc = getattr(local, 'service', None)
+        if svc is None:
+            svc = local.service = service_factory()
+        children = list_drive_children(svc, folder_id)
+        folders = [f for f in children if f.get('mimeType') == DRIVE_FOLDER_MIME]
+        direct_files = [f for f in children if f.get('mimeType') != DRIVE_FOLDER_MIME]
+        return folders, plan_drive_files(direct_files, bool(folders), source_id, path)
+
+    failed = []
+    with ThreadPoolExecutor(max_workers=workers) as pool, AssetWriter(cur, conn) as writer:
+        pending = {}
+        def submit(folder_id, parent_id, path, recursive):
+            pending[pool.submit(crawl_folder, folder_id, path)] = (folder_id, parent_id, path, recursive)
+        for seed in seeds:
+            submit(*seed)
+
+        while pending:
+            done, _ = wait(pending, timeout=writer.flush_timeout(), return_when=FIRST_COMPLETED)
+            writer.maybe_flush()
+            for fut in done:
+                folder_id, parent_id, path, recursive = pending.pop(fut)
+                try:
+                    folders, rows = fut.result()
+                except Exception as e:
+                    print(f"❌ Drive Hatası ({path or 'Root'}): {e}")
+                    # Silinmiş klasör (404) yeniden denenmez; silinmesi changes akışıyla gelir
+                    if not (isinstance(e, HttpError) and getattr(e.resp, 'status', 0) == 404):
+                        writer.add_drive_folder(source_id, folder_id, parent_id, path,
+                                                'recursive' if recursive else 'shallow')
+                        failed.append(folder_id)
+                    continue
+
+                # Alt klasörler hemen kuyruğa: kardeş klasörler paralel listelenir
+                if recursive:
+                    for folder_item in folders:
+                        new_path = f"{path}/{folder_item['name']}" if path else folder_item['name']
+                        print(f"📂 Klasör: {new_path}")
+                        submit(folder_item['id'], folder_id, new_path, True)
+
+                # Delta senkronizasyonun klasör yollarını bilmesi için haritaya kaydet
+                writer.add_drive_folder(source_id, folder_id, parent_id, path)
+                for message, row in rows:
+                    print(message)
+                    writer.add(row)
+    if failed:
+        print(f"⚠️ {len(failed)} klasör listelenemedi, sonraki senkronizasyonda yeniden denenecek.")
+    return failed
+
+def retry_failed_folders(source_id, cur, conn, service_factory=None, workers=DRIVE_CRAWL_WORKERS):
+    """Önceki taramalarda listelenemeyen klasörleri (retry_crawl) yeniden tarar."""
+    cur.execute("""
+        SELECT folder_id, parent_id, path, retry_crawl = 'recursive' FROM drive_folders
+        WHERE source_id=%s AND retry_crawl IS NOT NULL
+    """, (source_id,))
+    seeds = cur.fetchall()
+    if not seeds:
+        return []
+    for _, _, path, _ in seeds:
+        print(f"    🔁 Yeniden deneniyor: {path or 'Root'}")
+    return crawl_drive(seeds, source_id, cur, conn, service_factory=service_factory, workers=workers)
+
+def scan_drive(service, folder_id, source_id, cur, conn, path="", parent_id=None, recursive=True):
+    """Tek servis nesnesiyle sıralı tarama (servis thread'ler arasında paylaşılamaz)."""
+    return crawl_drive([(folder_id, parent_id, path, recursive)], source_id, cur, conn,
+                       service_factory=lambda: service, workers=1)
+
+def _like_prefix(path):
+    """path altındaki alt yolları eşleyen, özel karakterleri kaçışlanmış LIKE deseni."""
+    return path.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '/%'
+
+def _move_drive_subtree(cur, source_id, folders, old_path, new_path):
+    """Yeniden adlandırılan/taşınan klasörün altındaki tüm klasör ve asset yollarını günceller."""
+    params = (new_path, len(old_path) + 1, source_id, old_path, _like_prefix(old_path))
+    cur.execute("""
+        UPDATE drive_folders SET path = %s || substr(path, %s)
+        WHERE source_id=%s AND (path=%s OR path LIKE %s)
+    """, params)
+    cur.execute("""
+        UPDATE assets SET folder_path = %s || substr(folder_path, %s)
+        WHERE source_id=%s AND (folder_path=%s OR folder_path LIKE %s)
+    """, params)
+    for fid, p in list(folders.items()):
+        if p == old_path or p.startswith(old_path + '/'):
+            folders[fid] = new_path + p[len(old_path):]
+
+def _drop_drive_subtree(cur, source_id, folders, folder_id):
+    """Çöpe atılan veya ağaçtan çıkan klasörü ve altındaki asset'leri siler."""
+    old_path = folders.pop(folder_id)
+    params = (source_id, old_path, _like_prefix(old_path))
+    cur.execute("DELETE FROM drive_folders WHERE source_id=%s AND (path=%s OR path LIKE %s)", params)
+    cur.execute("DELETE FROM assets WHERE source_id=%s AND (folder_path=%s OR folder_path LIKE %s)", params)
+    for fid, p in list(folders.items()):
+        if p.startswith(old_path + '/'):
+            del folders[fid]
+
+def apply_drive_changes(service, source_id, root_id, token, cur, conn, service_factory=None, workers=DRIVE_CRAWL_WORKERS):
+    """
+    Changes API ile son senkronizasyondan bu yana olan ekleme, taşıma, yeniden adlandırma
+    ve silmeleri uygular. Sadece etkilenen klasörler yeniden listelenir.
+    Yeni başlangıç token'ını döndürür.
+    """
+    changes = []
+    new_token = token
+    page = token
+    while page:
+        res = drive_execute(service.changes().list(
+            pageToken=page, pageSize=1000, includeRemoved=True,
+            supportsAllDrives=True, includeItemsFromAllDrives=True,
+            fields=f"nextPageToken, newStartPageToken, changes(fileId, removed, file({DRIVE_FILE_FIELDS}))"
+        ))
+        changes.extend(res.get('changes', []))
+        page = res.get('nextPageToken')
+        new_token = res.get('newStartPageToken', new_token)
+
+    if not changes:
+        print("    💤 Değişiklik yok.")
+        return new_token
+    print(f"    🔄 {len(changes)} değişiklik işleniyor...")
+
+    cur.execute("SELECT folder_id, parent_id, path FROM drive_folders WHERE source_id=%s", (source_id,))
+    parents = {}
+    folders = {}
+    for fid, pid, p in cur.fetchall():
+        parents[fid] = pid
+        folders[fid] = p
+    folders.setdefault(root_id, "")
+
+    dirty = set()        # Sadece kendi dosyaları yeniden listelenecek klasörler
+    new_folders = []     # Ağaca yeni giren, recursive taranacak klasörler
+
+    gone, folder_changes, file_changes = [], [], []
+    for c in changes:
+        if c.get('removed') or c.get('file', {}).get('trashed'):
+            gone.append(c)
+        elif c['file'].get('mimeType') == DRIVE_FOLDER_MIME:
+            folder_changes.append(c)
+        else:
+            file_changes.append(c)
+
+    # 1. Çöpe atılan / silinen klasörler
+    for c in gone:
+        if c['fileId'] in folders and c['fileId'] != root_id:
+            dirty.add(parents.get(c['fileId']))
+            _drop_drive_subtree(cur, source_id, folders, c['fileId'])
+
+    # 2. Klasör ekleme, taşıma ve yeniden adlandırma (üst klasör önce işlenir)
+    pending = folder_changes
+    progressed = True
+    while pending and progressed:
+        progressed = False
+        rest = []
+        for c in pending:
+            f = c['file']
+            parent = next((p for p in f.get('parents', []) if p in folders), None)
+            if parent is None:
+                rest.append(c)
+                continue
+            progressed = True
+            new_path = f"{folders[parent]}/{f['name']}" if folders[parent] else f['name']
+            old_path = folders.get(f['id'])
+            if old_path is None:
+                new_folders.append((f['id'], parent, new_path))
+                dirty.add(parent)
+            elif old_path != new_path:
+                print(f"    📂 Taşındı/Adlandırıldı: {old_path} → {new_path}")
+                _move_drive_subtree(cur, source_id, folders, old_path, new_path)
+                save_drive_folder(cur, source_id, f['id'], parent, new_path)
+                dirty.update((f['id'], parents.get(f['id']), parent))
+            folders[f['id']] = new_path
+            parents[f['id']] = parent
+        pending = rest
+    # Ağaçtan dışarı taşınan klasörler
+    for c in pending:
+        if c['fileId'] in folders and c['fileId'] != root_id:
+            dirty.add(parents.get(c['fileId']))
+            _drop_drive_subtree(cur, source_id, folders, c['fileId'])
+
+    # 3. Değişen/silinen dosyaların mevcut asset kayıtları (tek sorguda)
+    folder_by_path = {p: fid for fid, p in folders.items()}
+    changed_ids = [c['fileId'] for c in gone + file_changes]
+    existing = {}
+    if changed_ids:
+        cur.execute("""
+            SELECT substring(filepath from '/d/([^/?]+)'), filepath, folder_path FROM assets
+            WHERE source_id=%s AND substring(filepath from '/d/([^/?]+)') = ANY(%s)
+        """, (source_id, changed_ids))
+        existing = {fid: (fp, folder) for fid, fp, folder in cur.fetchall()}
+
+    for c in gone:
+        if c['fileId'] in existing:
+            filepath, folder = existing[c['fileId']]
+            cur.execute("DELETE FROM assets WHERE filepath=%s", (filepath,))
+            print(f"    🗑️ Silindi: {filepath}")
+            dirty.add(folder_by_path.get(folder))
+        for p in c.get('file', {}).get('parents', []):
+            if p in folders: dirty.add(p)
+
+    for c in file_changes:
+        for p in c['file'].get('parents', []):
+            if p in folders: dirty.add(p)
+        # Başka klasörden taşındıysa eski klasör de yeniden gruplanmalı
+        if c['fileId'] in existing:
+            dirty.add(folder_by_path.get(existing[c['fileId']][1]))
+    conn.commit()
+    catalog_changed(conn)
+
+    # 4. Yeni klasörleri tam, kirli klasörleri sığ tara (hepsi tek paralel taramada)
+    seeds = []
+    new_ids = {fid for fid, _, _ in new_folders}
+    for fid, parent, new_path in new_folders:
+        if fid not in folders or parent in new_ids: continue  # Silinmiş ya da üst klasörle taranacak
+        print(f"    📂 Yeni klasör: {new_path}")
+        seeds.append((fid, parent, new_path, True))
+    for fid in dirty:
+        if fid is None or fid in new_ids or fid not in folders: continue
+        print(f"    🔁 Yenileniyor: {folders[fid] or 'Root'}")
+        seeds.append((fid, parents.get(fid), folders[fid], False))
+    if seeds:
+        crawl_drive(seeds, source_id, cur, conn, service_factory=service_factory, workers=workers)
+
+    return new_token
+
+def sync_drive_source(service, source_id, root_id, token, cur, conn, full=False,
+                      service_factory=None, workers=DRIVE_CRAWL_WORKERS):
+    """Drive kaynağını token varsa delta, yoksa tam (paralel) tarama ile senkronize eder."""
+    new_token = None
+    if token and not full:
+        try:
+            new_token = apply_drive_changes(service, source_id, root_id, token, cur, conn,
+                                            service_factory=service_factory, workers=workers)
         except Exception as e:
-            print(f"❌ Drive Hatası: {e}")
+            print(f"⚠️ Delta senkronizasyon başarısız, tam taramaya geçiliyor: {e}")
             conn.rollback()
-            break
 
-def scan_local(cur, conn):
+    if new_token is not None:
+        retry_failed_folders(source_id, cur, conn, service_factory=service_factory, workers=workers)
+    else:
+        # Token tarama ÖNCESİ alınır; tarama sırasında olan değişiklikler de sonraki turda gelir
+        new_token = drive_execute(service.changes().getStartPageToken(supportsAllDrives=True)).get('startPageToken')
+        cur.execute("DELETE FROM drive_folders WHERE source_id=%s", (source_id,))
+        conn.commit()
+        crawl_drive([(root_id, None, "", True)], source_id, cur, conn,
+                    service_factory=service_factory, workers=workers)
+
+    cur.execute("UPDATE source SET drive_page_token=%s WHERE id=%s", (new_token, source_id))
+    conn.commit()
+
+def ensure_manifest_table(cur):
+    """Artımlı yerel tarama için dosya manifest tablosunu oluşturur (yoksa)."""
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS local_manifest (
+            path TEXT PRIMARY KEY,
+            source_id INTEGER NOT NULL REFERENCES source(id) ON DELETE CASCADE,
+            file_size BIGINT NOT NULL,
+            mtime_ns BIGINT NOT NULL,
+            inode BIGINT NOT NULL,
+            indexed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_local_manifest_source ON local_manifest(source_id)")
+
+def load_manifest(cur, source_id):
+    """Kaynağın manifestini {path: (size, mtime_ns, inode)} olarak döndürür."""
+    cur.execute("SELECT path, file_size, mtime_ns, inode FROM local_manifest WHERE source_id=%s", (source_id,))
+    return {path: (size, mtime, inode) for path, size, mtime, inode in cur.fetchall()}
+
+def file_signature(path):
+    """Dosyanın değişip değişmediğini anlamak için (boyut, mtime_ns, inode) üçlüsü."""
+    st = os.stat(path)
+    return (st.st_size, st.st_mtime_ns, st.st_ino)
+
+def folder_signature(root, paths):
+    """
+    Gruplanan 3D klasörünün imzası: dosya boyutlarının toplamı, klasör ve dosyaların
+    en yeni mtime'ı, klasörün inode'u. Dosya eklenip silinince klasör mtime'ı da değişir.
+    """
+    dir_st = os.stat(root)
+    total_size = 0
+    newest = dir_st.st_mtime_ns
+    for p in paths:
+        st = os.stat(p)
+        total_size += st.st_size
+        newest = max(newest, st.st_mtime_ns)
+    return (total_size, newest, dir_st.st_ino)
+
+def build_local_thumbnail(kind, paths):
+    """
+    Pipeline işçisi (ayrı süreçte çalışır): arşivin en iyi görselinden veya klasörün
+    aday görsellerinden (öncelik sırasıyla) thumbnail üretir.
+    """
+    if kind == 'archive':
+        return extract_best_image_recursive(paths[0])
+    for img_path in paths:
+        try:
+            with open(img_path, 'rb') as f:
+                thumb = process_image(f.read())
+            if thumb: return thumb
+        except OSError: pass
+    return None
+
+def walk_local_source(sid, spath, manifest, seen, stats):
+    """
+    Kaynağı dolaşıp thumbnail üretilecek işleri üretir (değişmeyenler atlanır).
+    Her iş: (tür, yollar, asset satırı [thumbnail yerine None], manifest kaydı, log mesajı)
+    """
+    for root, dirs, files in os.walk(spath):
+        rel_path = os.path.relpath(root, spath)
+        if rel_path == ".": rel_path = ""
+        three_d_files = []
+        image_files = []
+        archive_count = 0
+        
+        for file in files:
+            ext = os.path.splitext(file)[1].lower()
+            full_path = os.path.join(root, file)
+            
+            # Arşiv dosyaları - HER BİRİNİ TEK TEK KAYDET
+            if ext in ['.zip', '.rar', '.cbz', '.cbr', '.7z']:
+                try:
+                    sig = file_signature(full_path)
+                except OSError as e:
+                    print(f"⚠️ Dosya okunamadı ({file}): {e}")
+                    continue
+                seen.add(full_path)
+                if manifest.get(full_path) == sig:
+                    stats['unchanged'] += 1
+                    continue
+                archive_count += 1
+                yield ('archive', [full_path], (file, full_path, sid, sig[0], None, rel_path),
+                       (full_path, sid, sig), f"📦 Arşiv: {file}")
+            
+            # 3D dosyaları
+            elif ext in ['.stl', '.obj', '.fbx', '.blend', '.step', '.3ds', '.dae']:
+                three_d_files.append((file, full_path))
+            
+            # Görsel dosyaları
+            elif ext in ['.jpg', '.jpeg', '.png', '.webp']:
+                image_files.append((file, full_path))
+        
+        # 3D dosyaları varsa VE alt klasördeyse grupla
+        # Ana dizinde (rel_path == "") ise SADECE 5+ dosya varsa grupla
+        should_group = False
+        if three_d_files:
+            if rel_path != "":  # Alt klasördeyse
+                should_group = True
+            elif len(three_d_files) >= 5:  # Ana dizinde ve çok dosya varsa
+                should_group = True
+        
+        if should_group:
+            try:
+                folder_sig = folder_signature(root, [p for _, p in three_d_files + image_files])
+            except OSError as e:
+                print(f"⚠️ Klasör okunamadı ({root}): {e}")
+                continue
+            seen.add(root)
+            if manifest.get(root) == folder_sig:
+                stats['unchanged'] += 1
+                continue
+
+            folder_name = os.path.basename(root) if rel_path else f"Proje_{len(three_d_files)}_Dosya"
+            
+            # Klasör thumbnail adayları: önce render/preview içerenler, sonra ilk görsel
+            candidates = [p for n, p in image_files if 'render' in n.lower() or 'preview' in n.lower()]
+            if image_files and image_files[0][1] not in candidates:
+                candidates.append(image_files[0][1])
+            yield ('folder', candidates, (folder_name, root, sid, 0, None, rel_path),
+                   (root, sid, folder_sig), f"📁 3D Klasör: {folder_name} ({len(three_d_files)} dosya)")
+        
+        # Her klasör dolaşıldıktan sonra durum raporu
+        if archive_count > 0 or three_d_files:
+            print(f"✅ {root}: {archive_count} arşiv, {len(three_d_files)} 3D dosya")
+
+def run_local_jobs(jobs, writer, workers=1):
+    """
+    Thumbnail işlerini çalıştırıp sonuçları tek yazıcıya (AssetWriter) verir.
+    workers > 1 ise işler ProcessPoolExecutor'da paralel çözülür; havuzdaki iş sayısı
+    workers * 4 ile sınırlı tutulur, böylece dolaşma hızı belleği şişirmez.
+    """
+    def store(job, thumb, ok=True):
+        kind, paths, row, manifest_entry, message = job
+        print(message)
+        # Süreç hatası olduysa manifest yazılmaz: sonraki taramada yeniden denenir
+        try:
+            writer.add(row[:4] + (thumb,) + row[5:], manifest=manifest_entry if ok else None)
+        except Exception as e:
+            print(f"⚠️ Kayıt hatası ({row[0]}): {e}")
+
+    if workers <= 1:
+        for job in jobs:
+            # Uzun sürecek işten önce süresi dolmuş satırları yaz
+            writer.maybe_flush()
+            try:
+                thumb = build_local_thumbnail(job[0], job[1])
+            except Exception as e:
+                # Bozuk tek bir arşiv taramanın tamamını durdurmaz
+                print(f"⚠️ Arşiv hatası ({job[2][0]}): {e}")
+                store(job, None, ok=False)
+                continue
+            store(job, thumb)
+        return
+
+    def drain(done):
+        for fut in done:
+            job = inflight.pop(fut)
+            try:
+                thumb = fut.result()
+            except Exception as e:
+                print(f"⚠️ Thumbnail süreci hatası ({job[2][0]}): {e}")
+                store(job, None, ok=False)
+                continue
+            store(job, thumb)
+
+    def wait_and_drain():
+        done, _ = wait(inflight, timeout=writer.flush_timeout(), return_when=FIRST_COMPLETED)
+        writer.maybe_flush()
+        drain(done)
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        inflight = {}
+        for job in jobs:
+            inflight[pool.submit(build_local_thumbnail, job[0], job[1])] = job
+            while len(inflight) >= workers * 4:
+                wait_and_drain()
+        while inflight:
+            wait_and_drain()
+
+def scan_local(cur, conn, incremental=True, workers=1):
+    ensure_manifest_table(cur)
+    ensure_catalog_version(cur)
+    conn.commit()
+
     cur.execute("SELECT id, path FROM source WHERE source_type='local'")
     sources = cur.fetchall()
     
@@ -249,88 +903,40 @@ def scan_local(cur, conn):
         if not os.path.exists(spath): 
             print(f"⚠️ Yol bulunamadı: {spath}")
             continue
-        print(f"🚀 Yerel Tarama Başlıyor: {spath}")
-        for root, dirs, files in os.walk(spath):
-            rel_path = os.path.relpath(root, spath)
-            if rel_path == ".": rel_path = ""
-            three_d_files = []
-            image_files = []
-            archive_count = 0
-            
-            for file in files:
-                ext = os.path.splitext(file)[1].lower()
-                full_path = os.path.join(root, file)
-                
-                # Arşiv dosyaları - HER BİRİNİ TEK TEK KAYDET
-                if ext in ['.zip', '.rar', '.cbz', '.cbr', '.7z']:
-                    try:
-                        thumb = extract_best_image_recursive(full_path)
-                        f_size = os.path.getsize(full_path)
-                        print(f"📦 Arşiv: {file}")
-                        cur.execute("""
-                            INSERT INTO assets (filename, filepath, source_id, file_size, thumbnail_blob, folder_path)
-                            VALUES (%s, %s, %s, %s, %s, %s)
-                            ON CONFLICT (filepath) DO UPDATE SET file_size=EXCLUDED.file_size, thumbnail_blob=EXCLUDED.thumbnail_blob
-                        """, (file, full_path, sid, f_size, thumb, rel_path))
-                        conn.commit()  # Her arşivi hemen kaydet
-                        archive_count += 1
-                    except Exception as e:
-                        print(f"⚠️ Arşiv hatası ({file}): {e}")
-                        conn.rollback()
-                
-                # 3D dosyaları
-                elif ext in ['.stl', '.obj', '.fbx', '.blend', '.step', '.3ds', '.dae']:
-                    three_d_files.append((file, full_path))
-                
-                # Görsel dosyaları
-                elif ext in ['.jpg', '.jpeg', '.png', '.webp']:
-                    image_files.append((file, full_path))
-            
-            # 3D dosyaları varsa VE alt klasördeyse grupla
-            # Ana dizinde (rel_path == "") ise SADECE 5+ dosya varsa grupla
-            should_group = False
-            if three_d_files:
-                if rel_path != "":  # Alt klasördeyse
-                    should_group = True
-                elif len(three_d_files) >= 5:  # Ana dizinde ve çok dosya varsa
-                    should_group = True
-            
-            if should_group:
-                folder_name = os.path.basename(root) if rel_path else f"Proje_{len(three_d_files)}_Dosya"
-                
-                # Klasör için thumbnail bul
-                folder_thumb = None
-                if image_files:
-                    for img_name, img_path in image_files:
-                        if 'render' in img_name.lower() or 'preview' in img_name.lower():
-                            try:
-                                with open(img_path, 'rb') as f:
-                                    folder_thumb = process_image(f.read())
-                                break
-                            except: pass
-                    if not folder_thumb and image_files:
-                        try:
-                            with open(image_files[0][1], 'rb') as f:
-                                folder_thumb = process_image(f.read())
-                        except: pass
-                
-                try:
-                    print(f"📁 3D Klasör: {folder_name} ({len(three_d_files)} dosya)")
-                    cur.execute("""
-                        INSERT INTO assets (filename, filepath, source_id, file_size, thumbnail_blob, folder_path)
-                        VALUES (%s, %s, %s, %s, %s, %s)
-                        ON CONFLICT (filepath) DO UPDATE SET thumbnail_blob=EXCLUDED.thumbnail_blob
-                    """, (folder_name, root, sid, 0, folder_thumb, rel_path))
-                    conn.commit()
-                except Exception as e:
-                    print(f"⚠️ Klasör hatası: {e}")
-                    conn.rollback()
-            
-            # Her klasör işlendikten sonra durum raporu
-            if archive_count > 0 or three_d_files:
-                print(f"✅ {root}: {archive_count} arşiv, {len(three_d_files)} 3D dosya işlendi")
+        print(f"🚀 Yerel Tarama Başlıyor: {spath} ({'artımlı' if incremental else 'tam'}, {workers} süreç)")
+
+        # Artımlı modda değişmeyen arşiv/klasörler manifestten tanınır ve atlanır
+        manifest = load_manifest(cur, sid) if incremental else {}
+        seen = set()
+        stats = {'unchanged': 0}
+
+        with AssetWriter(cur, conn) as writer:
+            run_local_jobs(walk_local_source(sid, spath, manifest, seen, stats), writer, workers)
+        if writer.failed:
+            print(f"⚠️ {spath}: {writer.failed} kayıt yazılamadı (sonraki taramada tekrar denenecek)")
+
+        # Diskten silinen dosyaların manifest kayıtlarını temizle
+        stale = [p for p in manifest if p not in seen]
+        if stale:
+            try:
+                cur.execute("DELETE FROM local_manifest WHERE path = ANY(%s)", (stale,))
+                conn.commit()
+            except Exception as e:
+                print(f"⚠️ Manifest temizleme hatası: {e}")
+                conn.rollback()
+        if incremental:
+            print(f"⏭️ {spath}: {stats['unchanged']} değişmemiş arşiv/klasör atlandı, {len(stale)} silinmiş kayıt temizlendi")
 
 def main():
+    parser = argparse.ArgumentParser(description="3D asset indexer")
+    parser.add_argument("--full", action="store_true",
+                        help="Manifesti ve Drive token'larını yok say, her şeyi baştan tara")
+    parser.add_argument("--drive-workers", type=int, default=DRIVE_CRAWL_WORKERS,
+                        help="Drive klasörlerini paralel listeleyen thread sayısı")
+    parser.add_argument("--workers", type=int, default=LOCAL_SCAN_WORKERS,
+                        help="Yerel arşiv thumbnail'larını üreten süreç sayısı (1 = sıralı)")
+    args = parser.parse_args()
+
     print("🚦 Main Fonksiyonu Başladı...")
     
     # İlk iş: İsimleri temizle
@@ -345,20 +951,33 @@ def main():
         conn = connect_db()
         cur = conn.cursor()
         print("✅ Veritabanına Bağlanıldı.")
+        ensure_thumb_columns(cur)
+        ensure_catalog_version(cur)
+        conn.commit()
 
         svc = get_drive_service()
         if svc:
-            cur.execute("SELECT id, drive_id FROM source WHERE source_type='gdrive'")
+            ensure_drive_sync_tables(cur)
+            conn.commit()
+            cur.execute("SELECT id, drive_id, drive_page_token FROM source WHERE source_type='gdrive'")
             drive_sources = cur.fetchall()
             
             if not drive_sources:
                 print("⚠️ Veritabanında kayıtlı Google Drive kaynağı yok.")
             
-            for sid, did in drive_sources: 
-                print(f"☁️ Drive Taranıyor: {did}")
-                scan_drive(svc, did, sid, cur, conn)
+            for sid, did, token in drive_sources: 
+                print(f"☁️ Drive Taranıyor: {did} ({'delta' if token and not args.full else 'tam'})")
+                sync_drive_source(svc, sid, did, token, cur, conn, full=args.full, workers=args.drive_workers)
         
-        scan_local(cur, conn)
+        scan_local(cur, conn, incremental=not args.full, workers=args.workers)
+
+        # Thumbnail'ı eksik kalanlar worker kuyruğuna; çalışan daemon NOTIFY ile hemen uyanır
+        ensure_job_queue(cur)
+        added = enqueue_missing(cur)
+        conn.commit()
+        flush_catalog_version(conn)
+        if added:
+            print(f"📥 {added} asset thumbnail kuyruğuna eklendi.")
         conn.close()
         print("🏁 Tarama Tamamlandı (Process Bitti).")
     except Exception as e: 
@@ -0,0 +1,170 @@
+"""
+Thumbnail iş kuyruğu (thumbnail_jobs).
+worker ve deep_scan işi assets tablosunu tarayarak değil bu kuyruktan kiralayarak alır:
+kiralama FOR UPDATE SKIP LOCKED ile yapılır, aynı iş iki sürece (farklı makinelerde
+bile) verilmez. Kilit dosyası gerekmez; istenen sayıda worker aynı anda çalışabilir.
+
+- Görünmezlik süresi: kiralanan işin run_after'ı LEASE_SECONDS ileri atılır. Süreç
+  çökerse iş bu süre sonunda kendiliğinden yeniden kiralanabilir olur.
+- Üstel geri çekilme: başarısız iş BACKOFF_BASE * 2^(deneme-1) saniye sonra tekrar
+  denenir; MAX_ATTEMPTS kiralamadan sonra 'failed' olur.
+- Öncelik: yüksek priority önce. Doğrudan model dosyaları ve Range ile okunabilen
+  ZIP'ler ucuz olduğu için öne alınır.
+
+assets.thumbnail_attempts eskisi gibi güncellenir (admin istatistikleri ve
+reset_thumbs ona bakar); kuyruğun kendi sayacı attempts'tir.
+"""
+
+import os
+import socket
+
+MAX_ATTEMPTS = 3
+JOBS_CHANNEL = "thumbnail_jobs"   # Yeni iş eklenince NOTIFY (worker --daemon LISTEN eder)
+LEASE_SECONDS = 15 * 60        # En yavaş render + indirme süresinden uzun olmalı
+BACKOFF_BASE = 5 * 60
+BACKOFF_MAX = 6 * 60 * 60
+
+# Uzantıya göre varsayılan öncelik (enqueue_missing)
+PRIORITY_SQL = """
+    CASE
+        WHEN filename ILIKE '%%.stl' OR filename ILIKE '%%.obj' THEN 20
+        WHEN filename ILIKE '%%.zip' OR filename ILIKE '%%.cbz' THEN 10
+        ELSE 0
+    END
+"""
+
+def worker_id():
+    """Kiralayan sürecin kimliği: host:pid."""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+def ensure_job_queue(cur):
+    """thumbnail_jobs tablosunu ve kiralama indeksini (yoksa) oluşturur."""
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS thumbnail_jobs (
+            asset_id INTEGER PRIMARY KEY REFERENCES assets(id) ON DELETE CASCADE,
+            state VARCHAR(10) NOT NULL DEFAULT 'pending',
+            priority SMALLINT NOT NULL DEFAULT 0,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            run_after TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            leased_by VARCHAR(100),
+            last_error TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    cur.execute("""
+        CREATE INDEX IF NOT EXISTS idx_thumbnail_jobs_ready
+        ON thumbnail_jobs (priority DESC, run_after) WHERE state = 'pending'
+    """)
+
+def enqueue_missing(cur):
+    """
+    Thumbnail'ı olmayan ve deneme hakkı bitmemiş assetleri kuyruğa alır, artık işi
+    kalmamış (thumbnail'ı gelmiş ya da atlanmış) bekleyen işleri kapatır, kiralaması
+    son denemede düşen (süreç çökmüş) işleri 'failed' yapar.
+    Her çalıştırmada güvenle çağrılabilir. Dönüş: yeni açılan iş sayısı.
+    """
+    cur.execute(f"""
+        INSERT INTO thumbnail_jobs (asset_id, priority)
+        SELECT id, {PRIORITY_SQL} FROM assets
+        WHERE thumbnail_hash IS NULL AND thumbnail_blob IS NULL AND thumbnail_attempts < %s
+        ON CONFLICT (asset_id) DO UPDATE SET
+            state = 'pending', attempts = 0, run_after = CURRENT_TIMESTAMP,
+            leased_by = NULL, last_error = NULL, updated_at = CURRENT_TIMESTAMP
+        WHERE thumbnail_jobs.state <> 'pending'
+    """, (MAX_ATTEMPTS,))
+    added = cur.rowcount
+    if added:
+        # Bekleyen daemon'lar commit'te uyanır
+        cur.execute("SELECT pg_notify(%s, %s)", (JOBS_CHANNEL, str(added)))
+    cur.execute("""
+        UPDATE thumbnail_jobs j SET state = 'done', leased_by = NULL, updated_at = CURRENT_TIMESTAMP
+        FROM assets a
+        WHERE a.id = j.asset_id AND j.state = 'pending'
+          AND (a.thumbnail_hash IS NOT NULL OR a.thumbnail_blob IS NOT NULL OR a.thumbnail_attempts >= %s)
+    """, (MAX_ATTEMPTS,))
+    # Asset'in sayacı da doldurulur: aynı iş bir sonraki çağrıda yeniden açılmasın
+    cur.execute("""
+        WITH dead AS (
+            UPDATE thumbnail_jobs SET state = 'failed', leased_by = NULL, updated_at = CURRENT_TIMESTAMP
+            WHERE state = 'pending' AND attempts >= %s AND run_after <= CURRENT_TIMESTAMP
+            RETURNING asset_id
+        )
+        UPDATE assets SET thumbnail_attempts = GREATEST(thumbnail_attempts, %s)
+        FROM dead WHERE assets.id = dead.asset_id
+    """, (MAX_ATTEMPTS, MAX_ATTEMPTS))
+    return added
+
+def lease_jobs(cur, owner, limit=1, lease_seconds=LEASE_SECONDS):
+    """
+    Hazır işlerden en fazla limit tanesini kiralar. Çağıran hemen commit etmelidir:
+    satır kilitleri commit'e kadar tutulur, sonrasında kiralamayı run_after korur.
+    Dönüş: [(asset_id, filename, filepath, attempts), ...]
+    """
+    cur.execute("""
+        UPDATE thumbnail_jobs j SET
+            attempts = j.attempts + 1,
+            run_after = CURRENT_TIMESTAMP + make_interval(secs => %s),
+            leased_by = %s,
+            updated_at = CURRENT_TIMESTAMP
+        FROM (
+            SELECT asset_id FROM thumbnail_jobs
+            WHERE state = 'pending' AND run_after <= CURRENT_TIMESTAMP AND attempts < %s
+            ORDER BY priority DESC, run_after
+            LIMIT %s
+            FOR UPDATE SKIP LOCKED
+        ) picked, assets a
+        WHERE j.asset_id = picked.asset_id AND a.id = j.asset_id
+        RETURNING j.asset_id, a.filename, a.filepath, j.attempts
+    """, (lease_seconds, owner, MAX_ATTEMPTS, limit))
+    return cur.fetchall()
+
+def complete_job(cur, asset_id):
+    """İş bitti (thumbnail üretildi ya da kalıcı olarak atlandı)."""
+    cur.execute("""
+        UPDATE thumbnail_jobs SET state = 'done', leased_by = NULL, last_error = NULL,
+            updated_at = CURRENT_TIMESTAMP
+        WHERE asset_id = %s
+    """, (asset_id,))
+
+def fail_job(cur, asset_id, owner, error=None):
+    """
+    Başarısız deneme: deneme hakkı varsa üstel geri çekilmeyle yeniden zamanlanır,
+    yoksa 'failed' olur. Kiralama bu sürece ait değilse (süresi dolup başkasına
+    geçmişse) dokunulmaz.
+    """
+    cur.execute("""
+        UPDATE thumbnail_jobs SET
+            state = CASE WHEN attempts >= %s THEN 'failed' ELSE 'pending' END,
+            run_after = CURRENT_TIMESTAMP + make_interval(secs => LEAST(%s * power(2, attempts - 1), %s)),
+            leased_by = NULL, last_error = %s, updated_at = CURRENT_TIMESTAMP
+        WHERE asset_id = %s AND leased_by = %s
+    """, (MAX_ATTEMPTS, BACKOFF_BASE, BACKOFF_MAX, str(error)[:500] if error else None, asset_id, owner))
+
+def queue_stats(cur):
+    """Durum başına iş sayısı ve şu an kiralanabilir iş sayısı."""
+    cur.execute("SELECT state, COUNT(*) FROM thumbnail_jobs GROUP BY state")
+    stats = dict(cur.fetchall())
+    cur.execute("""
+        SELECT COUNT(*) FROM thumbnail_jobs
+        WHERE state = 'pending' AND run_after <= CURRENT_TIMESTAMP AND attempts < %s
+    """, (MAX_ATTEMPTS,))
+    stats['ready'] = cur.fetchone()[0]
+    return stats
+
+def iter_leased_jobs(conn, owner, limit):
+    """
+    İşleri birer birer kiralayıp verir (her kiralama hemen commit edilir); kuyruk
+    boşalınca ya da limit dolunca biter. Tek tek kiralamak, uzun bir render sırasında
+    sıradaki işlerin kiralamasının boşuna dolmasını önler.
+    """
+    cur = conn.cursor()
+    try:
+        for _ in range(limit):
+            jobs = lease_jobs(cur, owner, 1)
+            conn.commit()
+            if not jobs:
+                break
+            yield jobs[0]
+    finally:
+        cur.close()
@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+"""
+Galeri araması için assets.search_vector sütununu ve GIN indekslerini oluşturur
+(pg_trgm eklentisi kurulabiliyorsa trigram indeksleri de).
+Sütun eklenirken tablo bir kez yeniden yazılır; büyük kataloglarda bakım penceresinde çalıştırın.
+"""
+
+import os
+import sys
+import time
+import psycopg2
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.search import ensure_search_index
+
+DB_CONFIG = {
+    "dbname": "asset_db",
+    "user": "postgres",
+    "password": "gizli_sifre",
+    "host": "localhost",
+    "port": "5435"
+}
+
+def migrate():
+    conn = psycopg2.connect(**DB_CONFIG)
+    cur = conn.cursor()
+    
+    try:
+        print("Arama sütunu ve indeksleri oluşturuluyor...")
+        start = time.time()
+        features = ensure_search_index(cur)
+        cur.execute("ANALYZE assets")
+        conn.commit()
+        print(f"✅ Migrasyon başarılı! ({time.time() - start:.1f} sn)")
+        print(f"   Tam metin (tsvector): {'var' if features['tsvector'] else 'yok'}")
+        print(f"   Trigram (pg_trgm):    {'var' if features['trgm'] else 'yok (postgresql-contrib kurulu mu?)'}")
+        
+    except Exception as e:
+        conn.rollback()
+        print(f"❌ Hata: {e}")
+    finally:
+        cur.close()
+        conn.close()
+
+if __name__ == "__main__":
+    migrate()
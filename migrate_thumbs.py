@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+assets.thumbnail_blob sütunundaki thumbnail'ları içerik adresli depoya (thumb_store) taşır.
+Her satır için blob depoya yazılır, özeti thumbnail_hash'e konur ve blob NULL yapılır.
+Sonunda tekrar eden thumbnail'lar için bir dedup raporu basar.
+
+Kullanım:
+  python migrate_thumbs.py              # Taşı + rapor
+  python migrate_thumbs.py --report     # Sadece rapor
+  python migrate_thumbs.py --pack       # Taşıdıktan sonra mmap paket dosyasını oluştur
+"""
+
+import os
+import sys
+import argparse
+import psycopg2
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.thumb_store import get_thumb_store, ensure_thumb_columns
+
+DB_CONFIG = {
+    "dbname": "asset_db",
+    "user": "postgres",
+    "password": "gizli_sifre",
+    "host": "localhost",
+    "port": "5435"
+}
+
+BATCH_SIZE = 200
+
+def migrate(conn, cur, store):
+    moved = 0
+    last_id = 0
+    while True:
+        # id üzerinden keyset: her batch kendi transaction'ında, yarıda kesilirse kaldığı yerden devam eder
+        cur.execute("""
+            SELECT id, thumbnail_blob FROM assets
+            WHERE thumbnail_blob IS NOT NULL AND id > %s
+            ORDER BY id LIMIT %s
+        """, (last_id, BATCH_SIZE))
+        rows = cur.fetchall()
+        if not rows:
+            break
+        updates = [(store.put(bytes(blob)), aid) for aid, blob in rows]
+        cur.executemany("UPDATE assets SET thumbnail_hash = %s, thumbnail_blob = NULL WHERE id = %s", updates)
+        conn.commit()
+        moved += len(rows)
+        last_id = rows[-1][0]
+        print(f"⏳ {moved} thumbnail taşındı...")
+    return moved
+
+def dedup_report(cur, store):
+    cur.execute("SELECT COUNT(*), COUNT(DISTINCT thumbnail_hash) FROM assets WHERE thumbnail_hash IS NOT NULL")
+    total, unique = cur.fetchone()
+    print(f"\n📊 DEDUP RAPORU")
+    print(f"   Thumbnail'lı asset: {total}")
+    print(f"   Benzersiz thumbnail: {unique}")
+    if not total:
+        return
+
+    cur.execute("""
+        SELECT thumbnail_hash, COUNT(*) AS n, MIN(filename)
+        FROM assets WHERE thumbnail_hash IS NOT NULL
+        GROUP BY thumbnail_hash HAVING COUNT(*) > 1
+        ORDER BY n DESC
+    """)
+    shared = cur.fetchall()
+    saved = 0
+    for digest, n, _ in shared:
+        path = store.path(digest)
+        if os.path.exists(path):
+            saved += (n - 1) * os.path.getsize(path)
+    print(f"   Paylaşılan thumbnail: {len(shared)} ({sum(n for _, n, _ in shared)} asset)")
+    print(f"   Tekrar eden kopyalardan kazanılan alan: {saved / 1024 / 1024:.1f} MB")
+
+    if shared:
+        print("   En çok paylaşılanlar (genelde Drive yer tutucu resimleri):")
+        for digest, n, sample in shared[:10]:
+            print(f"     {digest[:12]}…  {n:6d} asset  (ör. {sample[:50]})")
+
+    cur.execute("SELECT thumbnail_hash FROM assets WHERE thumbnail_hash IS NOT NULL GROUP BY thumbnail_hash")
+    missing = sum(1 for (digest,) in cur.fetchall() if not store.exists(digest))
+    if missing:
+        print(f"   ⚠️ Depoda dosyası olmayan özet: {missing}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Thumbnail'ları içerik adresli depoya taşı")
+    parser.add_argument("--report", action="store_true", help="Taşıma yapma, sadece dedup raporu")
+    parser.add_argument("--pack", action="store_true", help="Taşımadan sonra mmap paket dosyasını oluştur")
+    args = parser.parse_args()
+
+    conn = psycopg2.connect(**DB_CONFIG)
+    cur = conn.cursor()
+    store = get_thumb_store()
+
+    try:
+        ensure_thumb_columns(cur)
+        conn.commit()
+
+        if not args.report:
+            print(f"📦 Thumbnail'lar taşınıyor → {store.root}")
+            moved = migrate(conn, cur, store)
+            print(f"✅ {moved} thumbnail taşındı.")
+            if moved:
+                print("ℹ️ TOAST alanını geri kazanmak için bakım penceresinde: VACUUM FULL assets;")
+
+        if args.pack:
+            print(f"🗜️ Paket dosyası oluşturuldu: {store.build_pack()} thumbnail")
+
+        dedup_report(cur, store)
+
+    except Exception as e:
+        conn.rollback()
+        print(f"❌ Hata: {e}")
+    finally:
+        cur.close()
+        conn.close()
+
+if __name__ == "__main__":
+    main()
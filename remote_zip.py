@@ -0,0 +1,161 @@
+"""
+HTTP Range ile uzak ZIP okuma.
+Drive'daki bir ZIP'ten tek bir önizleme görseli veya STL almak için dosyanın tamamı
+indirilmez: zipfile'a HTTP Range isteğiyle okuyan, aranabilir (seekable) bir dosya nesnesi
+verilir. zipfile sondaki EOCD kaydını ve merkezi dizini, ardından yalnızca seçilen üyenin
+bayt aralığını okur; tipik bir arşivde birkaç istek ve birkaç yüz KB.
+
+Sunucu Range desteklemiyorsa (206 yerine 200 dönerse) RangeNotSupported fırlatılır;
+çağıran tam indirmeye düşer.
+"""
+
+import io
+import re
+from collections import OrderedDict
+
+import requests
+
+from app.archive import ArchiveReader, sniff_bytes
+
+BLOCK_SIZE = 64 * 1024
+READ_AHEAD_BLOCKS = 16        # Eksik blok okunurken en az 1 MB birlikte çekilir (zipfile 4 KB'lık okur)
+CACHE_BLOCKS = 256            # Dosya başına en fazla 16 MB blok önbelleği
+REQUEST_TIMEOUT = 30
+
+DRIVE_MEDIA_URL = "https://www.googleapis.com/drive/v3/files/{file_id}?alt=media&supportsAllDrives=true"
+
+class RangeNotSupported(Exception):
+    pass
+
+def drive_media_url(file_id):
+    return DRIVE_MEDIA_URL.format(file_id=file_id)
+
+class HttpRangeFile(io.RawIOBase):
+    """
+    Salt okunur, aranabilir uzak dosya. Okumalar BLOCK_SIZE'lık bloklar halinde önbelleklenir,
+    ardışık eksik bloklar tek Range isteğinde çekilir.
+    session: requests.Session uyumlu nesne (Drive için yetkili oturum).
+    """
+
+    def __init__(self, url, session=None):
+        super().__init__()
+        self.url = url
+        self.session = session or requests.Session()
+        self.requests = 0
+        self.bytes_fetched = 0
+        self._blocks = OrderedDict()
+        self._pos = 0
+        # İlk blok hem boyutu (Content-Range) hem de imzayı verir
+        self.size = None
+        first = self._fetch(0, BLOCK_SIZE - 1)
+        self._store(0, first)
+
+    def _fetch(self, start, end):
+        resp = self.session.get(self.url, headers={"Range": f"bytes={start}-{end}"},
+                                stream=True, timeout=REQUEST_TIMEOUT)
+        try:
+            if resp.status_code != 206:
+                if resp.status_code == 200:
+                    raise RangeNotSupported(f"Sunucu Range desteklemiyor: {self.url}")
+                resp.raise_for_status()
+                raise RangeNotSupported(f"Beklenmeyen HTTP {resp.status_code}: {self.url}")
+            m = re.match(r"bytes (\d+)-(\d+)/(\d+|\*)", resp.headers.get("Content-Range", ""))
+            if not m or m.group(3) == "*":
+                raise RangeNotSupported(f"Content-Range yok: {self.url}")
+            if self.size is None:
+                self.size = int(m.group(3))
+            data = resp.content
+        finally:
+            resp.close()
+        self.requests += 1
+        self.bytes_fetched += len(data)
+        return data
+
+    def _store(self, first_block, data):
+        for i in range(0, len(data), BLOCK_SIZE):
+            self._blocks[first_block + i // BLOCK_SIZE] = data[i:i + BLOCK_SIZE]
+        while len(self._blocks) > CACHE_BLOCKS:
+            self._blocks.popitem(last=False)
+
+    def _ensure(self, first, last):
+        """
+        [first, last] bloklarını döndürür (önbellekten ya da eksik ardışık blokları tek
+        istekte çekerek). Sonuç önbellekten değil çekilen veriden kurulur: önbellekten
+        büyük bir okuma (zipfile bir üyeyi tek read() ile okur) kendi bloklarını
+        _store sırasında önbellekten düşürebilir.
+        """
+        last_block = (self.size - 1) // BLOCK_SIZE
+        parts = []
+        b = first
+        while b <= last:
+            if b in self._blocks:
+                self._blocks.move_to_end(b)
+                parts.append(self._blocks[b])
+                b += 1
+                continue
+            run_end = b
+            while run_end + 1 <= last and run_end + 1 not in self._blocks:
+                run_end += 1
+            run_end = min(max(run_end, b + READ_AHEAD_BLOCKS - 1), last_block)
+            data = self._fetch(b * BLOCK_SIZE, min((run_end + 1) * BLOCK_SIZE, self.size) - 1)
+            self._store(b, data)
+            wanted = min(run_end, last) - b + 1
+            parts.append(data[:wanted * BLOCK_SIZE])
+            b = run_end + 1
+        return b"".join(parts)
+
+    def head(self, n=16):
+        """Dosyanın ilk n baytı (imza kontrolü için; ek istek yapmaz)."""
+        return self._blocks.get(0, b"")[:n]
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self._pos
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_SET:
+            pos = offset
+        elif whence == io.SEEK_CUR:
+            pos = self._pos + offset
+        elif whence == io.SEEK_END:
+            pos = self.size + offset
+        else:
+            raise ValueError(f"Geçersiz whence: {whence}")
+        if pos < 0:
+            raise ValueError("Negatif konum")
+        self._pos = pos
+        return pos
+
+    def read(self, n=-1):
+        if n is None or n < 0:
+            n = self.size - self._pos
+        end = min(self._pos + n, self.size)
+        if end <= self._pos:
+            return b""
+        first, last = self._pos // BLOCK_SIZE, (end - 1) // BLOCK_SIZE
+        data = self._ensure(first, last)
+        offset = self._pos - first * BLOCK_SIZE
+        out = data[offset:offset + (end - self._pos)]
+        self._pos = end
+        return out
+
+    def readinto(self, buffer):
+        data = self.read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+def open_remote_zip(url, session=None):
+    """
+    Uzak ZIP için ArchiveReader döndürür; dosya ZIP değilse None.
+    Range desteklenmiyorsa RangeNotSupported fırlatır.
+    Dönüş: (ArchiveReader, HttpRangeFile) — ikincisi istek/bayt istatistikleri için.
+    """
+    remote = HttpRangeFile(url, session)
+    if sniff_bytes(remote.head()) != 'zip':
+        return None, remote
+    return ArchiveReader(remote, 'zip'), remote
@@ -0,0 +1,158 @@
+"""
+Render sonuç önbelleği.
+Aynı STL/OBJ birçok arşivde ve Drive klasöründe tekrar eder; her birini yeniden render
+etmek saniyelerce CPU harcar. Sonuçlar, model dosyasının içerik özeti (BLAKE2b) + render
+parametreleri anahtarıyla diskte saklanır: dosya adı ve konumu ne olursa olsun aynı içerik
+bir kez render edilir.
+
+Boyut sınırı aşılınca en uzun süredir kullanılmayan kayıtlar silinir (LRU): okunan
+kaydın mtime'ı güncellenir, temizlikte en eski mtime'lılar gider. Dizin worker, deep_scan
+ve retry_thumbs süreçleri arasında paylaşılır; yazımlar atomiktir.
+
+Aynı dosya art arda render edildiğinde (ör. önce küçük resim, sonra önizleme) içerik
+yeniden okunmaz: özet süreç içinde (cihaz, inode, boyut, mtime_ns) anahtarıyla hatırlanır.
+"""
+
+import os
+import hashlib
+from collections import OrderedDict
+import tempfile
+import threading
+
+import config
+
+HASH_CHUNK = 1024 * 1024
+EVICT_TARGET = 0.9  # Temizlikte sınırın %90'ına inilir: her yazımda yeniden temizlik yapılmasın
+DIGEST_MEMO_SIZE = 1024  # Süreç içinde hatırlanan dosya özeti sayısı
+
+def file_digest(file_path):
+    """Dosya içeriğinin BLAKE2b özeti (parça parça okunur, büyük dosyalar belleğe alınmaz)."""
+    h = hashlib.blake2b(digest_size=32)
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+def cache_key(content_digest, params):
+    """İçerik özeti + render parametrelerinden kayıt anahtarı üretir."""
+    h = hashlib.blake2b(digest_size=32)
+    h.update(content_digest.encode())
+    h.update(repr(sorted(params.items())).encode())
+    return h.hexdigest()
+
+class RenderCache:
+    def __init__(self, root, max_bytes):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(root, exist_ok=True)
+        self._lock = threading.Lock()
+        self._size = sum(size for _, _, size in self._entries())
+        self._digests = OrderedDict()
+
+    def digest(self, file_path):
+        """
+        file_digest'in hatırlayan sürümü. Dosya değişmediyse (cihaz, inode, boyut, mtime_ns
+        aynıysa) büyük bir model tekrar baştan sona okunmaz.
+        """
+        st = os.stat(file_path)
+        memo_key = (st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns)
+        with self._lock:
+            digest = self._digests.get(memo_key)
+            if digest is not None:
+                self._digests.move_to_end(memo_key)
+                return digest
+        digest = file_digest(file_path)
+        with self._lock:
+            self._digests[memo_key] = digest
+            if len(self._digests) > DIGEST_MEMO_SIZE:
+                self._digests.popitem(last=False)
+        return digest
+
+    def path(self, key, kind):
+        return os.path.join(self.root, key[:2], f"{key}.{kind}")
+
+    def get(self, key, kind):
+        """Kaydı döndürür (yoksa None) ve LRU için son kullanım zamanını günceller."""
+        path = self.path(key, kind)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            os.utime(path)
+        except OSError:
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return data
+
+    def put(self, key, kind, data):
+        target = self.path(key, kind)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        # Atomik yazım: başka bir süreç yarım kaydı asla okumaz
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(target), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp, target)
+        except Exception:
+            try: os.remove(tmp)
+            except OSError: pass
+            raise
+        with self._lock:
+            self._size += len(data)
+            if self._size > self.max_bytes:
+                self._evict()
+
+    def _entries(self):
+        for dirpath, _, files in os.walk(self.root):
+            for name in files:
+                if name.endswith(".tmp"):
+                    continue
+                path = os.path.join(dirpath, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue  # Başka bir süreç silmiş olabilir
+                yield path, st.st_mtime, st.st_size
+
+    def _evict(self):
+        """Disk üzerindeki gerçek boyutla (diğer süreçlerin yazdıkları dahil) LRU temizliği."""
+        entries = sorted(self._entries(), key=lambda e: e[1])
+        total = sum(size for _, _, size in entries)
+        target = self.max_bytes * EVICT_TARGET
+        removed = 0
+        for path, _, size in entries:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+                total -= size
+                removed += 1
+            except OSError:
+                pass
+        self._size = total
+        if removed:
+            print(f"      🧹 Render önbelleği: {removed} eski kayıt silindi ({total / 1024 / 1024:.0f} MB kaldı)")
+
+_cache = None
+_cache_loaded = False
+_cache_lock = threading.Lock()
+
+def get_render_cache():
+    """
+    config.json'daki ayarlarla süreç başına tek bir RenderCache döndürür (kapalıysa None).
+    Ayarlar ilk çağrıda bir kez okunur; her render'da config.json yeniden açılmaz.
+    """
+    global _cache, _cache_loaded
+    if _cache_loaded:
+        return _cache
+    with _cache_lock:
+        if not _cache_loaded:
+            settings = config.get_render_cache_settings()
+            if settings.get("enabled"):
+                _cache = RenderCache(settings["dir"], int(settings["max_mb"]) * 1024 * 1024)
+            _cache_loaded = True
+        return _cache
@@ -1,94 +1,465 @@
 import os
 import sys
 import io
+import mmap
+import queue
+import threading
 import trimesh
 import numpy as np
 from PIL import Image
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+
+import config
+from render_cache import get_render_cache, cache_key
 
 # 1. En üstte zorla
 os.environ["PYOPENGL_PLATFORM"] = "osmesa"
 
-def render_3d_model(file_path):
-    # 2. Fonksiyonun tam içinde tekrar zorla (Hata alan dosyalar için kritik)
-    os.environ["PYOPENGL_PLATFORM"] = "osmesa"
-    
-    import pyrender # İmport işlemini burada yaparak ortam değişkenini garantileyelim
-    
-    r = None
+RENDER_SIZE = 400         # Orta kalite: 400x400
+RECYCLE_AFTER = 500       # Bu kadar render'dan sonra OSMesa bağlamı yeniden kurulur (sızıntılar sınırlı kalsın)
+RENDER_TIMEOUT = 120      # Render kuyruğunda bir iş için en fazla bekleme (saniye)
+# 400x400 bir görselde ~200 bin üçgenden fazlası fark edilmez; milyonluk heykeller bu bütçeye indirilir
+MAX_RENDER_FACES = 200000
+# Sahne/kamera/ışık/malzeme değiştiğinde artırın: eski render önbelleği kayıtları kullanılmaz
+RENDER_STYLE_VERSION = 1
+
+# Binary STL: 80 bayt başlık + uint32 üçgen sayısı, ardından üçgen başına 50 bayt
+STL_HEADER_SIZE = 84
+STL_TRIANGLE = np.dtype([("normal", "<f4", (3,)), ("vertices", "<f4", (3, 3)), ("attr", "<u2")])
+CLUSTER_CHUNK = 262144  # Clustering'de tek seferde işlenen üçgen (geçici diziler ~20 MB)
+
+def read_binary_stl(file_path):
+    """
+    Binary STL'i mmap ile açar ve üçgenleri kopyasız bir yapılandırılmış dizi olarak döndürür
+    (alanlar: normal, vertices, attr). ASCII veya bozuk dosyada None döner.
+    Dizi mmap'i canlı tutar; sayfalar yalnızca okundukça belleğe gelir.
+    """
+    size = os.path.getsize(file_path)
+    if size < STL_HEADER_SIZE:
+        return None
+    with open(file_path, "rb") as f:
+        header = f.read(STL_HEADER_SIZE)
+        count = int(np.frombuffer(header, dtype="<u4", count=1, offset=80)[0])
+        expected = STL_HEADER_SIZE + count * STL_TRIANGLE.itemsize
+        # "solid" ile başlayan binary dosyalar da var: asıl ölçüt boyutun tutması
+        if count == 0 or expected > size or (expected != size and header[:5].lower() == b"solid"):
+            return None
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    return np.frombuffer(mm, dtype=STL_TRIANGLE, count=count, offset=STL_HEADER_SIZE)
+
+def cluster_triangles(chunks, lo, size, max_faces):
+    """
+    Quadric decimation yoksa (veya mesh belleğe hiç alınmadan) yedek: vertex clustering.
+    chunks() her çağrıda (m, 3, 3) üçgen parçaları üretir; parça parça işlendiği için
+    tüm mesh'in kopyası oluşmaz. Vertex'ler ızgara hücrelerine toplanır (hücre başına
+    ortalama konum), dejenere ve tekrar eden üçgenler atılır. Bütçeye inene kadar
+    ızgara kabalaştırılır.
+    """
+    size = float(size) or 1.0
+    # Yüzey üçgen sayısı ızgara çözünürlüğünün karesiyle büyür (kapalı bir yüzeyde ~8·res²)
+    resolution = max(8, int(np.sqrt(max_faces / 8)))
+    while True:
+        face_keys, cell_keys, cell_sums, cell_counts = [], [], [], []
+        for tri in chunks():
+            tri = np.array(tri, dtype=np.float64).reshape(-1, 3)
+            cells = tri - lo
+            cells *= (resolution - 1) / size
+            cells = np.floor(cells, out=cells).astype(np.int64)
+            keys = (cells[:, 0] * resolution + cells[:, 1]) * resolution + cells[:, 2]
+            del cells
+            faces = keys.reshape(-1, 3)
+            keep = (faces[:, 0] != faces[:, 1]) & (faces[:, 1] != faces[:, 2]) & (faces[:, 0] != faces[:, 2])
+            face_keys.append(faces[keep])
+            uk, inv = np.unique(keys, return_inverse=True)
+            inv = inv.reshape(-1)
+            cell_keys.append(uk)
+            cell_counts.append(np.bincount(inv, minlength=len(uk)))
+            cell_sums.append(np.stack([np.bincount(inv, weights=tri[:, a], minlength=len(uk)) for a in range(3)], axis=1))
+        faces = np.concatenate(face_keys) if face_keys else np.empty((0, 3), np.int64)
+        # Aynı üç hücreye çöken üçgenlerden birini tut (yön korunur)
+        _, first = np.unique(np.sort(faces, axis=1), axis=0, return_index=True)
+        faces = faces[np.sort(first)]
+        if len(faces) <= max_faces or resolution <= 8:
+            break
+        # Bir sonraki deneme: üçgen sayısı res² ile orantılı, bütçenin biraz altını hedefle
+        resolution = max(8, min(int(resolution * 0.9), int(resolution * np.sqrt(max_faces / len(faces)) * 0.95)))
+
+    keys, inv = np.unique(np.concatenate(cell_keys), return_inverse=True)
+    inv = inv.reshape(-1)
+    counts = np.bincount(inv, weights=np.concatenate(cell_counts), minlength=len(keys))
+    sums = np.concatenate(cell_sums)
+    vertices = np.stack([np.bincount(inv, weights=sums[:, a], minlength=len(keys)) for a in range(3)], axis=1)
+    vertices /= counts[:, None]
+    return trimesh.Trimesh(vertices=vertices, faces=np.searchsorted(keys, faces), process=False)
+
+def cluster_vertices(mesh, max_faces):
+    """Bellekteki (indeksli) bir mesh için vertex clustering."""
+    vertices = np.asarray(mesh.vertices, dtype=np.float64)
+    faces = np.asarray(mesh.faces)
+    lo = vertices.min(axis=0)
+    chunks = lambda: (vertices[faces[i:i + CLUSTER_CHUNK]] for i in range(0, len(faces), CLUSTER_CHUNK))
+    return cluster_triangles(chunks, lo, np.max(vertices.max(axis=0) - lo), max_faces)
+
+def decimate_mesh(mesh, max_faces=MAX_RENDER_FACES):
+    """Üçgen sayısı bütçeyi aşıyorsa mesh'i sadeleştirir; aşmıyorsa aynen döndürür."""
+    if len(mesh.faces) <= max_faces:
+        return mesh
     try:
-        # Mesh Yükleme ve Normalleştirme (Merkeze alma ve Ölçekleme)
+        # trimesh'in quadric decimation'ı (fast-simplification / open3d gerektirir)
+        simplified = mesh.simplify_quadric_decimation(face_count=max_faces)
+        if len(simplified.faces) and len(simplified.faces) <= max_faces * 1.1:
+            return simplified
+    except Exception:
+        pass
+    return cluster_vertices(mesh, max_faces)
+
+def load_binary_stl(triangles, max_faces):
+    """
+    read_binary_stl() dizisinden mesh kurar. Bütçe altındaysa yalnızca vertex dizisi kopyalanır;
+    üstündeyse mmap üzerinden parça parça clustering yapılır, tam boy kopya hiç oluşmaz.
+    """
+    vertices = triangles["vertices"]
+    if not max_faces or len(triangles) <= max_faces:
+        mesh = trimesh.Trimesh(vertices=vertices.reshape(-1, 3).astype(np.float64),
+                               faces=np.arange(len(triangles) * 3).reshape(-1, 3), process=False)
+        mesh.merge_vertices()
+        return mesh
+
+    ranges = range(0, len(triangles), CLUSTER_CHUNK)
+    lo = np.min([vertices[i:i + CLUSTER_CHUNK].reshape(-1, 3).min(axis=0) for i in ranges], axis=0)
+    hi = np.max([vertices[i:i + CLUSTER_CHUNK].reshape(-1, 3).max(axis=0) for i in ranges], axis=0)
+    chunks = lambda: (vertices[i:i + CLUSTER_CHUNK] for i in ranges)
+    return cluster_triangles(chunks, lo.astype(np.float64), np.max(hi - lo), max_faces)
+
+def load_mesh(file_path, max_faces=MAX_RENDER_FACES):
+    """Mesh'i yükler, üçgen bütçesine indirir, merkeze alır ve 1 birimlik kutuya ölçekler."""
+    triangles = read_binary_stl(file_path) if file_path.lower().endswith(".stl") else None
+    if triangles is not None:
+        # Hızlı yol: trimesh yükleyicisi ve tam boy ara yapılar olmadan
+        before = len(triangles)
+        mesh = load_binary_stl(triangles, max_faces)
+        del triangles
+    else:
         mesh = trimesh.load(file_path, force='mesh')
         if isinstance(mesh, trimesh.Scene):
             mesh = trimesh.util.concatenate(list(mesh.geometry.values()))
-        
-        # Obje boyutunu normalize et (Küçük/Büyük dosya sorununu çözer)
-        mesh.apply_translation(-mesh.centroid)
-        scale = 1.0 / np.max(mesh.extents) if np.max(mesh.extents) != 0 else 1.0
-        mesh.apply_scale(scale)
-
-        scene = pyrender.Scene(bg_color=[0.1, 0.1, 0.1])
-        material = pyrender.MetallicRoughnessMaterial(
-            metallicFactor=0.5, roughnessFactor=0.5,
-            baseColorFactor=[0.8, 0.5, 0.2, 1.0]
-        )
-        pyr_mesh = pyrender.Mesh.from_trimesh(mesh, material=material)
-        scene.add(pyr_mesh)
-
-        # İzometrik kamera konumu (45° yatay, 35.26° dikey açı)
-        camera = pyrender.PerspectiveCamera(yfov=np.pi / 3.0)
-        
-        # İzometrik görünüm için kamera pozisyonu
-        # X, Y, Z eksenlerinin tümünü görebileceğimiz açı
-        distance = 2.5
-        iso_angle_h = np.pi / 4  # 45 derece yatay
-        iso_angle_v = np.arctan(1/np.sqrt(2))  # ~35.26 derece dikey (izometrik)
-        
-        cam_x = distance * np.cos(iso_angle_v) * np.cos(iso_angle_h)
-        cam_y = distance * np.cos(iso_angle_v) * np.sin(iso_angle_h)
-        cam_z = distance * np.sin(iso_angle_v)
-        
-        # Kamerayı objeye doğru yönlendir
-        camera_pose = np.eye(4)
-        camera_pos = np.array([cam_x, cam_y, cam_z])
-        target = np.array([0, 0, 0])
-        up = np.array([0, 0, 1])
-        
-        z_axis = camera_pos - target
-        z_axis = z_axis / np.linalg.norm(z_axis)
-        x_axis = np.cross(up, z_axis)
-        x_axis = x_axis / np.linalg.norm(x_axis)
-        y_axis = np.cross(z_axis, x_axis)
-        
-        camera_pose[:3, 0] = x_axis
-        camera_pose[:3, 1] = y_axis
-        camera_pose[:3, 2] = z_axis
-        camera_pose[:3, 3] = camera_pos
-        
-        scene.add(camera, pose=camera_pose)
-        
-        # İki yönlü aydınlatma (izometrik görünüm için)
-        light1 = pyrender.DirectionalLight(color=[1.0, 1.0, 1.0], intensity=8.0)
-        light2 = pyrender.DirectionalLight(color=[0.8, 0.8, 1.0], intensity=4.0)
-        scene.add(light1, pose=camera_pose)
-        
+        before = len(mesh.faces)
+        if max_faces and before > max_faces:
+            mesh = decimate_mesh(mesh, max_faces)
+
+    if max_faces and before > max_faces:
+        print(f"      🔻 Decimation: {before:,} → {len(mesh.faces):,} üçgen ({os.path.basename(file_path)})")
+
+    # Obje boyutunu normalize et (Küçük/Büyük dosya sorununu çözer)
+    mesh.apply_translation(-mesh.centroid)
+    scale = 1.0 / np.max(mesh.extents) if np.max(mesh.extents) != 0 else 1.0
+    mesh.apply_scale(scale)
+    return mesh
+
+# Önizleme açıları: (ad, yatay açı, dikey açı) derece. Yatay açı +X ekseninden ölçülür (Z yukarı).
+# Önizleme ayarındaki görünüm sayısı kadarı bu sıradan alınır.
+VIEW_ANGLES = [
+    ("iso", 45.0, 35.26),        # Thumbnail ile aynı izometrik açı
+    ("front", -90.0, 0.0),
+    ("side", 0.0, 0.0),
+    ("top", -90.0, 89.9),        # Tam 90° olursa "up" vektörü bakış yönüyle çakışır
+    ("back", 90.0, 0.0),
+    ("iso_back", 225.0, 35.26),
+    ("left", 180.0, 0.0),
+    ("bottom", -90.0, -89.9),
+]
+CAMERA_DISTANCE = 2.5
+
+def camera_pose(azimuth, elevation, distance=CAMERA_DISTANCE):
+    """Verilen açıdan orijine bakan kamera pozunu (4x4) döndürür."""
+    h = np.radians(azimuth)
+    v = np.radians(elevation)
+    cam_x = distance * np.cos(v) * np.cos(h)
+    cam_y = distance * np.cos(v) * np.sin(h)
+    cam_z = distance * np.sin(v)
+
+    # Kamerayı objeye doğru yönlendir
+    pose = np.eye(4)
+    camera_pos = np.array([cam_x, cam_y, cam_z])
+    target = np.array([0, 0, 0])
+    up = np.array([0, 0, 1])
+
+    z_axis = camera_pos - target
+    z_axis = z_axis / np.linalg.norm(z_axis)
+    x_axis = np.cross(up, z_axis)
+    x_axis = x_axis / np.linalg.norm(x_axis)
+    y_axis = np.cross(z_axis, x_axis)
+
+    pose[:3, 0] = x_axis
+    pose[:3, 1] = y_axis
+    pose[:3, 2] = z_axis
+    pose[:3, 3] = camera_pos
+    return pose
+
+def set_view(scene, azimuth, elevation):
+    """Sahnede yalnızca kamera ve ışık düğümlerini yeni açıya taşır (mesh yeniden yüklenmez)."""
+    pose = camera_pose(azimuth, elevation)
+    scene.set_pose(scene.main_camera_node, pose)
+    for node in scene.get_nodes(name="key_light") | scene.get_nodes(name="fill_light"):
         # İkinci ışık karşı taraftan
-        light_pose2 = camera_pose.copy()
-        light_pose2[:3, 3] = -camera_pos * 0.5
-        scene.add(light2, pose=light_pose2)
-
-        # Render motorunu her seferinde temiz başlat (Orta kalite: 400x400)
-        r = pyrender.OffscreenRenderer(400, 400)
-        color, _ = r.render(scene)
-        
-        img = Image.fromarray(color).convert("RGB")
-        out = io.BytesIO()
-        img.save(out, format="JPEG", quality=70, optimize=True)
-        return out.getvalue()
+        if node.name == "fill_light":
+            fill_pose = pose.copy()
+            fill_pose[:3, 3] = -pose[:3, 3] * 0.5
+            scene.set_pose(node, fill_pose)
+        else:
+            scene.set_pose(node, pose)
+
+def build_scene(mesh):
+    """Normalize edilmiş mesh için izometrik kameralı ve iki ışıklı pyrender sahnesi kurar.
+    GL çağrısı yapmaz: çağıran thread'de güvenle çalışır."""
+    # 2. Fonksiyonun tam içinde tekrar zorla (Hata alan dosyalar için kritik)
+    os.environ["PYOPENGL_PLATFORM"] = "osmesa"
+
+    import pyrender # İmport işlemini burada yaparak ortam değişkenini garantileyelim
+
+    scene = pyrender.Scene(bg_color=[0.1, 0.1, 0.1])
+    material = pyrender.MetallicRoughnessMaterial(
+        metallicFactor=0.5, roughnessFactor=0.5,
+        baseColorFactor=[0.8, 0.5, 0.2, 1.0]
+    )
+    pyr_mesh = pyrender.Mesh.from_trimesh(mesh, material=material)
+    scene.add(pyr_mesh)
+
+    # İzometrik kamera (45° yatay, 35.26° dikey açı): X, Y, Z eksenlerinin tümü görünür
+    camera = pyrender.PerspectiveCamera(yfov=np.pi / 3.0)
+    scene.add(camera, name="camera")
+
+    # İki yönlü aydınlatma, ışıklar kamerayla birlikte döner
+    light1 = pyrender.DirectionalLight(color=[1.0, 1.0, 1.0], intensity=8.0)
+    light2 = pyrender.DirectionalLight(color=[0.8, 0.8, 1.0], intensity=4.0)
+    scene.add(light1, name="key_light")
+    scene.add(light2, name="fill_light")
+    set_view(scene, *VIEW_ANGLES[0][1:])
+    return scene
+
+def encode_jpeg(color):
+    img = Image.fromarray(color).convert("RGB")
+    out = io.BytesIO()
+    img.save(out, format="JPEG", quality=70, optimize=True)
+    return out.getvalue()
+
+class RenderWorker:
+    """
+    Tek bir OffscreenRenderer'ı (OSMesa bağlamı) süreç boyunca açık tutan render thread'i.
+    OpenGL bağlamı thread'e bağlıdır: tüm GL işleri bu thread'de, kuyruktan sırayla yapılır.
+    Mesh yükleme, sahne kurma ve JPEG sıkıştırma çağıran thread'lerde paralel kalır.
+    Bağlam recycle_after render'dan sonra veya herhangi bir render hatasında yeniden kurulur.
+    Bir GL çağrısı takılırsa (render timeout'tan uzun sürerse) o thread geri alınamaz:
+    bırakılır, yerine yeni bir thread ve bağlam kurulur, kuyruktaki işler yenisine geçer.
+    """
+
+    def __init__(self, width=RENDER_SIZE, height=RENDER_SIZE, recycle_after=RECYCLE_AFTER):
+        self.width = width
+        self.height = height
+        self.recycle_after = recycle_after
+        self.rendered = 0       # Toplam başarılı render
+        self.recycled = 0       # Kaç kez bağlam yeniden kuruldu
+        self.abandoned = 0      # Takıldığı için bırakılan render thread'i sayısı
+        self._jobs = queue.Queue()
+        self._lock = threading.Lock()
+        self._busy_since = None  # Geçerli thread'in elindeki işe başladığı an (boştaysa None)
+        self._thread = None
+        self._start_thread()
+
+    def _start_thread(self):
+        self._busy_since = None
+        self._thread = threading.Thread(target=self._run, name="render-worker", daemon=True)
+        self._thread.start()
+
+    def submit(self, scene, views=None):
+        """
+        Sahneyi render kuyruğuna ekler; sonucu taşıyan bir Future döndürür.
+        views verilmezse sonuç tek renk dizisidir; (yatay, dikey) açı listesi verilirse
+        aynı sahnede yalnızca kamera taşınarak her açı için bir renk dizisi döner.
+        """
+        future = Future()
+        self._jobs.put((scene, views, future))
+        return future
+
+    def render(self, scene, views=None, timeout=RENDER_TIMEOUT):
+        future = self.submit(scene, views)
+        try:
+            return future.result(timeout=timeout)
+        except FutureTimeout:
+            future.cancel()     # Henüz başlamadıysa kuyrukta boşuna beklemesin
+            self._replace_if_stuck(timeout)
+            raise
+
+    def _replace_if_stuck(self, timeout):
+        """Geçerli thread tek bir işte timeout'tan uzun süredir bekliyorsa yenisini başlatır."""
+        with self._lock:
+            since = self._busy_since
+            if since is None or time.monotonic() - since < timeout:
+                return
+            print(f"      ⏱️ Render thread'i {time.monotonic() - since:.0f} sn'dir yanıt vermiyor, yeni bağlam kuruluyor")
+            self.abandoned += 1
+            self._start_thread()
+
+    def stop(self):
+        self._jobs.put(None)
+        self._thread.join()
+
+    def _release(self, renderer):
+        if renderer:
+            try: renderer.delete()
+            except: pass
+            self.recycled += 1
+
+    def _run(self):
+        import pyrender
+        me = threading.current_thread()
+        renderer = None
+        uses = 0
+        while True:
+            job = self._jobs.get()
+            if job is None:
+                break
+            scene, views, future = job
+            if not future.set_running_or_notify_cancel():
+                continue
+            with self._lock:
+                self._busy_since = time.monotonic()
+            try:
+                if renderer is None:
+                    renderer = pyrender.OffscreenRenderer(self.width, self.height)
+                if views is None:
+                    result, _ = renderer.render(scene)
+                    renders = 1
+                else:
+                    result = []
+                    for azimuth, elevation in views:
+                        set_view(scene, azimuth, elevation)
+                        result.append(renderer.render(scene)[0])
+                    renders = len(views)
+                uses += renders
+                self.rendered += renders
+                future.set_result(result)
+            except Exception as e:
+                # Bozulmuş bağlamı bir sonraki işe taşımamak için kapat
+                self._release(renderer)
+                renderer, uses = None, 0
+                future.set_exception(e)
+            with self._lock:
+                if self._thread is not me:
+                    break   # Takıldığı için bırakıldık: yerimize kurulan thread devam ediyor
+                self._busy_since = None
+            if uses >= self.recycle_after:
+                self._release(renderer)
+                renderer, uses = None, 0
+        self._release(renderer)
+
+_worker = None
+_worker_lock = threading.Lock()
+
+def get_render_worker():
+    """Süreç başına tek bir RenderWorker döndürür (ilk çağrıda başlatılır)."""
+    global _worker
+    with _worker_lock:
+        if _worker is None:
+            _worker = RenderWorker()
+        return _worker
+
+def render_params():
+    """Render çıktısını etkileyen parametreler: önbellek anahtarına girer."""
+    return {"style": RENDER_STYLE_VERSION, "size": RENDER_SIZE, "max_faces": MAX_RENDER_FACES}
+
+def cached_digest(file_path, use_cache):
+    """Önbellek açıksa (cache, içerik özeti), kapalıysa (None, None)."""
+    cache = get_render_cache() if use_cache else None
+    return (cache, cache.digest(file_path)) if cache else (None, None)
+
+def render_3d_model(file_path, worker=None, use_cache=True):
+    """Modeli izometrik açıdan render eder, JPEG baytlarını döndürür (hata olursa None).
+    Aynı içerikli model daha önce render edildiyse sonuç render önbelleğinden gelir."""
+    try:
+        cache, digest = cached_digest(file_path, use_cache)
+        if cache:
+            key = cache_key(digest, render_params())
+            blob = cache.get(key, "jpg")
+            if blob:
+                print(f"      ♻️ Render önbellekten: {os.path.basename(file_path)}")
+                return blob
+
+        scene = build_scene(load_mesh(file_path))
+        color = (worker or get_render_worker()).render(scene)
+        blob = encode_jpeg(color)
+        if cache:
+            cache.put(key, "jpg", blob)
+        return blob
 
     except Exception as e:
         print(f"      🚨 Render Motoru Hatası: {str(e)}")
         return None
-    finally:
-        if r:
-            try: r.delete()
-            except: pass
\ No newline at end of file
+
+def make_sprite_sheet(colors, cell_size):
+    """Görünümleri 2 satırlık bir ızgarada tek JPEG'de birleştirir (4 → 2x2, 6 → 3x2, 8 → 4x2)."""
+    rows = 2 if len(colors) >= 4 else 1
+    columns = -(-len(colors) // rows)
+    sheet = Image.new("RGB", (columns * cell_size, rows * cell_size), (26, 26, 26))
+    for i, color in enumerate(colors):
+        cell = Image.fromarray(color).convert("RGB").resize((cell_size, cell_size), Image.LANCZOS)
+        sheet.paste(cell, ((i % columns) * cell_size, (i // columns) * cell_size))
+    out = io.BytesIO()
+    sheet.save(out, format="JPEG", quality=70, optimize=True)
+    return out.getvalue()
+
+def make_animated_webp(colors, cell_size, frame_ms=600):
+    """Görünümleri döngüsel, küçük bir animasyonlu WebP'ye çevirir."""
+    frames = [Image.fromarray(c).convert("RGB").resize((cell_size, cell_size), Image.LANCZOS) for c in colors]
+    out = io.BytesIO()
+    frames[0].save(out, format="WEBP", save_all=True, append_images=frames[1:],
+                   duration=frame_ms, loop=0, quality=70)
+    return out.getvalue()
+
+def render_3d_views(file_path, preview=None, worker=None, use_cache=True):
+    """
+    Thumbnail'ı ve çok açılı önizlemeyi aynı yüklenmiş mesh ve sahneden üretir:
+    görünümler arasında yalnızca kamera/ışık düğümleri taşınır.
+    preview: config.get_preview_settings() biçiminde ayarlar (None ise config'den okunur).
+    Dönüş: (thumbnail_jpeg, önizleme_baytları) — önizleme kapalıysa veya üretilemezse None.
+    """
+    settings = preview if preview is not None else config.get_preview_settings()
+    if not settings.get("enabled"):
+        return render_3d_model(file_path, worker=worker, use_cache=use_cache), None
+    try:
+        count = min(max(int(settings.get("views", 6)), 1), len(VIEW_ANGLES))
+        cell_size = int(settings.get("size", 200))
+        fmt = "webp" if settings.get("format") == "webp" else "sheet"
+
+        cache, digest = cached_digest(file_path, use_cache)
+        if cache:
+            thumb_key = cache_key(digest, render_params())
+            preview_key = cache_key(digest, {**render_params(), "views": count, "cell": cell_size, "format": fmt})
+            thumbnail = cache.get(thumb_key, "jpg")
+            preview_blob = cache.get(preview_key, "preview")
+            if thumbnail and preview_blob:
+                print(f"      ♻️ Render önbellekten: {os.path.basename(file_path)}")
+                return thumbnail, preview_blob
+
+        scene = build_scene(load_mesh(file_path))
+        views = [angles for _, *angles in VIEW_ANGLES[:count]]
+        colors = (worker or get_render_worker()).render(scene, views=views)
+        # İlk görünüm izometrik: thumbnail olarak ayrıca render almaya gerek yok
+        thumbnail = encode_jpeg(colors[0])
+        preview_blob = None
+        if fmt == "webp":
+            try:
+                preview_blob = make_animated_webp(colors, cell_size)
+            except Exception as e:
+                print(f"      ⚠️ WebP önizleme üretilemedi, sprite sheet kullanılıyor: {e}")
+        if preview_blob is None:
+            preview_blob = make_sprite_sheet(colors, cell_size)
+        if cache:
+            cache.put(thumb_key, "jpg", thumbnail)
+            cache.put(preview_key, "preview", preview_blob)
+        return thumbnail, preview_blob
+
+    except Exception as e:
+        print(f"      🚨 Render Motoru Hatası: {str(e)}")
+        return None, None
@@ -14,13 +14,13 @@ cur = conn.cursor()
 
 cur.execute("""
     UPDATE assets SET thumbnail_attempts = 0
-    WHERE thumbnail_blob IS NULL 
+    WHERE thumbnail_hash IS NULL AND thumbnail_blob IS NULL 
       AND (filepath LIKE '%drive.google.com%' OR filepath LIKE '%/d/%')
 """)
 updated = cur.rowcount
 conn.commit()
 
-cur.execute("SELECT COUNT(*) FROM assets WHERE thumbnail_blob IS NULL AND thumbnail_attempts = 0")
+cur.execute("SELECT COUNT(*) FROM assets WHERE thumbnail_hash IS NULL AND thumbnail_blob IS NULL AND thumbnail_attempts = 0")
 waiting = cur.fetchone()[0]
 conn.close()
 
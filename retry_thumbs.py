@@ -11,7 +11,10 @@ import io
 import time
 from PIL import Image
 from app.indexer import connect_db, get_drive_service, extract_best_image_recursive, process_image
-from app.renderer import render_3d_model
+from app.renderer import render_3d_views
+from app.thumb_store import get_thumb_store, ensure_thumb_columns
+from app.catalog import ensure_catalog_version, catalog_changed, flush_catalog_version
+from app.events import emit, THUMBNAIL_READY
 
 def retry_missing_thumbnails():
     print("🕵️‍♂️ Kayıp Thumbnail Avı Başladı...")
@@ -19,9 +22,13 @@ def retry_missing_thumbnails():
     conn = connect_db()
     cur = conn.cursor()
     svc = get_drive_service()
+    ensure_thumb_columns(cur)
+    ensure_catalog_version(cur)
+    conn.commit()
+    store = get_thumb_store()
     
-    # Sadece thumbnail_blob'u NULL olanları getir
-    cur.execute("SELECT COUNT(*) FROM assets WHERE thumbnail_blob IS NULL")
+    # Sadece thumbnail'ı (depoda da, eski blob sütununda da) olmayanları getir
+    cur.execute("SELECT COUNT(*) FROM assets WHERE thumbnail_hash IS NULL AND thumbnail_blob IS NULL")
     total_missing = cur.fetchone()[0]
     print(f"📉 Toplam {total_missing} adet eksik resim var.")
     
@@ -37,7 +44,7 @@ def retry_missing_thumbnails():
         cur.execute("""
             SELECT id, filename, filepath, source_id, folder_path 
             FROM assets 
-            WHERE thumbnail_blob IS NULL 
+            WHERE thumbnail_hash IS NULL AND thumbnail_blob IS NULL 
             ORDER BY id DESC 
             LIMIT %s OFFSET %s
         """, (batch_size, offset))
@@ -47,6 +54,7 @@ def retry_missing_thumbnails():
         
         for aid, fname, fpath, sid, folder_path in rows:
             blob = None
+            preview = None
             try:
                 # 1. SENARYO: GOOGLE DRIVE
                 if fpath.startswith('http'):
@@ -78,18 +86,22 @@ def retry_missing_thumbnails():
 
                     elif ext in ['.stl', '.obj', '.fbx']:
                         print(f"🎨 Render Alınıyor: {fname}")
-                        blob = render_3d_model(fpath)
+                        blob, preview = render_3d_views(fpath)
 
             except Exception as e:
                 print(f"Hata ({fname}): {e}")
 
             if blob:
-                cur.execute("UPDATE assets SET thumbnail_blob = %s WHERE id = %s", (blob, aid))
+                cur.execute("UPDATE assets SET thumbnail_hash = %s, preview_hash = COALESCE(%s, preview_hash) WHERE id = %s",
+                            (store.put(blob), store.put(preview) if preview else None, aid))
+                emit(cur, THUMBNAIL_READY, [aid])
                 conn.commit()
+                catalog_changed(conn)
             
         offset += batch_size
         print(f"⏳ {min(offset, total_missing)}/{total_missing} tarandı...")
 
+    flush_catalog_version(conn)
     conn.close()
     print("✅ Tamamlandı.")
 
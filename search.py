@@ -0,0 +1,124 @@
+"""
+Galeri arama alt sistemi.
+
+- assets.search_vector: filename + tags'ten üretilen tsvector (GENERATED ... STORED,
+  yazımda Postgres kendisi günceller) + GIN indeksi.
+- pg_trgm kuruluysa filename/tags üzerinde trigram GIN indeksleri: kelime ortasından
+  eşleşme (ILIKE '%bot%') ve benzerlik sıralaması indeksle çalışır.
+- build_search(): çok kelimeli AND, önek eşleşmesi (robo → robot) ve sıralama ifadesi üretir.
+  İndeksler yoksa eski ILIKE davranışına düşer.
+
+Migrasyon: python migrate_search_index.py
+"""
+
+import re
+import json
+
+# Dosya adlarındaki _ . - / ayraçları kelime sınırı sayılır (robot_arm_v2.stl → robot arm v2 stl)
+SEARCH_VECTOR_SQL = """to_tsvector('simple',
+    regexp_replace(coalesce(filename, '') || ' ' || coalesce(tags, ''), '[_.\\-/,]+', ' ', 'g'))"""
+
+MIN_TRGM_TERM = 3  # Trigram indeksi 3 karakterden kısa parçalar için kullanılamaz
+# Bundan fazla eşleşmede alaka sırası yerine yenilik sırası kullanılır: binlerce eşit
+# derecede alakalı sonucun hepsi için ts_rank hesaplamak sorguyu 100 ms+ yapar,
+# (created_at, id) indeksiyle ise ilk sayfa ~1 ms'de gelir.
+RANK_MAX_MATCHES = 5000
+# Planner bundan fazla eşleşme tahmin ederse gerçek sayım yapılmaz, tahmin gösterilir
+EXACT_COUNT_LIMIT = 10000
+
+def tokenize(query):
+    return re.findall(r"[^\W_]+", query.lower())
+
+def ensure_search_index(cur, table="assets"):
+    """
+    search_vector sütununu ve arama indekslerini (yoksa) oluşturur.
+    Sütun eklemek tabloyu bir kez yeniden yazar: büyük tablolarda bakım penceresinde çalıştırın.
+    pg_trgm eklentisi kurulamazsa trigram indeksleri atlanır. Dönüş: detect_features() sonucu.
+    """
+    cur.execute(f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS search_vector tsvector "
+                f"GENERATED ALWAYS AS ({SEARCH_VECTOR_SQL}) STORED")
+    cur.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_search_vector ON {table} USING GIN (search_vector)")
+    cur.execute("SAVEPOINT trgm")
+    try:
+        cur.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        cur.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_filename_trgm ON {table} USING GIN (filename gin_trgm_ops)")
+        cur.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_tags_trgm ON {table} USING GIN (tags gin_trgm_ops)")
+        cur.execute("RELEASE SAVEPOINT trgm")
+    except Exception as e:
+        print(f"⚠️ pg_trgm kullanılamıyor, sadece tam metin indeksi kullanılacak: {e}")
+        cur.execute("ROLLBACK TO SAVEPOINT trgm")
+    return detect_features(cur, table)
+
+def detect_features(cur, table="assets"):
+    """Veritabanında hangi arama indekslerinin hazır olduğunu döndürür."""
+    cur.execute("""
+        SELECT EXISTS (SELECT 1 FROM information_schema.columns
+                       WHERE table_name = %s AND column_name = 'search_vector'),
+               EXISTS (SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm')
+    """, (table,))
+    has_tsvector, has_trgm = cur.fetchone()
+    return {"tsvector": has_tsvector, "trgm": has_trgm}
+
+def build_search(query, features):
+    """
+    Arama metnini SQL'e çevirir.
+    Dönüş: (where_sql, where_params, rank_sql, rank_params) — arama boşsa None
+    (indeks yoksa rank_sql None: sonuçlar yenilik sırasıyla gelir).
+    Her kelime zorunludur (AND). Kelime, başka bir kelimenin öneki olarak (tsvector)
+    veya pg_trgm varsa herhangi bir yerinde (ILIKE) geçerse eşleşir.
+    rank_sql float8 döner: keyset sayfalamada imleç değeri olarak birebir geri verilebilir.
+    """
+    terms = tokenize(query)
+    if not terms:
+        return None
+
+    if not features.get("tsvector"):
+        # İndeks yok: eski davranış, kelime başına ILIKE
+        where = " AND ".join(["(filename ILIKE %s OR tags ILIKE %s)"] * len(terms))
+        params = [p for t in terms for p in (f"%{t}%", f"%{t}%")]
+        return where, params, None, []
+
+    tsquery = " & ".join(f"{t}:*" for t in terms)
+    if features.get("trgm"):
+        clauses = []
+        params = []
+        for t in terms:
+            if len(t) >= MIN_TRGM_TERM:
+                clauses.append("(search_vector @@ to_tsquery('simple', %s) OR filename ILIKE %s OR tags ILIKE %s)")
+                params.extend([f"{t}:*", f"%{t}%", f"%{t}%"])
+            else:
+                clauses.append("search_vector @@ to_tsquery('simple', %s)")
+                params.append(f"{t}:*")
+        where = " AND ".join(clauses)
+        rank = "(ts_rank(search_vector, to_tsquery('simple', %s)) + similarity(filename, %s))::float8"
+        rank_params = [tsquery, " ".join(terms)]
+    else:
+        where = "search_vector @@ to_tsquery('simple', %s)"
+        params = [tsquery]
+        rank = "ts_rank(search_vector, to_tsquery('simple', %s))::float8"
+        rank_params = [tsquery]
+    return where, params, rank, rank_params
+
+def count_matches(cur, where_sql, params, table="assets"):
+    """
+    Eşleşme sayısı. Önce planner tahminine (EXPLAIN) bakılır; geniş aramalarda
+    on binlerce satırı saymak yerine tahmin döner. Dönüş: (sayı, tahmini_mi)
+    """
+    cur.execute(f"EXPLAIN (FORMAT JSON) SELECT 1 FROM {table} WHERE {where_sql}", params)
+    plan = cur.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    estimate = int(plan[0]["Plan"]["Plan Rows"])
+    if estimate > EXACT_COUNT_LIMIT:
+        return estimate, True
+    cur.execute(f"SELECT COUNT(*) FROM {table} WHERE {where_sql}", params)
+    return cur.fetchone()[0], False
+
+def sort_for(search_sql, match_count):
+    """
+    Galeri sıralaması: az eşleşmede alaka, aksi halde yenilik.
+    Dönüş: (sort_sql, sort_params, alaka_mı)
+    """
+    if search_sql and search_sql[2] and match_count <= RANK_MAX_MATCHES:
+        return search_sql[2], list(search_sql[3]), True
+    return "created_at", [], False
@@ -18,6 +18,7 @@ APP_HOME="/home/$APP_USER/3d_asset_manager"
 APP_DIR="$APP_HOME/app"
 VENV_DIR="$APP_HOME/venv"
 TEMP_DIR="$APP_HOME/temp_work"
+THUMB_DIR="$APP_HOME/thumbs"
 LOG_DIR="$APP_HOME/logs"
 ORCA_DATA="/srv/orcaslicer"
 DB_PORT=5435
@@ -70,7 +71,7 @@ success "Docker hazır."
 # ADIM 2 — Dizinler
 # =============================================================
 info "Adım 2/8: Dizinler oluşturuluyor..."
-mkdir -p "$APP_DIR" "$TEMP_DIR" "$LOG_DIR"
+mkdir -p "$APP_DIR" "$TEMP_DIR" "$LOG_DIR" "$THUMB_DIR"
 mkdir -p "$ORCA_DATA/config/Downloads"
 chown -R "$APP_USER":"$APP_USER" "$APP_HOME"
 chown -R "$APP_USER":"$APP_USER" "$ORCA_DATA"
@@ -141,6 +142,8 @@ CREATE TABLE IF NOT EXISTS assets (
     source_id INTEGER REFERENCES sources(id) ON DELETE CASCADE,
     file_size BIGINT,
     thumbnail_blob BYTEA,
+    thumbnail_hash VARCHAR(64),
+    preview_hash VARCHAR(64),
     folder_path TEXT,
     tags TEXT,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
@@ -149,6 +152,16 @@ CREATE TABLE IF NOT EXISTS assets (
 CREATE INDEX IF NOT EXISTS idx_assets_source ON assets(source_id);
 CREATE INDEX IF NOT EXISTS idx_assets_filename ON assets(filename);
 CREATE INDEX IF NOT EXISTS idx_assets_filepath ON assets(filepath);
+CREATE INDEX IF NOT EXISTS idx_assets_thumbnail_hash ON assets(thumbnail_hash);
+CREATE INDEX IF NOT EXISTS idx_assets_created_id ON assets(created_at DESC, id DESC);
+
+-- Galeri araması (search.py): tam metin + trigram indeksleri
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+ALTER TABLE assets ADD COLUMN IF NOT EXISTS search_vector tsvector GENERATED ALWAYS AS (to_tsvector('simple',
+    regexp_replace(coalesce(filename, '') || ' ' || coalesce(tags, ''), '[_.\-/,]+', ' ', 'g'))) STORED;
+CREATE INDEX IF NOT EXISTS idx_assets_search_vector ON assets USING GIN (search_vector);
+CREATE INDEX IF NOT EXISTS idx_assets_filename_trgm ON assets USING GIN (filename gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_assets_tags_trgm ON assets USING GIN (tags gin_trgm_ops);
 EOSQL
 
 # Slicer tablolarını oluştur
@@ -181,7 +194,9 @@ cat > "$APP_DIR/config.json" << EOF
   "thumbnails": {
     "size": 400,
     "quality": 70,
-    "google_drive_size": "s250"
+    "google_drive_size": "s250",
+    "store_dir": "$THUMB_DIR",
+    "use_pack": false
   },
   "temp_dir": "$TEMP_DIR"
 }
@@ -1,7 +1,7 @@
 #!/bin/bash
-# Indexer ve Worker Cron Job Kurulum Scripti
+# Indexer Cron Job ve Worker Servisi Kurulum Scripti
 # - Her 6 saatte bir indexer (yeni dosyaları tara)
-# - Her 1 saatte bir worker (thumbnail oluştur)
+# - Worker sürekli çalışan systemd servisi (worker.py --daemon); saatlik cron kaldırılır
 
 echo "=== 3D Asset Manager Cron Jobs Kurulumu ==="
 
@@ -10,7 +10,7 @@ SCRIPT_DIR="$(cd "$(dirname "${BASH_SOURCE[0]}")" && pwd)"
 INDEXER_PATH="$SCRIPT_DIR/indexer.py"
 WORKER_PATH="$SCRIPT_DIR/worker.py"
 INDEXER_LOG="/var/log/3d_asset_indexer.log"
-WORKER_LOG="/var/log/3d_asset_worker.log"
+WORKER_SERVICE="/etc/systemd/system/asset-worker.service"
 
 # Python3 yolunu bul
 PYTHON_BIN=$(which python3)
@@ -32,23 +32,45 @@ echo "✅ Python: $PYTHON_BIN"
 echo ""
 
 # Log dosyalarını oluştur
-sudo touch "$INDEXER_LOG" "$WORKER_LOG"
-sudo chown $(whoami):$(whoami) "$INDEXER_LOG" "$WORKER_LOG"
+sudo touch "$INDEXER_LOG"
+sudo chown $(whoami):$(whoami) "$INDEXER_LOG"
 
 # Cron job satırları
 INDEXER_CRON="0 */6 * * * cd $SCRIPT_DIR && $PYTHON_BIN indexer.py >> $INDEXER_LOG 2>&1"
-WORKER_CRON="0 * * * * cd $SCRIPT_DIR && $PYTHON_BIN worker.py >> $WORKER_LOG 2>&1"
 
 # Mevcut crontab'ı yedekle
 BACKUP_FILE="/tmp/crontab_backup_$(date +%Y%m%d_%H%M%S).txt"
 crontab -l > "$BACKUP_FILE" 2>/dev/null
 echo "💾 Mevcut crontab yedeklendi: $BACKUP_FILE"
 
-# Eski job'ları temizle
+# Eski job'ları temizle (saatlik worker cron'u dahil)
 crontab -l 2>/dev/null | grep -v "indexer.py\|worker.py" | crontab -
 
-# Yeni job'ları ekle
-(crontab -l 2>/dev/null; echo ""; echo "# 3D Asset Manager Jobs"; echo "$INDEXER_CRON"; echo "$WORKER_CRON") | crontab -
+# Yeni job'u ekle
+(crontab -l 2>/dev/null; echo ""; echo "# 3D Asset Manager Jobs"; echo "$INDEXER_CRON") | crontab -
+
+# Worker servisi: bir kez yüklenir, kuyruğu sürekli boşaltır; stop'ta elindeki işi bitirir
+sudo tee "$WORKER_SERVICE" > /dev/null <<EOF
+[Unit]
+Description=3D Asset Manager PRO - Thumbnail Worker
+After=network.target postgresql.service
+
+[Service]
+Type=simple
+User=$(whoami)
+WorkingDirectory=$SCRIPT_DIR
+ExecStart=$PYTHON_BIN worker.py --daemon
+KillSignal=SIGTERM
+TimeoutStopSec=300
+Restart=always
+RestartSec=10
+Environment=PYTHONUNBUFFERED=1
+
+[Install]
+WantedBy=multi-user.target
+EOF
+sudo systemctl daemon-reload
+sudo systemctl enable --now asset-worker.service
 
 echo ""
 echo "✅ Cron jobs başarıyla kuruldu!"
@@ -60,17 +82,21 @@ echo "   - Çalışma: Her 6 saatte bir (00:00, 06:00, 12:00, 18:00)"
 echo "   - Log: $INDEXER_LOG"
 echo ""
 echo "🎨 Worker (Thumbnail oluştur)"
-echo "   - Çalışma: Her saat başı"
-echo "   - Log: $WORKER_LOG"
+echo "   - Çalışma: Sürekli (systemd: asset-worker.service)"
+echo "   - Log: journalctl -u asset-worker"
 echo "━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━"
 echo ""
 echo "🔧 Yararlı Komutlar:"
 echo "  crontab -l                           # Tüm cron jobs'ları listele"
 echo "  crontab -e                           # Crontab'ı düzenle"
 echo "  tail -f $INDEXER_LOG      # Indexer log'unu izle"
-echo "  tail -f $WORKER_LOG        # Worker log'unu izle"
+echo "  journalctl -u asset-worker -f       # Worker log'unu izle"
+echo "  sudo systemctl restart asset-worker  # Worker'ı yeniden başlat"
 echo "  python3 $SCRIPT_DIR/indexer.py      # Manuel indexer çalıştır"
-echo "  python3 $SCRIPT_DIR/worker.py       # Manuel worker çalıştır"
+echo "  python3 $SCRIPT_DIR/worker.py       # Manuel worker çalıştır (tek sefer)"
 echo ""
 echo "📊 Aktif Cron Jobs:"
 crontab -l | grep -E "indexer\.py|worker\.py"
+echo ""
+echo "🎨 Worker Servisi:"
+systemctl is-active asset-worker.service
@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+"""
+Drive delta senkronizasyonu testleri (indexer.sync_drive_source / apply_drive_changes).
+Drive API yerine bellekte bir klasör ağacı ve changes akışı tutan sahte servis kullanılır;
+yazımlar yerel Postgres'e (indexer.DB_CONFIG) geçici bir kaynak altında yapılır ve test
+sonunda silinir. Veritabanına bağlanılamazsa testler atlanır.
+
+Çalıştırma: python -m pytest test_drive_sync.py   (veya python test_drive_sync.py)
+"""
+
+import os
+import re
+import sys
+import copy
+import json
+import tempfile
+import unittest
+from unittest import mock
+
+import httplib2
+import psycopg2
+from googleapiclient.errors import HttpError
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import indexer
+from app.thumb_store import ThumbStore
+
+FOLDER = indexer.DRIVE_FOLDER_MIME
+
+class FakeRequest:
+    def __init__(self, fn):
+        self.fn = fn
+
+    def execute(self):
+        return self.fn()
+
+class FakeDrive:
+    """files().list / changes().list / changes().getStartPageToken taklidi. Token = changes indeksi."""
+
+    def __init__(self, root_id):
+        self.root_id = root_id
+        self.items = {}
+        self.log = []
+        self.failing = set()    # Listelemesi 403 veren klasörler
+
+    # --- ağaç değişiklikleri (her biri changes akışına düşer) ---
+
+    def _record(self, item_id):
+        self.log.append({"fileId": item_id, "removed": False, "file": copy.deepcopy(self.items[item_id])})
+
+    def add(self, item_id, name, parent, folder=False, size=100):
+        self.items[item_id] = {
+            "id": item_id, "name": name, "parents": [parent], "trashed": False,
+            "mimeType": FOLDER if folder else "application/octet-stream",
+            "size": str(size), "webViewLink": f"https://drive.google.com/file/d/{item_id}/view",
+        }
+        self._record(item_id)
+
+    def rename(self, item_id, name):
+        self.items[item_id]["name"] = name
+        self._record(item_id)
+
+    def move(self, item_id, parent):
+        self.items[item_id]["parents"] = [parent]
+        self._record(item_id)
+
+    def trash(self, item_id):
+        self.items[item_id]["trashed"] = True
+        self._record(item_id)
+
+    # --- API ---
+
+    def files(self):
+        return self
+
+    def changes(self):
+        return self
+
+    def list(self, q=None, pageToken=None, **kwargs):
+        if q is None:
+            return FakeRequest(lambda: self._changes(pageToken))
+        folder_id = re.match(r"'([^']+)' in parents", q).group(1)
+        return FakeRequest(lambda: self._children(folder_id))
+
+    def getStartPageToken(self, **kwargs):
+        return FakeRequest(lambda: {"startPageToken": str(len(self.log))})
+
+    def _children(self, folder_id):
+        if folder_id in self.failing:
+            raise HttpError(httplib2.Response({"status": 403}),
+                            json.dumps({"error": {"errors": [{"reason": "forbidden"}]}}).encode())
+        files = [copy.deepcopy(i) for i in self.items.values()
+                 if folder_id in i["parents"] and not i["trashed"]]
+        return {"files": files}
+
+    def _changes(self, token):
+        return {"changes": copy.deepcopy(self.log[int(token):]), "newStartPageToken": str(len(self.log))}
+
+class DriveSyncTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        try:
+            cls.conn = indexer.connect_db()
+        except psycopg2.Error as e:
+            raise unittest.SkipTest(f"Veritabanı yok: {e}")
+        cls.cur = cls.conn.cursor()
+        indexer.ensure_drive_sync_tables(cls.cur)
+        indexer.ensure_catalog_version(cls.cur)
+        cls.conn.commit()
+        cls.thumbs = tempfile.TemporaryDirectory()
+        cls.patch = mock.patch.object(indexer, "get_thumb_store", return_value=ThumbStore(cls.thumbs.name))
+        cls.patch.start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.patch.stop()
+        cls.thumbs.cleanup()
+        cls.conn.close()
+
+    def setUp(self):
+        self.cur.execute("INSERT INTO source (name, source_type, drive_id) VALUES ('test_drive_sync', 'gdrive', 'ROOT') RETURNING id")
+        self.sid = self.cur.fetchone()[0]
+        self.conn.commit()
+        self.drive = FakeDrive("ROOT")
+
+    def tearDown(self):
+        self.conn.rollback()
+        self.cur.execute("DELETE FROM source WHERE id=%s", (self.sid,))
+        self.conn.commit()
+
+    def sync(self):
+        self.cur.execute("SELECT drive_page_token FROM source WHERE id=%s", (self.sid,))
+        token = self.cur.fetchone()[0]
+        indexer.sync_drive_source(self.drive, self.sid, "ROOT", token, self.cur, self.conn,
+                                  service_factory=lambda: self.drive, workers=2)
+        self.cur.execute("SELECT drive_page_token FROM source WHERE id=%s", (self.sid,))
+        return self.cur.fetchone()[0]
+
+    def assets(self):
+        self.cur.execute("SELECT filename, folder_path FROM assets WHERE source_id=%s", (self.sid,))
+        return dict(self.cur.fetchall())
+
+    def retry_folders(self):
+        self.cur.execute("SELECT folder_id FROM drive_folders WHERE source_id=%s AND retry_crawl IS NOT NULL", (self.sid,))
+        return {row[0] for row in self.cur.fetchall()}
+
+    def build_tree(self):
+        d = self.drive
+        d.add("A", "Alpha", "ROOT", folder=True)
+        d.add("a1", "alpha.stl", "A")
+        d.add("B", "Beta", "ROOT", folder=True)
+        d.add("b1", "beta.zip", "B")
+        d.add("T", "Trash Me", "ROOT", folder=True)
+        d.add("t1", "trash.stl", "T")
+        d.add("X", "Shelf", "ROOT", folder=True)
+
+    def test_full_then_delta(self):
+        self.build_tree()
+        token = self.sync()
+        self.assertEqual(token, str(len(self.drive.log)))
+        self.assertEqual(self.assets(), {"Alpha": "Alpha", "Beta": "Beta", "Trash Me": "Trash Me"})
+
+        d = self.drive
+        d.rename("A", "Alpha2")          # Yeniden adlandırma
+        d.move("B", "X")                 # Taşıma
+        d.trash("T")                     # Çöp
+        d.add("D", "Delta", "ROOT", folder=True)   # Yeni klasör + dosya
+        d.add("d1", "delta.stl", "D")
+        token = self.sync()
+        self.assertEqual(token, str(len(d.log)))
+        self.assertEqual(self.assets(), {"Alpha2": "Alpha2", "Beta": "Shelf/Beta", "Delta": "Delta"})
+
+        # Değişiklik yoksa token yerinde kalır, hiçbir şey değişmez
+        self.assertEqual(self.sync(), token)
+        self.assertEqual(self.assets(), {"Alpha2": "Alpha2", "Beta": "Shelf/Beta", "Delta": "Delta"})
+
+    def test_failed_folder_is_retried(self):
+        self.build_tree()
+        self.drive.failing.add("B")
+        self.sync()
+        self.assertNotIn("Beta", self.assets())
+        self.assertEqual(self.retry_folders(), {"B"})
+
+        # Token ilerlemiş olsa da klasör bir sonraki senkronizasyonda yeniden taranır
+        self.drive.failing.clear()
+        self.sync()
+        self.assertEqual(self.assets()["Beta"], "Beta")
+        self.assertEqual(self.retry_folders(), set())
+
+if __name__ == "__main__":
+    unittest.main()
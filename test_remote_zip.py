@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+remote_zip testleri: Range destekleyen (ve desteklemeyen) yerel bir HTTP sunucusuna karşı.
+Çalıştırma: python -m pytest test_remote_zip.py   (veya python test_remote_zip.py)
+"""
+
+import io
+import os
+import re
+import sys
+import zipfile
+import threading
+import unittest
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.remote_zip import open_remote_zip, RangeNotSupported, BLOCK_SIZE, CACHE_BLOCKS
+
+FILES = {}
+
+class RangeHandler(BaseHTTPRequestHandler):
+    """/range/<ad> Range isteğine 206 döner, /plain/<ad> Range'i yok sayıp 200 döner."""
+
+    def do_GET(self):
+        mode, _, name = self.path.lstrip("/").partition("/")
+        data = FILES.get(name)
+        if data is None:
+            self.send_error(404)
+            return
+        m = re.match(r"bytes=(\d+)-(\d+)", self.headers.get("Range", ""))
+        if mode == "range" and m:
+            start, end = int(m.group(1)), min(int(m.group(2)), len(data) - 1)
+            body = data[start:end + 1]
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {start}-{end}/{len(data)}")
+        else:
+            body = data
+            self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        try:
+            self.wfile.write(body)
+        except ConnectionError:
+            pass    # İstemci 200 görünce bağlantıyı kapatır
+
+    def log_message(self, *args):
+        pass
+
+def make_zip(members):
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w", zipfile.ZIP_STORED) as zf:
+        for name, data in members.items():
+            zf.writestr(name, data)
+    return buf.getvalue()
+
+class RemoteZipTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.small = b"preview" * 20
+        # Önbellekten (CACHE_BLOCKS * BLOCK_SIZE) büyük, sıkıştırılamaz üye
+        cls.big = os.urandom(CACHE_BLOCKS * BLOCK_SIZE + 3 * BLOCK_SIZE + 123)
+        FILES["models.zip"] = make_zip({"render.jpg": cls.small, "model.stl": cls.big})
+        FILES["notzip.bin"] = b"\x00" * 1000
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), RangeHandler)
+        cls.base = f"http://127.0.0.1:{cls.server.server_address[1]}"
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def test_small_member_reads_only_a_few_blocks(self):
+        reader, remote = open_remote_zip(f"{self.base}/range/models.zip")
+        self.assertEqual(reader.read("render.jpg"), self.small)
+        self.assertLess(remote.bytes_fetched, len(FILES["models.zip"]) // 4)
+
+    def test_member_larger_than_cache(self):
+        reader, remote = open_remote_zip(f"{self.base}/range/models.zip")
+        self.assertEqual(reader.read("model.stl"), self.big)
+        # Önbellekten düşen bloklar tekrar okunabilir
+        self.assertEqual(reader.read("render.jpg"), self.small)
+
+    def test_not_a_zip(self):
+        reader, _ = open_remote_zip(f"{self.base}/range/notzip.bin")
+        self.assertIsNone(reader)
+
+    def test_server_without_range(self):
+        with self.assertRaises(RangeNotSupported):
+            open_remote_zip(f"{self.base}/plain/models.zip")
+
+if __name__ == "__main__":
+    unittest.main()
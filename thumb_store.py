@@ -0,0 +1,140 @@
+"""
+İçerik adresli thumbnail deposu.
+Her thumbnail SHA-256 özetiyle diskte saklanır (ab/cd/<hash>.jpg), assets tablosunda
+yalnızca özet (thumbnail_hash) tutulur. Aynı görsel (ör. Drive yer tutucu resimleri)
+diske tek kez yazılır.
+
+İsteğe bağlı paket dosyası (thumbs.pack + thumbs.idx): tüm gevşek dosyaların tek bir
+dosyada birleştirilmiş hali; okuyucular mmap ile açar, binlerce küçük dosya açmaz.
+Gevşek dosyalar her zaman asıl kaynaktır, paket sadece okuma hızlandırmasıdır.
+"""
+
+import os
+import mmap
+import struct
+import hashlib
+import tempfile
+import threading
+
+import config
+
+PACK_NAME = "thumbs.pack"
+INDEX_NAME = "thumbs.idx"
+INDEX_RECORD = struct.Struct("<32sQI")  # sha256 özeti, paket içi ofset, uzunluk
+
+def thumb_hash(data):
+    return hashlib.sha256(data).hexdigest()
+
+class ThumbStore:
+    def __init__(self, root, use_pack=False):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+        self._pack = None
+        self._index = {}
+        if use_pack:
+            self._open_pack()
+
+    def path(self, digest):
+        return os.path.join(self.root, digest[:2], digest[2:4], f"{digest}.jpg")
+
+    def put(self, data):
+        """Thumbnail'ı depoya yazar (zaten varsa dokunmaz) ve özetini döndürür."""
+        digest = thumb_hash(data)
+        target = self.path(digest)
+        if digest in self._index or os.path.exists(target):
+            return digest
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        # Atomik yazım: yarım kalmış dosya okuyuculara asla görünmez
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(target), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp, target)
+        except Exception:
+            try: os.remove(tmp)
+            except OSError: pass
+            raise
+        return digest
+
+    def get(self, digest):
+        """Özete karşılık gelen thumbnail baytlarını döndürür, yoksa None."""
+        if not digest:
+            return None
+        entry = self._index.get(digest)
+        if entry:
+            offset, length = entry
+            return self._pack[offset:offset + length]
+        try:
+            with open(self.path(digest), "rb") as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def exists(self, digest):
+        return digest in self._index or os.path.exists(self.path(digest))
+
+    def iter_hashes(self):
+        for dirpath, _, files in os.walk(self.root):
+            for name in files:
+                if name.endswith(".jpg") and len(name) == 68:
+                    yield name[:-4]
+
+    def _open_pack(self):
+        pack_path = os.path.join(self.root, PACK_NAME)
+        index_path = os.path.join(self.root, INDEX_NAME)
+        if not (os.path.exists(pack_path) and os.path.exists(index_path)):
+            return
+        if os.path.getsize(pack_path) == 0:
+            return
+        with open(pack_path, "rb") as f:
+            self._pack = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        with open(index_path, "rb") as f:
+            raw = f.read()
+        for digest, offset, length in INDEX_RECORD.iter_unpack(raw):
+            self._index[digest.hex()] = (offset, length)
+
+    def build_pack(self):
+        """Tüm gevşek dosyaları paket dosyasına yazar (yeniden oluşturur). Kayıt sayısını döndürür."""
+        pack_path = os.path.join(self.root, PACK_NAME)
+        index_path = os.path.join(self.root, INDEX_NAME)
+        records = []
+        with open(pack_path + ".tmp", "wb") as pack:
+            for digest in sorted(self.iter_hashes()):
+                with open(self.path(digest), "rb") as f:
+                    data = f.read()
+                records.append(INDEX_RECORD.pack(bytes.fromhex(digest), pack.tell(), len(data)))
+                pack.write(data)
+        with open(index_path + ".tmp", "wb") as idx:
+            idx.write(b"".join(records))
+        # Önce paket, sonra indeks: indeks hiçbir zaman eksik bir pakete işaret etmez
+        os.replace(pack_path + ".tmp", pack_path)
+        os.replace(index_path + ".tmp", index_path)
+        return len(records)
+
+_store = None
+_store_lock = threading.Lock()
+
+def get_thumb_store():
+    """config.json'daki ayarlarla süreç başına tek bir ThumbStore döndürür."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = ThumbStore(config.get_thumb_store_dir(), use_pack=config.get_thumb_store_use_pack())
+        return _store
+
+def load_thumbnail(thumbnail_hash, thumbnail_blob=None):
+    """Okuyucular için: önce depodan, henüz taşınmamış kayıtlarda eski blob sütunundan okur.
+    (pandas boş hücreleri NaN yapabildiği için tip kontrolü yapılır.)"""
+    if isinstance(thumbnail_hash, str) and thumbnail_hash:
+        data = get_thumb_store().get(thumbnail_hash)
+        if data:
+            return data
+    if isinstance(thumbnail_blob, (bytes, memoryview)) and thumbnail_blob:
+        return bytes(thumbnail_blob)
+    return None
+
+def ensure_thumb_columns(cur):
+    """assets.thumbnail_hash ve çok açılı önizleme için preview_hash sütunlarını (yoksa) ekler."""
+    cur.execute("ALTER TABLE assets ADD COLUMN IF NOT EXISTS thumbnail_hash VARCHAR(64)")
+    cur.execute("ALTER TABLE assets ADD COLUMN IF NOT EXISTS preview_hash VARCHAR(64)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_assets_thumbnail_hash ON assets(thumbnail_hash)")
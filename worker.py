@@ -1,23 +1,37 @@
 import os
 import sys
 import psycopg2
-import zipfile
-import rarfile
-import py7zr
 import time
-import shutil
-import fcntl
+import select
+import signal
+import argparse
+import threading
 
 # Proje yolunu ekle
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from googleapiclient.http import MediaIoBaseDownload
-from app.indexer import get_drive_service, extract_best_image_recursive
-from app.renderer import render_3d_model
+from app.indexer import get_drive_service, get_drive_session, extract_best_image_recursive, best_image_from_archive
+from app.renderer import render_3d_views
+from app.archive import ArchiveReader, pick_model, extracted_member, sniff_archive, multipart_rar_index, KIND_EXTS
+from app.thumb_store import get_thumb_store, ensure_thumb_columns
+from app.catalog import ensure_catalog_version, catalog_changed, flush_catalog_version
+from app.remote_zip import open_remote_zip, drive_media_url
+from app.events import emit, THUMBNAIL_READY
+from app.job_queue import (ensure_job_queue, enqueue_missing, iter_leased_jobs, complete_job, fail_job,
+                           queue_stats, worker_id, JOBS_CHANNEL)
 
 # --- HDD AYARLARI ---
 BASE_WORK_DIR = "/home/hsa/3d_asset_manager/temp_work"
 os.makedirs(BASE_WORK_DIR, exist_ok=True)
+MAX_JOBS_PER_RUN = 100  # Cron çalıştırması başına en fazla iş
+
+# --- DAEMON AYARLARI (--daemon) ---
+DAEMON_MIN_BATCH = 10          # Küçük birikimde sık tur: yeni/öncelikli işler hemen görülür
+DAEMON_MAX_BATCH = 500         # Büyük birikimde uzun tur: kuyruk istatistiği ve tarama seyrek yapılır
+IDLE_POLL_INTERVAL = 60        # Kuyruk boşken NOTIFY gelmese de bu aralıkla bakılır
+ENQUEUE_INTERVAL = 15 * 60     # Thumbnail'sız assetleri kuyruğa alma taraması
+RECONNECT_DELAY = 30
 
 DB_CONFIG = {
     "dbname": "asset_db",
@@ -27,227 +41,343 @@ DB_CONFIG = {
     "port": "5435"
 }
 
-def find_3d_file_recursively(directory):
-    """Klasör içindeki tüm alt klasörleri gezip ilk STL veya OBJ'yi bulur."""
-    for root, dirs, files in os.walk(directory):
-        for file in files:
-            # Gizli dosyaları ve Mac çöp dosyalarını atla
-            if file.startswith('.') or "__MACOSX" in root:
-                continue
-            if file.lower().endswith(('.stl', '.obj')):
-                return os.path.join(root, file)
-    return None
-
 def extract_and_render_from_archive(archive_path):
-    """Arşivi HDD'ye açar, derinlemesine arar ve render alır."""
-    ext = os.path.splitext(archive_path)[1].lower()
-    timestamp = str(int(time.time() * 1000))
-    temp_extract_dir = os.path.join(BASE_WORK_DIR, f"extract_{timestamp}")
-    os.makedirs(temp_extract_dir, exist_ok=True)
-    
+    """
+    Arşiv listesinden ilk STL/OBJ'yi seçer, sadece onu tmpfs'e (sığmazsa HDD'ye) çıkarır
+    ve render alır. Dönüş: (thumbnail, önizleme)
+    """
+    try:
+        with ArchiveReader(archive_path) as archive:
+            return render_from_archive(archive)
+    except Exception as e:
+        print(f"      🚨 Ayıklama Hatası: {e}")
+    return None, None
+
+def render_from_archive(archive):
+    """Açık bir ArchiveReader (yerel ya da uzak) için render_3d_views sonucu."""
     blob = None
+    preview = None
+    member = pick_model(archive.members())
+    if member:
+        print(f"      🎯 Dosya bulundu: {member.name} ({member.size / 1024 / 1024:.1f} MB)")
+        with extracted_member(archive, member, BASE_WORK_DIR) as model_path:
+            blob, preview = render_3d_views(model_path)
+        if blob:
+            print(f"      🎨 Render başarılı!")
+    else:
+        print(f"      ℹ️ Arşiv içinde geçerli 3D dosya (.stl, .obj) yok.")
+    return blob, preview
+
+def peek_remote_zip(session, file_id):
+    """
+    Drive'daki ZIP'i indirmeden, HTTP Range ile sadece merkezi dizini ve seçilen üyeyi
+    okuyarak thumbnail üretir. Dönüş: (thumbnail, önizleme); dosya ZIP değilse veya
+    uzaktan okunamıyorsa None (çağıran tam indirmeye düşer).
+    """
     try:
-        # 1. Arşiv Türüne Göre Tam Ayıklama
-        print(f"      📦 Ayıklanıyor: {ext}...")
-        if ext == '.7z':
-            with py7zr.SevenZipFile(archive_path, mode='r') as a:
-                a.extractall(path=temp_extract_dir)
-        elif ext in ['.zip', '.cbz']:
-            with zipfile.ZipFile(archive_path, 'r') as a:
-                a.extractall(path=temp_extract_dir)
-        elif ext in ['.rar', '.cbr']:
-            with rarfile.RarFile(archive_path, 'r') as a:
-                a.extractall(path=temp_extract_dir)
-
-        # 2. Ayıklanan klasörde DERİN ARAMA yap
-        found_path = find_3d_file_recursively(temp_extract_dir)
-        
-        if found_path:
-            print(f"      🎯 Dosya bulundu: {os.path.relpath(found_path, temp_extract_dir)}")
-            blob = render_3d_model(found_path)
+        archive, remote = open_remote_zip(drive_media_url(file_id), session)
+        if archive is None:
+            return None
+        with archive:
+            archive.members()  # Bozuk/okunamayan merkezi dizin burada patlasın, tam indirmeye düşülsün
+            blob = best_image_from_archive(archive)
+            preview = None
+            if not blob:
+                blob, preview = render_from_archive(archive)
+        print(f"      ☁️ Uzak ZIP: {remote.requests} istek, {remote.bytes_fetched / 1024:.0f} KB okundu "
+              f"(dosya {remote.size / 1024 / 1024:.1f} MB)")
+        return blob, preview
+    except Exception as e:
+        print(f"      ⚠️ Uzak ZIP okunamadı, tam indirmeye geçiliyor: {e}")
+        return None
+
+def process_job(conn, cur, job, svc, session, store, owner):
+    """Kiralanmış tek bir işi işler: sonucu yazar, işi kapatır ya da geri çekilmeye alır (commit dahil)."""
+    aid, fname, fpath, attempt = job
+    local_path = os.path.join(BASE_WORK_DIR, f"{aid}_{fname}")
+    try:
+        # Extension kontrolü
+        ext = os.path.splitext(fname)[1].lower()
+        is_gdrive = 'drive.google.com' in fpath or '/d/' in fpath
+
+        # Uzantı yoksa: GDrive assetse dene, değilse atla
+        if not ext and not is_gdrive:
+            print(f"⏭️ Atlandı (klasör/geçersiz): {fname}")
+            cur.execute("UPDATE assets SET thumbnail_attempts = thumbnail_attempts + 1 WHERE id=%s", (aid,))
+            fail_job(cur, aid, owner, "klasör/geçersiz")
+            conn.commit()
+            return
+
+        # Çok parçalı RAR kontrolü
+        part_num = multipart_rar_index(fname)
+
+        if part_num > 1:
+            # part2, part3... — sadece Drive thumbnail'ini almayı dene
+            print(f"⏭️ Atlandı (çok parçalı RAR, part {part_num}): {fname}")
+            cur.execute("UPDATE assets SET thumbnail_attempts = 10 WHERE id=%s", (aid,))
+            complete_job(cur, aid)
+            conn.commit()
+            return
+
+        file_id = fpath.split("id=")[1].split("&")[0] if "id=" in fpath else fpath.split("/d/")[1].split("/")[0]
+
+        blob = None
+        preview = None
+        ext = os.path.splitext(fname)[1].lower()
+
+        # part1.rar (çok parçalı) → extract etme, sadece Drive thumbnail dene
+        if part_num == 1:
+            print(f"      📦 Çok parçalı RAR part1 — extract edilemiyor, Drive thumbnail deneniyor")
+            # Dosyayı indirmeden Drive API thumbnail'ini svc ile al
+            try:
+                fmeta = svc.files().get(fileId=file_id, fields='thumbnailLink').execute()
+                tlink = fmeta.get('thumbnailLink', '')
+                if tlink:
+                    import requests as _req
+                    blob = _req.get(tlink.split('=')[0] + '=s400', timeout=10).content
+            except Exception as et:
+                print(f"      ⚠️ Drive thumbnail alınamadı: {et}")
             if blob:
-                print(f"      🎨 Render başarılı!")
+                cur.execute("UPDATE assets SET thumbnail_hash=%s, thumbnail_attempts = 10 WHERE id=%s", (store.put(blob), aid))
+                emit(cur, THUMBNAIL_READY, [aid])
+                complete_job(cur, aid)
+                conn.commit()
+                catalog_changed(conn)
+                print(f"    ✅ Drive thumbnail alındı!")
+            else:
+                cur.execute("UPDATE assets SET thumbnail_attempts = 10 WHERE id=%s", (aid,))
+                complete_job(cur, aid)
+                conn.commit()
+            return
+
+        print(f"⬇️ İşleniyor: {fname}")
+        # ZIP'lerde (veya uzantısız Drive dosyalarında) önce sadece gereken baytları oku
+        peeked = None
+        if session and (ext in ('.zip', '.cbz') or not ext):
+            peeked = peek_remote_zip(session, file_id)
+
+        if peeked is not None:
+            blob, preview = peeked
+        else:
+            request = svc.files().get_media(fileId=file_id)
+            with open(local_path, "wb") as f:
+                downloader = MediaIoBaseDownload(f, request)
+                done = False
+                while not done:
+                    _, done = downloader.next_chunk()
+
+            # Uzantı yoksa (GDrive klasör-adı olarak kaydedilmiş) → magic bytes ile tespit et
+            if not ext:
+                kind = sniff_archive(local_path)
+                # Arşiv değilse STL dene (solid text veya binary)
+                ext = KIND_EXTS[kind] if kind else '.stl'
+                print(f"      🔍 Uzantı yok, magic bytes → {ext}")
+                # Dosyayı rename et
+                new_local = local_path + ext
+                os.rename(local_path, new_local)
+                local_path = new_local
+
+            # Dosya tipine göre işlem yap
+            if ext in ['.stl', '.obj']:
+                # Direkt 3D dosya → Render al
+                print(f"      🎨 3D dosya tespit edildi, render alınıyor...")
+                blob, preview = render_3d_views(local_path)
+
+            elif ext in ['.zip', '.rar', '.7z', '.cbz', '.cbr']:
+                # Arşiv dosyası → İçinde resim/3D ara
+                print(f"      📦 Arşiv tespit edildi...")
+                # Önce hazır resim ara
+                blob = extract_best_image_recursive(local_path)
+
+                # Yoksa içinde 3D dosya bul ve render al
+                if not blob:
+                    blob, preview = extract_and_render_from_archive(local_path)
+
+            else:
+                print(f"      ⚠️ Desteklenmeyen dosya tipi: {ext}")
+
+        if blob:
+            cur.execute("UPDATE assets SET thumbnail_hash=%s, preview_hash=COALESCE(%s, preview_hash), thumbnail_attempts = 10 WHERE id=%s",
+                        (store.put(blob), store.put(preview) if preview else None, aid))
+            emit(cur, THUMBNAIL_READY, [aid])
+            complete_job(cur, aid)
+            conn.commit()
+            catalog_changed(conn)
+            print(f"    ✅ İŞLEM BAŞARILI!")
         else:
-            print(f"      ℹ️ Arşiv içinde geçerli 3D dosya (.stl, .obj) yok.")
+            cur.execute("UPDATE assets SET thumbnail_attempts = thumbnail_attempts + 1 WHERE id=%s", (aid,))
+            fail_job(cur, aid, owner, "resim/render üretilemedi")
+            conn.commit()
+            print(f"    ❌ Resim/Render üretilemedi.")
 
     except Exception as e:
-        print(f"      🚨 Ayıklama Hatası: {e}")
+        if conn.closed:
+            # Bağlantı koptu: burada sorgu çalıştırılamaz, yeniden bağlanmayı çağıran yapar
+            # (kiralama LEASE_SECONDS sonunda kendiliğinden düşer)
+            raise
+        print(f"    🚨 Kritik Hata: {e}")
+        conn.rollback()
+        cur.execute("UPDATE assets SET thumbnail_attempts = thumbnail_attempts + 1 WHERE id=%s", (aid,))
+        fail_job(cur, aid, owner, e)
+        conn.commit()
     finally:
-        # HDD'yi temizle
-        if os.path.exists(temp_extract_dir):
-            shutil.rmtree(temp_extract_dir)
-    return blob
+        if os.path.exists(local_path):
+            os.remove(local_path)
 
-def deep_scan():
+def open_worker():
+    """Worker bağlantısı ve gerekli tablolar."""
+    conn = psycopg2.connect(**DB_CONFIG)
+    cur = conn.cursor()
+    ensure_thumb_columns(cur)
+    ensure_catalog_version(cur)
+    ensure_job_queue(cur)
+    conn.commit()
+    return conn, cur
+
+def deep_scan(limit=MAX_JOBS_PER_RUN):
+    """Tek seferlik çalıştırma (cron): en fazla limit iş işleyip çıkar."""
     print(f"⬇️ HDD Derin Tarama Başladı: {time.strftime('%H:%M:%S')}")
     
-    # Lock dosyası ile çakışmayı önle
-    lock_file_path = os.path.join(BASE_WORK_DIR, "worker.lock")
-    lock_file = None
-    
     try:
-        # Lock dosyasını aç/oluştur
-        lock_file = open(lock_file_path, 'w')
-        
-        # Non-blocking lock dene
-        try:
-            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
-        except BlockingIOError:
-            print("⚠️ Başka bir worker çalışıyor, bu çalışma atlanıyor.")
-            return
-        
-        print("🔒 Worker lock alındı, işlem başlıyor...")
-        conn = psycopg2.connect(**DB_CONFIG)
-        cur = conn.cursor()
+        # Kilit dosyası yok: işler thumbnail_jobs kuyruğundan SKIP LOCKED ile kiralanır,
+        # istenen sayıda worker (farklı makinelerde de) aynı anda çalışabilir
+        conn, cur = open_worker()
+        added = enqueue_missing(cur)
+        conn.commit()
+        store = get_thumb_store()
         svc = get_drive_service()
+        session = get_drive_session()
+        owner = worker_id()
         
         # İstatistik
-        cur.execute("SELECT COUNT(*) FROM assets WHERE thumbnail_blob IS NULL AND thumbnail_attempts < 3")
-        total_waiting = cur.fetchone()[0]
-        print(f"📊 DURUM: Taranmayı bekleyen {total_waiting} dosya var.")
+        stats = queue_stats(cur)
+        print(f"📊 DURUM: Kuyrukta bekleyen {stats.get('pending', 0)} iş var ({stats['ready']} hazır, {added} yeni eklendi).")
 
         if svc:
-            # Deneme sayısı az olan resimsizleri getir
-            cur.execute("""
-                SELECT id, filename, filepath FROM assets 
-                WHERE thumbnail_blob IS NULL AND thumbnail_attempts < 3
-                ORDER BY thumbnail_attempts ASC, id DESC LIMIT 100
-            """)
-            
-            for aid, fname, fpath in cur.fetchall():
-                local_path = os.path.join(BASE_WORK_DIR, fname)
-                try:
-                    # Extension kontrolü
-                    ext = os.path.splitext(fname)[1].lower()
-                    is_gdrive = 'drive.google.com' in fpath or '/d/' in fpath
-
-                    # Uzantı yoksa: GDrive assetse dene, değilse atla
-                    if not ext and not is_gdrive:
-                        print(f"⏭️ Atlandı (klasör/geçersiz): {fname}")
-                        cur.execute("UPDATE assets SET thumbnail_attempts = thumbnail_attempts + 1 WHERE id=%s", (aid,))
-                        conn.commit()
-                        continue
-
-                    # Çok parçalı RAR kontrolü
-                    import re as _re
-                    is_multipart = bool(_re.search(r'\.part\d+\.rar$', fname.lower())) or bool(_re.search(r'\.r\d+$', fname.lower()))
-                    part_num = 0
-                    m = _re.search(r'\.part(\d+)\.rar$', fname.lower())
-                    if m: part_num = int(m.group(1))
-
-                    if is_multipart and part_num > 1:
-                        # part2, part3... — sadece Drive thumbnail'ini almayı dene
-                        print(f"⏭️ Atlandı (çok parçalı RAR, part {part_num}): {fname}")
-                        cur.execute("UPDATE assets SET thumbnail_attempts = 10 WHERE id=%s", (aid,))
-                        conn.commit()
-                        continue
-                    
-                    file_id = fpath.split("id=")[1].split("&")[0] if "id=" in fpath else fpath.split("/d/")[1].split("/")[0]
-                    
-                    print(f"⬇️ İşleniyor: {fname}")
-                    request = svc.files().get_media(fileId=file_id)
-                    with open(local_path, "wb") as f:
-                        downloader = MediaIoBaseDownload(f, request)
-                        done = False
-                        while not done:
-                            _, done = downloader.next_chunk()
-                    
-                    blob = None
-                    ext = os.path.splitext(fname)[1].lower()
-
-                    # part1.rar veya .r00 (çok parçalı) → extract etme, sadece Drive thumbnail dene
-                    import re as _re
-                    if _re.search(r'\.part1\.rar$', fname.lower()) or _re.search(r'\.r00$', fname.lower()):
-                        print(f"      📦 Çok parçalı RAR part1 — extract edilemiyor, Drive thumbnail deneniyor")
-                        # Dosyayı indirmeden Drive API thumbnail'ini svc ile al
-                        try:
-                            fmeta = svc.files().get(fileId=file_id, fields='thumbnailLink').execute()
-                            tlink = fmeta.get('thumbnailLink', '')
-                            if tlink:
-                                import requests as _req
-                                blob = _req.get(tlink.split('=')[0] + '=s400', timeout=10).content
-                        except Exception as et:
-                            print(f"      ⚠️ Drive thumbnail alınamadı: {et}")
-                        if blob:
-                            cur.execute("UPDATE assets SET thumbnail_blob=%s, thumbnail_attempts = 10 WHERE id=%s", (blob, aid))
-                            conn.commit()
-                            print(f"    ✅ Drive thumbnail alındı!")
-                        else:
-                            cur.execute("UPDATE assets SET thumbnail_attempts = 10 WHERE id=%s", (aid,))
-                            conn.commit()
-                        continue
-
-                    # Uzantı yoksa (GDrive klasör-adı olarak kaydedilmiş) → magic bytes ile tespit et
-                    if not ext:
-                        with open(local_path, 'rb') as _f:
-                            magic = _f.read(8)
-                        if magic[:2] == b'PK':
-                            ext = '.zip'
-                        elif magic[:6] == b'7z\xbc\xaf\x27\x1c':
-                            ext = '.7z'
-                        elif magic[:7] in (b'Rar!\x1a\x07\x00',) or magic[:8] == b'Rar!\x1a\x07\x01\x00':
-                            ext = '.rar'
-                        else:
-                            # STL dene (solid text veya binary)
-                            ext = '.stl'
-                        print(f"      🔍 Uzantı yok, magic bytes → {ext}")
-                        # Dosyayı rename et
-                        new_local = local_path + ext
-                        os.rename(local_path, new_local)
-                        local_path = new_local
-
-                    # Dosya tipine göre işlem yap
-                    if ext in ['.stl', '.obj']:
-                        # Direkt 3D dosya → Render al
-                        print(f"      🎨 3D dosya tespit edildi, render alınıyor...")
-                        blob = render_3d_model(local_path)
-                    
-                    elif ext in ['.zip', '.rar', '.7z', '.cbz', '.cbr']:
-                        # Arşiv dosyası → İçinde resim/3D ara
-                        print(f"      📦 Arşiv tespit edildi...")
-                        # Önce hazır resim ara
-                        blob = extract_best_image_recursive(local_path)
-                        
-                        # Yoksa içinde 3D dosya bul ve render al
-                        if not blob:
-                            blob = extract_and_render_from_archive(local_path)
-                    
-                    else:
-                        print(f"      ⚠️ Desteklenmeyen dosya tipi: {ext}")
-
-                    if blob:
-                        cur.execute("UPDATE assets SET thumbnail_blob=%s, thumbnail_attempts = 10 WHERE id=%s", (blob, aid))
-                        conn.commit()
-                        print(f"    ✅ İŞLEM BAŞARILI!")
-                    else:
-                        cur.execute("UPDATE assets SET thumbnail_attempts = thumbnail_attempts + 1 WHERE id=%s", (aid,))
-                        conn.commit()
-                        print(f"    ❌ Resim/Render üretilemedi.")
-
-                except Exception as e:
-                    print(f"    🚨 Kritik Hata: {e}")
-                    cur.execute("UPDATE assets SET thumbnail_attempts = thumbnail_attempts + 1 WHERE id=%s", (aid,))
-                    conn.commit()
-                finally:
-                    if os.path.exists(local_path):
-                        os.remove(local_path)
+            for job in iter_leased_jobs(conn, owner, limit):
+                process_job(conn, cur, job, svc, session, store, owner)
 
+        flush_catalog_version(conn)
         cur.close(); conn.close()
         print(f"✅ Tarama tamamlandı: {time.strftime('%H:%M:%S')}")
         
     except Exception as e:
         print(f"❌ DB Hatası: {e}")
-    
-    finally:
-        # Lock'u serbest bırak
-        if lock_file:
-            try:
-                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
-                lock_file.close()
-                os.remove(lock_file_path)
-                print("🔓 Worker lock serbest bırakıldı.")
-            except:
-                pass
+
+_stop = threading.Event()
+
+def request_stop(signum, frame):
+    if not _stop.is_set():
+        print(f"🛑 {signal.Signals(signum).name} alındı: elimdeki iş bitince çıkılacak.")
+    _stop.set()
+
+def open_listener():
+    """Kuyruğa iş eklenince (enqueue_missing) NOTIFY alan autocommit bağlantı."""
+    conn = psycopg2.connect(**DB_CONFIG)
+    conn.set_session(autocommit=True)
+    conn.cursor().execute(f"LISTEN {JOBS_CHANNEL}")
+    return conn
+
+def wait_for_work(listener, timeout):
+    """NOTIFY gelene, süre dolana ya da durdurma istenene kadar bekler."""
+    deadline = time.monotonic() + timeout
+    while not _stop.is_set() and time.monotonic() < deadline:
+        # Kısa dilimler: SIGTERM geldiğinde select'in bitmesini beklemeyelim
+        if select.select([listener], [], [], min(1.0, deadline - time.monotonic())) != ([], [], []):
+            listener.poll()
+            if listener.notifies:
+                listener.notifies.clear()
+                return True
+    return False
+
+def batch_size_for(ready):
+    """Tur başına iş sayısı birikimle ölçeklenir (hazır işlerin ~%10'u, sınırlar arasında)."""
+    return max(DAEMON_MIN_BATCH, min(DAEMON_MAX_BATCH, ready // 10))
+
+def run_daemon():
+    """
+    Sürekli çalışan worker: bağımlılıklar ve Drive kimlik bilgileri bir kez yüklenir,
+    kuyruk boşalınca LISTEN ile yeni iş beklenir. SIGTERM/SIGINT'te elimdeki iş
+    bitirilir, yenisi kiralanmadan çıkılır (kiralanmamış işler kuyrukta kalır).
+    """
+    signal.signal(signal.SIGTERM, request_stop)
+    signal.signal(signal.SIGINT, request_stop)
+    print(f"🔁 Worker daemon başladı: {time.strftime('%H:%M:%S')} ({worker_id()})")
+
+    svc = get_drive_service()
+    if not svc:
+        print("❌ Drive servisi kurulamadı (service_account.json?), daemon başlatılamıyor.")
+        return
+    session = get_drive_session()
+    store = get_thumb_store()
+    owner = worker_id()
+
+    conn = cur = listener = None
+    last_enqueue = 0.0
+    processed = 0
+    while not _stop.is_set():
+        try:
+            if conn is None:
+                conn, cur = open_worker()
+                listener = open_listener()
+                last_enqueue = 0.0
+
+            if time.monotonic() - last_enqueue >= ENQUEUE_INTERVAL:
+                added = enqueue_missing(cur)
+                conn.commit()
+                last_enqueue = time.monotonic()
+                if added:
+                    print(f"📥 {added} yeni iş kuyruğa alındı.")
+
+            stats = queue_stats(cur)
+            conn.commit()
+            if not stats['ready']:
+                # Boşta beklemeden önce bekleyen katalog değişikliklerini yayınla
+                flush_catalog_version(conn)
+                wait_for_work(listener, IDLE_POLL_INTERVAL)
+                continue
+
+            batch = batch_size_for(stats['ready'])
+            print(f"📊 {stats['ready']} hazır iş ({stats.get('pending', 0)} bekleyen), bu tur en fazla {batch}.")
+            for job in iter_leased_jobs(conn, owner, batch):
+                process_job(conn, cur, job, svc, session, store, owner)
+                processed += 1
+                if _stop.is_set():
+                    break
+
+        except (psycopg2.OperationalError, psycopg2.InterfaceError) as e:
+            print(f"⚠️ DB bağlantısı koptu, {RECONNECT_DELAY} sn sonra yeniden bağlanılacak: {e}")
+            for c in (conn, listener):
+                try:
+                    if c: c.close()
+                except Exception:
+                    pass
+            conn = cur = listener = None
+            _stop.wait(RECONNECT_DELAY)
+
+    if conn and not conn.closed:
+        try:
+            flush_catalog_version(conn)
+        except psycopg2.Error as e:
+            print(f"⚠️ Katalog sürümü çıkışta yayınlanamadı: {e}")
+    for c in (conn, listener):
+        try:
+            if c: c.close()
+        except Exception:
+            pass
+    print(f"👋 Worker daemon durdu: {processed} iş işlendi ({time.strftime('%H:%M:%S')}).")
+
+def main():
+    parser = argparse.ArgumentParser(description="Thumbnail worker")
+    parser.add_argument("--daemon", action="store_true",
+                        help="Sürekli çalış: kuyruğu boşalt, sonra yeni işi bekle (systemd için)")
+    parser.add_argument("--limit", type=int, default=MAX_JOBS_PER_RUN,
+                        help="Tek seferlik modda en fazla kaç iş işlenecek")
+    args = parser.parse_args()
+    if args.daemon:
+        run_daemon()
+    else:
+        deep_scan(args.limit)
 
 if __name__ == "__main__": 
-    deep_scan()
\ No newline at end of file
+    main()
\ No newline at end of file